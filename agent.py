@@ -1,8 +1,12 @@
+import argparse
+import asyncio
 import json
+import os
+from functools import lru_cache
 from dotenv import load_dotenv
-from langgraph.graph import StateGraph, START, END
 
 from state import StockReportState
+from tracing import traced_node
 from nodes import (
     process_query_node,
     extract_report_link_node,
@@ -11,54 +15,160 @@ from nodes import (
     should_continue_extraction,
     collect_result_node,
     ask_user_for_clarification_node,
-    generate_final_response_node
+    generate_final_response_node,
+    extract_request_node,
+    prepare_next_clarification_node,
+    defer_clarification_node,
+    interrupt_clarification_node,
+    dispatch_extractions,
+    check_pending_clarification,
+    aprocess_query_node,
+    aextract_report_link_node,
+    aprepare_next_extraction_node,
+    acollect_result_node,
+    aask_user_for_clarification_node,
+    agenerate_final_response_node,
+    aextract_request_node,
+    aprepare_next_clarification_node,
+    adefer_clarification_node,
+    ainterrupt_clarification_node,
 )
 
 load_dotenv()
 
-graph_builder = StateGraph(StockReportState)
+# "serial": xử lý lần lượt từng yêu cầu; "parallel": gửi tất cả yêu cầu đi cùng lúc
+EXTRACTION_MODE = os.getenv("EXTRACTION_MODE", "serial")
+EXTRACTION_CONCURRENCY = int(os.getenv("EXTRACTION_CONCURRENCY", "4"))
+# "1": chạy graph bằng các node bất đồng bộ (async Playwright, ainvoke)
+AGENT_ASYNC = os.getenv("AGENT_ASYNC", "0") == "1"
+# Chế độ serial đi qua vài node cho mỗi yêu cầu, mức mặc định 25 của LangGraph chỉ đủ cho khoảng 5 yêu cầu
+GRAPH_RECURSION_LIMIT = int(os.getenv("GRAPH_RECURSION_LIMIT", "500"))
 
-# Nodes
+# Tên node -> (bản sync, bản async)
+NODE_IMPLEMENTATIONS = {
+    "process_query": (process_query_node, aprocess_query_node),
+    "collect_result": (collect_result_node, acollect_result_node),
+    "generate_final_response": (generate_final_response_node, agenerate_final_response_node),
+    "extract_request": (extract_request_node, aextract_request_node),
+    "prepare_clarification": (prepare_next_clarification_node, aprepare_next_clarification_node),
+    "prepare_next_extraction": (prepare_next_extraction_node, aprepare_next_extraction_node),
+    "extract_report_link": (extract_report_link_node, aextract_report_link_node),
+}
 
-graph_builder.add_node("process_query", process_query_node)
-graph_builder.add_node("prepare_next_extraction", prepare_next_extraction_node)
-graph_builder.add_node("extract_report_link", extract_report_link_node)
-graph_builder.add_node("ask_user", ask_user_for_clarification_node)
-graph_builder.add_node("collect_result", collect_result_node)
-graph_builder.add_node("generate_final_response", generate_final_response_node)
 
-# Edges
+# Cách hỏi lại người dùng -> (bản sync, bản async)
+CLARIFICATION_NODES = {
+    "input": (ask_user_for_clarification_node, aask_user_for_clarification_node),  # Hỏi qua input() trong terminal
+    "interrupt": (interrupt_clarification_node, ainterrupt_clarification_node),  # Tạm dừng graph, cần checkpointer
+    "defer": (defer_clarification_node, adefer_clarification_node),  # Không hỏi, ghi thành lỗi trong kết quả
+}
 
-graph_builder.add_edge(START, "process_query")
-graph_builder.add_conditional_edges(
-    "process_query",
-    should_continue_extraction,
-    {"continue": "prepare_next_extraction", "end_extraction": "generate_final_response"}
-)
-graph_builder.add_conditional_edges(
-    "collect_result",
-    should_continue_extraction,
-    {"continue": "prepare_next_extraction", "end_extraction": "generate_final_response"}
-)
-graph_builder.add_edge("generate_final_response", END)
-graph_builder.add_edge("prepare_next_extraction", "extract_report_link")
-graph_builder.add_edge("ask_user", "collect_result")
-graph_builder.add_conditional_edges(
-    "extract_report_link",
-    check_extraction_result,
-    {"ask_user": "ask_user", "collect": "collect_result"}
-)
 
-agent = graph_builder.compile()
+def build_graph(extraction_mode: str = EXTRACTION_MODE, use_async: bool = False, clarification: str = "input",
+                checkpointer=None):
+    """Dựng và compile graph.
+
+    `use_async` chọn các node bất đồng bộ (dùng với `ainvoke`); `clarification` là
+    một khoá của `CLARIFICATION_NODES`."""
+    # Import khi dựng graph để lời chào hiện ra trước khi LangGraph được nạp
+    from langgraph.graph import StateGraph, START, END
+
+    # Mọi node được bọc để ghi span (xem tracing.py); không bật sink nào thì gần như không tốn gì
+    def node(name):
+        return traced_node(name, NODE_IMPLEMENTATIONS[name][1 if use_async else 0])
+
+    if clarification == "interrupt" and checkpointer is None:
+        raise ValueError("clarification='interrupt' cần một checkpointer để lưu state khi tạm dừng")
+    ask_user = traced_node("ask_user", CLARIFICATION_NODES[clarification][1 if use_async else 0])
+
+    graph_builder = StateGraph(StockReportState)
+
+    # Nodes
+
+    graph_builder.add_node("process_query", node("process_query"))
+    graph_builder.add_node("ask_user", ask_user)
+    graph_builder.add_node("collect_result", node("collect_result"))
+    graph_builder.add_node("generate_final_response", node("generate_final_response"))
+
+    # Edges
+
+    graph_builder.add_edge(START, "process_query")
+    graph_builder.add_edge("generate_final_response", END)
+    graph_builder.add_edge("ask_user", "collect_result")
+
+    if extraction_mode == "parallel":
+        graph_builder.add_node("extract_request", node("extract_request"))
+        graph_builder.add_node("prepare_clarification", node("prepare_clarification"))
+
+        graph_builder.add_conditional_edges(
+            "process_query",
+            dispatch_extractions,
+            {"end_extraction": "generate_final_response", "extract_request": "extract_request"}
+        )
+        # Các yêu cầu cần hỏi lại được xử lý sau khi mọi nhánh trích xuất đã xong
+        graph_builder.add_edge("extract_request", "prepare_clarification")
+        graph_builder.add_edge("collect_result", "prepare_clarification")
+        graph_builder.add_conditional_edges(
+            "prepare_clarification",
+            check_pending_clarification,
+            {"ask_user": "ask_user", "end_extraction": "generate_final_response"}
+        )
+    else:
+        graph_builder.add_node("prepare_next_extraction", node("prepare_next_extraction"))
+        graph_builder.add_node("extract_report_link", node("extract_report_link"))
+
+        graph_builder.add_conditional_edges(
+            "process_query",
+            should_continue_extraction,
+            {"continue": "prepare_next_extraction", "end_extraction": "generate_final_response"}
+        )
+        graph_builder.add_conditional_edges(
+            "collect_result",
+            should_continue_extraction,
+            {"continue": "prepare_next_extraction", "end_extraction": "generate_final_response"}
+        )
+        graph_builder.add_edge("prepare_next_extraction", "extract_report_link")
+        graph_builder.add_conditional_edges(
+            "extract_report_link",
+            check_extraction_result,
+            {"ask_user": "ask_user", "collect": "collect_result"}
+        )
+
+    return graph_builder.compile(checkpointer=checkpointer)
+
+
+@lru_cache(maxsize=None)
+def get_graph(extraction_mode: str = EXTRACTION_MODE, use_async: bool = False, clarification: str = "input"):
+    """Graph đã compile (không checkpointer), dựng một lần cho mỗi cấu hình và dùng lại trong tiến trình."""
+    return build_graph(extraction_mode, use_async=use_async, clarification=clarification)
+
+
+def draw_graph(path: str = "graph_v2.png", extraction_mode: str = EXTRACTION_MODE) -> None:
+    """Vẽ graph ra file PNG (gọi dịch vụ render mermaid từ xa)."""
+    with open(path, "wb") as f:
+        f.write(get_graph(extraction_mode).get_graph().draw_mermaid_png())
+
 
-print('Xin chào, tôi là trợ lý báo cáo tài chính cổ phiếu Việt Nam. Hãy nhập truy vấn của bạn!')
-query = input("Truy vấn: ")
-final_state = agent.invoke({"query": query})
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Trợ lý báo cáo tài chính cổ phiếu Việt Nam")
+    parser.add_argument("--draw-graph", nargs="?", const="graph_v2.png", metavar="PATH",
+                        help="Chỉ vẽ graph ra file PNG (mặc định graph_v2.png) rồi thoát")
+    args = parser.parse_args()
+    if args.draw_graph:
+        draw_graph(args.draw_graph)
+        print(f"Đã lưu graph vào {args.draw_graph}")
+        raise SystemExit(0)
 
-print("AGENT ĐÃ HOÀN TẤT")
-with open("result.json", 'w', encoding='utf-8') as f:
-    json.dump(final_state, f, ensure_ascii=False, indent=4)
+    print('Xin chào, tôi là trợ lý báo cáo tài chính cổ phiếu Việt Nam. Hãy nhập truy vấn của bạn!')
+    query = input("Truy vấn: ")
+    agent = get_graph(EXTRACTION_MODE, use_async=AGENT_ASYNC)
+    config = {"max_concurrency": EXTRACTION_CONCURRENCY, "recursion_limit": GRAPH_RECURSION_LIMIT}
+    if AGENT_ASYNC:
+        final_state = asyncio.run(agent.ainvoke({"query": query}, config=config))
+    else:
+        final_state = agent.invoke({"query": query}, config=config)
 
-# Lưu graph
-with open("graph_v2.png", "wb") as f:
-    f.write(agent.get_graph().draw_mermaid_png())
\ No newline at end of file
+    print("AGENT ĐÃ HOÀN TẤT")
+    with open("result.json", 'w', encoding='utf-8') as f:
+        # State giữ nguyên các ReportRequest (pydantic) trong pending_requests và current
+        json.dump(final_state, f, ensure_ascii=False, indent=4, default=lambda value: value.model_dump())
\ No newline at end of file
@@ -0,0 +1,88 @@
+"""Chạy nhiều query cùng lúc trên một event loop bằng graph bất đồng bộ.
+
+Mỗi query là một `StockReportState` đầu vào; số query chạy đồng thời, số page
+trình duyệt và số lời gọi LLM đang mở đều bị giới hạn. Chạy không tương tác:
+các yêu cầu cần người dùng chọn báo cáo được trả về dưới dạng lỗi kèm các lựa chọn.
+
+CLI (mỗi dòng đầu vào là một query hoặc một object JSON, mỗi dòng đầu ra là kết quả JSON):
+    python batch.py queries.txt --concurrency 10 > results.jsonl
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from typing import List, Optional
+
+from agent import get_graph
+from browser_pool import get_async_browser_pool
+from concurrency import get_budget, set_budget
+from state import StockReportState
+
+
+async def run_batch(states: List[StockReportState], max_concurrency: int = 10,
+                    max_pages: Optional[int] = None, max_llm_calls: Optional[int] = None,
+                    extraction_concurrency: int = 4, agent=None) -> List[dict]:
+    """Chạy graph cho mọi state đầu vào; kết quả giữ nguyên thứ tự đầu vào.
+
+    Query bị lỗi trả về {"query", "error"} thay vì làm hỏng cả batch."""
+    budget = get_budget()
+    set_budget(max_pages or budget.max_pages, max_llm_calls or budget.max_llm_calls)
+    agent = agent or get_graph("parallel", use_async=True, clarification="defer")
+    slots = asyncio.Semaphore(max_concurrency)
+    config = {"max_concurrency": extraction_concurrency}
+
+    async def run_one(state):
+        async with slots:
+            started = time.perf_counter()
+            try:
+                final_state = await agent.ainvoke(state, config=config)
+            except Exception as e:
+                return {"query": state.get("query"), "error": str(e), "elapsed": time.perf_counter() - started}
+            final_state["elapsed"] = time.perf_counter() - started
+            return final_state
+
+    return await asyncio.gather(*(run_one(state) for state in states))
+
+
+def _to_jsonable(value):
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if isinstance(value, dict):
+        return {key: _to_jsonable(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_to_jsonable(item) for item in value]
+    return value
+
+
+def _read_states(lines) -> List[StockReportState]:
+    states = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        states.append(json.loads(line) if line.startswith("{") else {"query": line})
+    return states
+
+
+async def _main(args):
+    with open(args.input, encoding="utf-8") if args.input != "-" else sys.stdin as f:
+        states = _read_states(f)
+    try:
+        results = await run_batch(states, args.concurrency, args.max_pages, args.max_llm_calls)
+    finally:
+        await get_async_browser_pool().close()
+    for result in results:
+        print(json.dumps(_to_jsonable(result), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Chạy nhiều query đồng thời")
+    parser.add_argument("input", help="File query (mỗi dòng một query hoặc object JSON), '-' để đọc stdin")
+    parser.add_argument("--concurrency", type=int, default=10, help="Số query chạy đồng thời")
+    parser.add_argument("--max-pages", type=int, help="Số page trình duyệt mở đồng thời (mặc định BROWSER_POOL_MAX_PAGES)")
+    parser.add_argument("--max-llm-calls", type=int, help="Số lời gọi LLM đồng thời (mặc định LLM_MAX_CONCURRENCY)")
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,62 @@
+"""Độ trễ mỗi yêu cầu của extract_report_link_node khi có và không có pool trình duyệt.
+
+Chạy trên site Vietstock giả lập, không cần mạng:
+    python -m benchmarks.bench_browser_pool -n 5
+"""
+import argparse
+import os
+import statistics
+import time
+
+from benchmarks.fake_vietstock import start_server
+from browser_pool import BrowserPool, set_browser_pool
+from pydantic_models import ReportRequest
+
+REQUEST = ReportRequest(stock_code="FPT", year=2024, period="Quý", quarter=3, consolidation_status="Hợp nhất")
+
+
+def run(n, use_pool):
+    from nodes.extract_link import _index_registry, extract_report_link_node
+
+    pool = BrowserPool()
+    set_browser_pool(pool)
+    latencies = []
+    try:
+        for _ in range(n):
+            # Index trong tiến trình cũng bỏ qua trình duyệt, xoá để lần nào cũng phải scrape
+            _index_registry.clear()
+            start = time.perf_counter()
+            result = extract_report_link_node({"current": {"request": REQUEST}})["current"]
+            latencies.append(time.perf_counter() - start)
+            if result.get("error_message"):
+                raise RuntimeError(result["error_message"])
+            if not use_pool:
+                # Hành vi cũ: mỗi yêu cầu khởi động và đóng một Chromium riêng
+                pool.close()
+    finally:
+        pool.close_all()
+    return latencies
+
+
+def report(label, latencies):
+    print(f"{label:<12} first={latencies[0] * 1000:8.1f}ms  "
+          f"mean={statistics.mean(latencies) * 1000:8.1f}ms  "
+          f"p50={statistics.median(latencies) * 1000:8.1f}ms  "
+          f"total={sum(latencies):6.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", type=int, default=5, help="Số yêu cầu tuần tự")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Độ trễ mạng giả lập")
+    args = parser.parse_args()
+
+    server, base_url = start_server(latency=args.latency_ms / 1000)
+    os.environ["VIETSTOCK_BASE_URL"] = base_url
+    # Đo chi phí trình duyệt nên bỏ qua cache danh sách báo cáo
+    os.environ["REPORT_CACHE_DISABLED"] = "1"
+    try:
+        report("no pool", run(args.n, use_pool=False))
+        report("pool", run(args.n, use_pool=True))
+    finally:
+        server.shutdown()
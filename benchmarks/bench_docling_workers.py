@@ -0,0 +1,47 @@
+"""Khả năng mở rộng của Docling trên CPU theo số tiến trình worker (`DoclingEngine(workers=...)`).
+
+Mỗi cấu hình nạp model trong các worker trước (không tính vào thời gian), rồi chuyển
+mọi trang của PDF không qua cache; in số trang/giây và mức tăng tốc so với 1 worker.
+Cần docling, tesseract (gói ngôn ngữ vie) và model của docling:
+    python -m benchmarks.bench_docling_workers
+    python -m benchmarks.bench_docling_workers --pdf DBC/DBC_marker_ocr.pdf --workers 1 2 4 8 --repeats 2
+"""
+import argparse
+import os
+import time
+
+import pypdfium2 as pdfium
+
+DEFAULT_PDF = "DBC/DBC_marker_ocr.pdf"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf", default=DEFAULT_PDF)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--repeats", type=int, default=1)
+    args = parser.parse_args()
+
+    from ocr.docling.docling_ocr import DoclingEngine
+
+    with pdfium.PdfDocument(args.pdf) as pdf:
+        page_numbers = list(range(1, len(pdf) + 1))
+    print(f"{args.pdf}: {len(page_numbers)} trang, {os.cpu_count()} lõi CPU")
+
+    baseline = None
+    for workers in args.workers:
+        started = time.perf_counter()
+        engine = DoclingEngine(device="cpu", workers=workers)
+        load_seconds = time.perf_counter() - started
+        try:
+            timings = []
+            for _ in range(args.repeats):
+                started = time.perf_counter()
+                pages = list(engine.iter_page_markdown(args.pdf, page_numbers))
+                timings.append(time.perf_counter() - started)
+            assert [page for page, _ in pages] == page_numbers
+        finally:
+            engine.close()
+        elapsed = min(timings)
+        baseline = baseline or elapsed
+        print(f"{workers} worker  nạp={load_seconds:6.1f}s  chuyển={elapsed:7.1f}s  "
+              f"{len(page_numbers) / elapsed:5.2f} trang/s  tăng tốc x{baseline / elapsed:.2f}")
@@ -0,0 +1,150 @@
+"""So sánh đọc lại markdown với `financial_store.FinancialStore` trên hàng nghìn báo cáo tài chính giả lập.
+
+Báo cáo giả được sinh từ ba bảng chính của `DBC/DBC_Baocaotaichinh_Q3_2025_Hopnhat.md`
+(mỗi mã, mỗi quý nhân các số với một hệ số ngẫu nhiên) và ghi thành file markdown.
+Đo thời gian phân tích + ghi kho, kích thước file Arrow/Parquet, thời gian mở kho
+(memory-map) và hai truy vấn, mỗi truy vấn so với cách đọc và phân tích lại markdown:
+    so sánh công ty  doanh thu thuần (mã 10) của mọi mã trong một quý
+    so sánh kỳ       LNST (mã 60) theo quý, kèm tăng trưởng, của `--series-tickers` mã
+    python -m benchmarks.bench_financial_store
+    python -m benchmarks.bench_financial_store --tickers 1000 --quarters 12
+"""
+import argparse
+import os
+import random
+import resource
+import tempfile
+import time
+
+import numpy as np
+
+from financial_store import FinancialStore, ReportKey, parse_statements
+
+TEMPLATE = "DBC/DBC_Baocaotaichinh_Q3_2025_Hopnhat.md"
+TITLES = {
+    "balance": "# BẢNG CÂN ĐỐI KẾ TOÁN HỢP NHẤT",
+    "income": "# BÁO CÁO KẾT QUẢ KINH DOANH HỢP NHẤT",
+    "cash_flow": "# BÁO CÁO LƯU CHUYỂN TIỀN TỆ HỢP NHẤT",
+}
+HEADERS = {
+    "closing": "Số cuối quý", "opening": "Số đầu năm", "current": "Quý này năm nay", "prior": "Quý này năm trước",
+    "ytd": "Số lũy kế từ đầu năm đến cuối quý này (năm nay)", "prior_ytd": "Số lũy kế từ đầu năm đến cuối quý này (năm trước)",
+}
+
+
+def format_number(value: float) -> str:
+    text = f"{abs(round(value)):,}".replace(",", ".")
+    return f"({text})" if value < 0 else text
+
+
+def render(items, factor: float, rng: random.Random) -> str:
+    """Markdown ba báo cáo với các số của `items` nhân `factor` (±5% mỗi ô)."""
+    parts = []
+    for statement, title in TITLES.items():
+        rows = [item for item in items if item.statement == statement]
+        columns = list(dict.fromkeys(item.column for item in rows))
+        values = {}
+        for item in rows:
+            values.setdefault((item.code, item.label), {})[item.column] = item.value * factor * rng.uniform(0.95, 1.05)
+        lines = [title, "", "Đơn vị tính: VNĐ", "",
+                 "| Chỉ tiêu | Mã số | Thuyết minh | " + " | ".join(HEADERS[column] for column in columns) + " |",
+                 "|---|---|---|" + "---|" * len(columns)]
+        for (code, label), row in values.items():
+            lines.append(f"| {label} | {code} | | "
+                         + " | ".join(format_number(row[column]) if column in row else "" for column in columns) + " |")
+        parts.append("\n".join(lines))
+    return "\n\n".join(parts) + "\n"
+
+
+def timed(function, repeat=5):
+    """(kết quả, thời gian tốt nhất trong `repeat` lần)."""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tickers", type=int, default=500)
+    parser.add_argument("--quarters", type=int, default=8, help="Số quý liên tiếp mỗi mã (kết thúc ở Q3/2025)")
+    parser.add_argument("--series-tickers", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with open(TEMPLATE, encoding="utf-8") as f:
+        template = parse_statements(f.read())
+    tickers = [f"T{index:03d}" for index in range(args.tickers)]
+    last = 2025 * 4 + 2  # Q3/2025
+    periods = [(ordinal // 4, ordinal % 4 + 1) for ordinal in range(last - args.quarters + 1, last + 1)]
+    year, quarter = periods[-1]
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = {}
+        started = time.perf_counter()
+        for ticker in tickers:
+            size = rng.uniform(0.05, 20)
+            for period_year, period_quarter in periods:
+                path = os.path.join(directory, f"{ticker}_Baocaotaichinh_Q{period_quarter}_{period_year}_Hopnhat.md")
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(render(template, size * rng.uniform(0.8, 1.2), rng))
+                paths[ticker, period_year, period_quarter] = path
+        markdown_bytes = sum(os.path.getsize(path) for path in paths.values())
+        print(f"{len(paths)} báo cáo giả ({args.tickers} mã x {args.quarters} quý), "
+              f"{markdown_bytes / 2 ** 20:.1f}MB markdown, sinh trong {time.perf_counter() - started:.1f}s")
+
+        def read_items(path):
+            with open(path, encoding="utf-8") as f:
+                return parse_statements(f.read())
+
+        store = FinancialStore(os.path.join(directory, "financials.arrow"))
+        started = time.perf_counter()
+        reports = [(ReportKey(ticker, period_year, period_quarter, "Quý", "Hợp nhất"), read_items(path))
+                   for (ticker, period_year, period_quarter), path in paths.items()]
+        parsed_at = time.perf_counter()
+        rows = store.add_many(reports)
+        written_at = time.perf_counter()
+        del reports
+        store.export_parquet(os.path.join(directory, "financials.parquet"))
+        print(f"phân tích {len(paths) / (parsed_at - started):7.1f} báo cáo/s, ghi kho {written_at - parsed_at:5.2f}s: "
+              f"{rows} dòng, Arrow {os.path.getsize(store.path) / 2 ** 20:.1f}MB, "
+              f"Parquet {os.path.getsize(os.path.join(directory, 'financials.parquet')) / 2 ** 20:.1f}MB")
+
+        _, open_time = timed(lambda: FinancialStore(store.path).table)
+        print(f"mở kho (memory-map) {open_time * 1000:8.2f}ms")
+
+        def cross_section_markdown():
+            values = {}
+            for ticker in tickers:
+                for item in read_items(paths[ticker, year, quarter]):
+                    if (item.statement, item.code, item.column) == ("income", "10", "current"):
+                        values[ticker] = item.value
+            return values
+
+        series_tickers = tickers[:args.series_tickers]
+
+        def series_markdown():
+            values = {}
+            for ticker in series_tickers:
+                for period_year, period_quarter in periods:
+                    for item in read_items(paths[ticker, period_year, period_quarter]):
+                        if (item.statement, item.code, item.column) == ("income", "60", "current"):
+                            values[ticker, period_year, period_quarter] = item.value
+            return values
+
+        cases = [
+            ("so sánh công ty", cross_section_markdown, lambda: store.cross_section("income", "10", year, quarter)),
+            ("so sánh kỳ", series_markdown, lambda: store.series(series_tickers, "income", "60")),
+        ]
+        for name, from_markdown, from_store in cases:
+            expected, markdown_time = timed(from_markdown, repeat=1)
+            result, store_time = timed(from_store)
+            # Hai cách phải cho cùng kết quả
+            assert np.allclose(sorted(expected.values()), sorted(result.column("value").to_pylist()))
+            print(f"{name:<16} markdown={markdown_time * 1000:9.1f}ms  kho={store_time * 1000:7.2f}ms  "
+                  f"nhanh hơn {markdown_time / store_time:7.0f}x  ({result.num_rows} dòng)")
+    print(f"RSS đỉnh={resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f}MB")
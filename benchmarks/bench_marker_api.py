@@ -0,0 +1,54 @@
+"""So sánh cách gọi Marker API cũ (từng tài liệu, poll cố định 2s, không thử lại) với client bất đồng bộ.
+
+Chạy trên stub `benchmarks/stub_marker_api.py` với độ trễ và tỉ lệ lỗi cấu hình được:
+    python -m benchmarks.bench_marker_api -n 20
+    python -m benchmarks.bench_marker_api -n 40 --delay 3 --check-error-rate 0.1 --max-active 8 --max-in-flight 8
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+
+from benchmarks.stub_marker_api import start_server
+from ocr.marker.marker_api import MarkerApiClient
+
+MODES = {
+    # Như script cũ: một tài liệu một lúc, poll mỗi 2s, lỗi là dừng
+    "tuần tự": lambda args: dict(max_in_flight=1, poll_interval=2.0, max_poll_interval=2.0, max_retries=0),
+    "bất đồng bộ": lambda args: dict(max_in_flight=args.max_in_flight, poll_interval=args.poll_interval),
+}
+
+
+def run(api_url, sources, options):
+    client = MarkerApiClient(api_key="stub", api_url=api_url, **options)
+    with tempfile.TemporaryDirectory() as output_dir:
+        started = time.perf_counter()
+        results = asyncio.run(client.convert_many(sources, output_dir, overwrite=True))
+        return time.perf_counter() - started, results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", type=int, default=20, help="Số tài liệu")
+    parser.add_argument("--delay", type=float, default=2.0, help="Thời gian xử lý giả lập mỗi tài liệu (giây)")
+    parser.add_argument("--check-error-rate", type=float, default=0.05)
+    # Client không thử lại submit bị 5xx (tránh gửi trùng, tốn tiền), nên mặc định không bật
+    parser.add_argument("--submit-error-rate", type=float, default=0.0)
+    parser.add_argument("--max-active", type=int, default=0, help="Giới hạn tài liệu đang xử lý của stub (429 khi vượt)")
+    parser.add_argument("--max-in-flight", type=int, default=8)
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    args = parser.parse_args()
+
+    sources = [f"https://example.com/bctc/doc_{i:03d}.pdf" for i in range(args.n)]
+    for mode, options in MODES.items():
+        server, state, api_url = start_server(
+            delay=args.delay, jitter=args.delay / 4, submit_error_rate=args.submit_error_rate,
+            check_error_rate=args.check_error_rate, max_active=args.max_active, seed=0)
+        try:
+            elapsed, results = run(api_url, sources, options(args))
+        finally:
+            server.shutdown()
+        done = sum(result["status"] == "done" for result in results)
+        print(f"{mode:<12} {done}/{len(results)} xong  tổng={elapsed:6.1f}s  {len(results) / elapsed:5.2f} tài liệu/s  "
+              f"poll={sum(r.get('polls', 0) for r in results)}  thử lại={sum(r.get('retries', 0) for r in results)}  "
+              f"429={state.counts['rate_limited']}")
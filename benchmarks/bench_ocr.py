@@ -0,0 +1,123 @@
+"""Benchmark các engine OCR trên một bộ PDF có markdown tham chiếu: tốc độ, bộ nhớ, chi phí và độ chính xác.
+
+Mỗi (engine, PDF) chạy trong một tiến trình riêng (đo RSS đỉnh bằng ru_maxrss) và
+gọi thẳng `iter_page_markdown` nên không đụng tới cache OCR. Độ chính xác là
+precision/recall/F1 của các ô số trong bảng (`ocr.markdown_tables.score_numeric_cells`).
+Chi phí: engine có `cost_per_page` (API) tính theo trang, engine chạy máy tính theo giờ
+(`OCR_GPU_HOURLY_USD`, `OCR_CPU_HOURLY_USD`).
+
+    python -m benchmarks.bench_ocr
+    python -m benchmarks.bench_ocr --engines text_layer docling paddle --device cuda --triage
+    python -m benchmarks.bench_ocr --corpus ocr/a.pdf=ref/a.md --corpus ocr/b.pdf=ref/b.md --json out.json
+
+Engine mặc định (`text_layer`) không cần GPU hay model nên chạy được trên CI; với
+`--min-f1`, lệnh trả mã lỗi khi một engine lỗi hoặc có F1 thấp hơn ngưỡng.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+from ocr.engines import ENGINES
+
+DEFAULT_CORPUS = ["DBC/DBC_marker_ocr.pdf=DBC/DBC_Baocaotaichinh_Q3_2025_Hopnhat.md"]
+HOURLY_USD = {
+    "cuda": float(os.getenv("OCR_GPU_HOURLY_USD", "0.5")),
+    "cpu": float(os.getenv("OCR_CPU_HOURLY_USD", "0.05")),
+}
+
+
+def run_child(args):
+    """Chạy một engine trên một PDF trong tiến trình hiện tại, in kết quả JSON."""
+    from ocr.cache import page_count
+    from ocr.engines import load_engine
+    from ocr.markdown_tables import score_numeric_cells
+
+    started = time.perf_counter()
+    engine = load_engine(args.child, device=args.device, text_layer=args.triage)
+    loaded_at = time.perf_counter()
+    first_page_at = None
+    pages = []
+    for _, markdown in engine.iter_page_markdown(args.pdf, list(range(1, page_count(args.pdf) + 1))):
+        if first_page_at is None:
+            first_page_at = time.perf_counter() - loaded_at
+        pages.append(markdown)
+    elapsed = time.perf_counter() - loaded_at
+    with open(args.reference, encoding="utf-8") as f:
+        score = score_numeric_cells(f.read(), engine.join_pages(pages))
+    cost_per_page = getattr(getattr(engine, "engine", engine), "cost_per_page", None)
+    if cost_per_page is not None:
+        # Với --triage chỉ các trang được OCR mới tốn tiền
+        triage = getattr(engine, "last_triage", None)
+        ocr_pages = len(pages) - sum(quality.passed for quality in triage) if triage else len(pages)
+        cost = cost_per_page * ocr_pages
+    else:
+        cost = elapsed / 3600 * HOURLY_USD.get(args.device, HOURLY_USD["cuda"])
+    print(json.dumps({
+        "pages": len(pages),
+        "load": loaded_at - started,
+        "elapsed": elapsed,
+        "first_page": first_page_at,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "cost_usd": cost,
+        **score,
+    }))
+
+
+def run_engine(args, engine, pdf_path, reference):
+    command = [sys.executable, "-m", "benchmarks.bench_ocr", "--child", engine, "--device", args.device,
+               "--pdf", pdf_path, "--reference", reference]
+    if args.triage:
+        command.append("--triage")
+    process = subprocess.run(command, capture_output=True, text=True)
+    lines = process.stdout.splitlines()
+    if process.returncode != 0 or not lines:
+        error = (process.stderr.strip().splitlines() or [f"exit code {process.returncode}"])[-1]
+        return {"engine": engine, "pdf": pdf_path, "error": error}
+    return {"engine": engine, "pdf": pdf_path, **json.loads(lines[-1])}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--engines", nargs="+", choices=list(ENGINES), default=["text_layer"])
+    parser.add_argument("--device", default="cpu", help="cuda hoặc cpu")
+    parser.add_argument("--corpus", action="append", metavar="PDF=MARKDOWN",
+                        help=f"PDF và markdown tham chiếu, lặp lại được (mặc định {DEFAULT_CORPUS[0]})")
+    parser.add_argument("--triage", action="store_true", help="Trích thẳng trang có lớp text tốt (ocr.text_layer)")
+    parser.add_argument("--min-f1", type=float, help="Trả mã lỗi nếu F1 ô số của một engine thấp hơn ngưỡng")
+    parser.add_argument("--json", help="Ghi toàn bộ kết quả ra file JSON")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--pdf", help=argparse.SUPPRESS)
+    parser.add_argument("--reference", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        sys.exit(0)
+
+    results = []
+    for item in args.corpus or DEFAULT_CORPUS:
+        pdf_path, reference = item.split("=", 1)
+        for engine in args.engines:
+            result = run_engine(args, engine, pdf_path, reference)
+            results.append(result)
+            if "error" in result:
+                print(f"{engine:<11} {os.path.basename(pdf_path)}  lỗi: {result['error']}")
+                continue
+            print(f"{engine:<11} {os.path.basename(pdf_path)}  {result['pages']} trang  nạp={result['load']:6.2f}s  "
+                  f"{result['pages'] / result['elapsed']:6.2f} trang/s  trang đầu={result['first_page']:6.2f}s  "
+                  f"RSS đỉnh={result['max_rss_mb']:7.1f}MB  chi phí={result['cost_usd']:.4f} USD  "
+                  f"ô số P={result['precision']:.3f} R={result['recall']:.3f} F1={result['f1']:.3f} "
+                  f"({result['matched']}/{result['reference_cells']})")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    if args.min_f1 is not None:
+        failed = [result for result in results if "error" in result or result["f1"] < args.min_f1]
+        if failed:
+            print(f"{len(failed)} kết quả lỗi hoặc F1 < {args.min_f1}")
+            sys.exit(1)
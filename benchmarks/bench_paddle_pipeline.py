@@ -0,0 +1,74 @@
+"""So sánh PaddleOCR-VL từng trang (layout xong mới nhận dạng) với `ocr.paddle.pipelined.PaddlePipeline`.
+
+Chạy offline: model layout giả (ngủ `--layout-ms` mỗi trang, trả `--blocks` khối trong
+đó có một bảng) và server VL giả `benchmarks/fake_openai_vl.py`. In thời gian, số
+trang/giây và số request đồng thời cao nhất mà server thấy:
+    python -m benchmarks.bench_paddle_pipeline
+    python -m benchmarks.bench_paddle_pipeline --pages 20 --layout-ms 400 --latency-ms 600 --depth 4 8 16
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from benchmarks.fake_openai_vl import start_server
+from ocr.paddle.pipelined import DEFAULT_PROMPT, PROMPTS, PaddlePipeline, block_markdown, detect_blocks
+
+
+class FakeLayoutResult:
+    def __init__(self, boxes):
+        self.json = {"res": {"boxes": boxes}}
+
+
+class FakeLayoutModel:
+    def __init__(self, seconds, blocks):
+        self.seconds = seconds
+        self.blocks = blocks
+
+    def predict(self, image):
+        time.sleep(self.seconds)
+        height = image.shape[0] // (self.blocks + 1)
+        boxes = [{"label": "table" if i == self.blocks - 1 else "text", "score": 0.9,
+                  "coordinate": [50, 50 + i * height, image.shape[1] - 50, 40 + (i + 1) * height]}
+                 for i in range(self.blocks)]
+        return [FakeLayoutResult([{"label": "header", "score": 0.9, "coordinate": [0, 0, 100, 40]}] + boxes)]
+
+
+def lockstep(pipeline, pages):
+    """Như `PaddleOCRVL.predict`: mỗi trang chạy layout rồi mới gửi các khối của trang đó."""
+    with ThreadPoolExecutor(max_workers=pipeline.depth) as pool:
+        for page_number, image in pages:
+            blocks = detect_blocks(pipeline.layout_model, image)
+            contents = pool.map(lambda block: pipeline.client.recognize(
+                image.crop(block.box), PROMPTS.get(block.label, DEFAULT_PROMPT)), blocks)
+            yield page_number, "\n\n".join(block_markdown(block, content) for block, content in zip(blocks, contents))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=12)
+    parser.add_argument("--blocks", type=int, default=6, help="Số khối mỗi trang")
+    parser.add_argument("--layout-ms", type=float, default=300.0)
+    parser.add_argument("--latency-ms", type=float, default=400.0, help="Thời gian server xử lý một khối")
+    parser.add_argument("--depth", type=int, nargs="+", default=[8, 16])
+    args = parser.parse_args()
+
+    page_image = Image.new("RGB", (1190, 1684), "white")  # A4 ở 144 dpi
+    pages = [(page_number, page_image) for page_number in range(1, args.pages + 1)]
+    layout_model = FakeLayoutModel(args.layout_ms / 1000, args.blocks)
+
+    for depth in args.depth:
+        for mode in ("từng trang", "pipeline"):
+            server, state, base_url = start_server(latency=args.latency_ms / 1000)
+            pipeline = PaddlePipeline(base_url, layout_model, depth=depth)
+            try:
+                started = time.perf_counter()
+                results = list(lockstep(pipeline, pages) if mode == "từng trang" else pipeline.iter_pages(pages))
+                elapsed = time.perf_counter() - started
+            finally:
+                pipeline.close()
+                server.shutdown()
+            assert [page for page, _ in results] == list(range(1, args.pages + 1))
+            print(f"depth={depth:<3} {mode:<10} tổng={elapsed:6.2f}s  {args.pages / elapsed:5.2f} trang/s  "
+                  f"request đồng thời cao nhất={state.peak}")
@@ -0,0 +1,65 @@
+"""So sánh render toàn bộ PDF trước (`convert_from_path`) với `ocr.page_source.PageStream`.
+
+Mỗi chế độ chạy trong một tiến trình riêng để đo bộ nhớ đỉnh (ru_maxrss). `--work-ms`
+giả lập thời gian OCR mỗi trang, cho thấy render trước chạy song song với inference:
+    python -m benchmarks.bench_page_source
+    python -m benchmarks.bench_page_source --dpi 300 --work-ms 500 --prefetch 2
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+DEFAULT_PDF = "ocr/FPT_Baocaotaichinh_Q3_2025_Congtyme.pdf"
+
+
+def run_child(args):
+    """Chạy một chế độ trong tiến trình hiện tại, in kết quả JSON."""
+    started = time.perf_counter()
+    first_page_at = None
+    pages = 0
+    if args.child == "eager":
+        from pdf2image import convert_from_path
+
+        images = iter(convert_from_path(args.pdf, dpi=args.dpi))
+    else:
+        from ocr.page_source import iter_pages
+
+        images = iter_pages(args.pdf, dpi=args.dpi, workers=args.workers, prefetch=args.prefetch)
+    for image in images:
+        if first_page_at is None:
+            first_page_at = time.perf_counter() - started
+        image.load()
+        pages += 1
+        time.sleep(args.work_ms / 1000)
+    print(json.dumps({
+        "pages": pages,
+        "elapsed": time.perf_counter() - started,
+        "first_page": first_page_at,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf", default=DEFAULT_PDF)
+    parser.add_argument("--dpi", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--prefetch", type=int, default=4)
+    parser.add_argument("--work-ms", type=float, default=0.0, help="Thời gian OCR giả lập mỗi trang")
+    parser.add_argument("--child", choices=["eager", "stream"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        sys.exit(0)
+
+    for mode in ("eager", "stream"):
+        command = [sys.executable, "-m", "benchmarks.bench_page_source", "--child", mode, "--pdf", args.pdf,
+                   "--dpi", str(args.dpi), "--workers", str(args.workers), "--prefetch", str(args.prefetch),
+                   "--work-ms", str(args.work_ms)]
+        result = json.loads(subprocess.run(command, capture_output=True, text=True, check=True).stdout.splitlines()[-1])
+        print(f"{mode:<7} {result['pages']} trang  tổng={result['elapsed']:6.2f}s  trang đầu={result['first_page']:5.2f}s  "
+              f"RSS đỉnh={result['max_rss_mb']:7.1f}MB")
@@ -0,0 +1,57 @@
+"""Tỉ lệ câu hỏi được bộ phân tích theo luật xử lý (không cần LLM) trên một tập query mẫu.
+
+Mỗi dòng của corpus là {"query": ..., "expected": [[mã, năm, kỳ, quý, loại], ...]},
+hoặc "expected": null nếu câu đó cần LLM:
+    python -m benchmarks.bench_query_parser
+    python -m benchmarks.bench_query_parser --corpus path/to/queries.jsonl -v
+"""
+import argparse
+import json
+import os
+import time
+
+from query_parser import parse_query
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "fixtures", "queries.jsonl")
+
+
+def as_rows(intent):
+    return [[r.stock_code, r.year, r.period, r.quarter, r.consolidation_status] for r in intent.requests]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("-v", "--verbose", action="store_true", help="In các câu bị bỏ lỡ hoặc phân tích sai")
+    args = parser.parse_args()
+
+    with open(args.corpus, encoding="utf-8") as f:
+        corpus = [json.loads(line) for line in f if line.strip()]
+
+    hits = correct = wrong = missed = 0
+    elapsed = 0.0
+    for item in corpus:
+        start = time.perf_counter()
+        intent = parse_query(item["query"])
+        elapsed += time.perf_counter() - start
+        expected = item.get("expected")
+        if intent is None:
+            if expected is not None:
+                missed += 1
+                if args.verbose:
+                    print(f"Bỏ lỡ: {item['query']}")
+            continue
+        hits += 1
+        if expected is not None and as_rows(intent) == expected:
+            correct += 1
+        else:
+            wrong += 1
+            if args.verbose:
+                print(f"Sai: {item['query']} -> {as_rows(intent)}")
+
+    answerable = sum(1 for item in corpus if item.get("expected") is not None)
+    print(f"Tổng {len(corpus)} câu, {answerable} câu có thể xử lý bằng luật")
+    print(f"Hit rate: {hits / len(corpus):.1%} ({hits}/{len(corpus)}), "
+          f"độ phủ trên câu xử lý được: {correct / max(answerable, 1):.1%}")
+    print(f"Đúng: {correct}, sai: {wrong}, bỏ lỡ: {missed}")
+    print(f"Thời gian trung bình: {elapsed / len(corpus) * 1e6:.1f}µs/câu")
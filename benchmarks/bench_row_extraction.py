@@ -0,0 +1,69 @@
+"""Micro-benchmark đọc danh sách báo cáo: từng phần tử (cách cũ) so với một lần evaluate.
+
+Chạy trên trang danh sách đã lưu `benchmarks/fixtures/listing_FPT.html`:
+    python -m benchmarks.bench_row_extraction -r 20
+"""
+import argparse
+import os
+import statistics
+import time
+
+import regex as re
+from playwright.sync_api import sync_playwright
+
+from nodes.extract_link import EXTRACT_ROWS_JS, REPORT_ROW_SELECTOR, parse_report_rows
+
+FIXTURE_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "listing_FPT.html")
+BASE_URL = "https://finance.vietstock.vn"
+
+
+def extract_per_element(page):
+    """Cách cũ: query_selector/inner_text/get_attribute cho từng dòng."""
+    scraped_reports = []
+    for row in page.query_selector_all(REPORT_ROW_SELECTOR):
+        title_element = row.query_selector("a")
+        if title_element:
+            title = title_element.inner_text().strip()
+            link = title_element.get_attribute('href')
+            if link and not link.startswith('http'):
+                link = BASE_URL + link
+            cleaned_title = re.sub(r'\s*\d{2}/\d{2}/\d{4}\s+\d{2}:\d{2}\s*$', '', title)
+            scraped_reports.append({"title": cleaned_title, "link": link})
+    return scraped_reports
+
+
+def extract_batched(page):
+    return parse_report_rows(page.eval_on_selector_all(REPORT_ROW_SELECTOR, EXTRACT_ROWS_JS), BASE_URL)
+
+
+def measure(fn, page, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(page)
+        timings.append(time.perf_counter() - start)
+    return result, timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-r", "--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with open(FIXTURE_PATH, encoding="utf-8") as f:
+        html = f.read()
+
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        page = browser.new_page()
+        page.set_content(html)
+        legacy, legacy_timings = measure(extract_per_element, page, args.repeat)
+        batched, batched_timings = measure(extract_batched, page, args.repeat)
+        browser.close()
+
+    batched_pairs = [{"title": report["title"], "link": report["link"]} for report in batched]
+    assert legacy == batched_pairs, "Hai cách trích xuất cho kết quả khác nhau"
+    print(f"{len(batched)} dòng, {args.repeat} lần lặp")
+    for label, timings in (("per-element", legacy_timings), ("batched", batched_timings)):
+        print(f"{label:<12} p50={statistics.median(timings) * 1000:8.2f}ms  "
+              f"mean={statistics.mean(timings) * 1000:8.2f}ms")
@@ -0,0 +1,86 @@
+"""Đo thời gian khởi động lạnh của agent.
+
+Mỗi lần đo chạy một tiến trình Python mới:
+- import: thời gian `import agent` (kèm các module nặng nhất theo `-X importtime`)
+- first prompt: từ lúc chạy `python agent.py` tới khi dòng "Truy vấn:" hiện ra
+- first graph: thời gian dựng graph lần đầu trong tiến trình
+    python -m benchmarks.bench_startup -n 5
+    python -m benchmarks.bench_startup --max-prompt-ms 800   # thoát mã 1 nếu chậm hơn
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROMPT = "Truy vấn:"
+
+
+def measure_import():
+    """Trả về (giây, [(micro giây tích luỹ, module)]) của `import agent`."""
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import agent"],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    elapsed = time.perf_counter() - started
+    modules = []
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            modules.append((int(parts[1]), parts[2].strip()))
+    return elapsed, modules
+
+
+def measure_first_prompt():
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-u", "agent.py"], cwd=ROOT, stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    output = b""
+    try:
+        while PROMPT.encode() not in output:
+            chunk = process.stdout.read1(1024)
+            if not chunk:
+                raise RuntimeError(f"agent.py kết thúc trước khi hỏi truy vấn: {output.decode(errors='replace')}")
+            output += chunk
+        return time.perf_counter() - started
+    finally:
+        process.kill()
+        process.wait()
+
+
+def measure_first_graph():
+    code = "import time, agent; s = time.perf_counter(); agent.get_graph('parallel'); print(time.perf_counter() - s)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def report(name, samples):
+    print(f"{name:<13} p50={statistics.median(samples) * 1000:8.1f}ms  "
+          f"min={min(samples) * 1000:8.1f}ms  max={max(samples) * 1000:8.1f}ms  n={len(samples)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", type=int, default=5, help="Số lần đo mỗi chỉ số")
+    parser.add_argument("--top", type=int, default=10, help="Số module nặng nhất cần in")
+    parser.add_argument("--max-prompt-ms", type=float, help="Ngưỡng p50 của first prompt, vượt thì thoát mã 1")
+    args = parser.parse_args()
+
+    import_samples, modules = [], []
+    for _ in range(args.n):
+        elapsed, modules = measure_import()
+        import_samples.append(elapsed)
+    prompt_samples = [measure_first_prompt() for _ in range(args.n)]
+    graph_samples = [measure_first_graph() for _ in range(args.n)]
+
+    report("import", import_samples)
+    report("first prompt", prompt_samples)
+    report("first graph", graph_samples)
+    print("\nModule tốn thời gian nhất khi import agent (tích luỹ, lần đo cuối):")
+    for cumulative, module in sorted(modules, reverse=True)[:args.top]:
+        print(f"  {cumulative / 1000:8.1f}ms  {module}")
+
+    if args.max_prompt_ms is not None and statistics.median(prompt_samples) * 1000 > args.max_prompt_ms:
+        print(f"\nfirst prompt vượt ngưỡng {args.max_prompt_ms:.0f}ms")
+        sys.exit(1)
@@ -0,0 +1,96 @@
+"""Đo kích thước checkpoint và chi phí mỗi bước của graph theo số yêu cầu trong một query.
+
+Chạy graph (chế độ serial và parallel) với LLM giả trả về N yêu cầu đã đủ thông
+tin, checkpointer SQLite như ở chế độ server, và index báo cáo đã được làm ấm
+để thời gian đo chủ yếu là chi phí của graph và state:
+    python -m benchmarks.bench_state
+    python -m benchmarks.bench_state --sizes 1 10 100 --mode serial
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import os
+import sqlite3
+import time
+import uuid
+
+from benchmarks.fake_vietstock import load_fixtures, start_server
+from benchmarks.stub_llm import StubIntentChain
+
+QUERY = "benchmark state {size}"
+PERIODS = [("Quý", 1), ("Quý", 2), ("Quý", 3), ("Quý", 4), ("6 tháng", None), ("Cả năm", None)]
+
+
+def build_requests(fixtures, size):
+    from pydantic_models import ReportRequest
+
+    # Chỉ lấy các mã có báo cáo hợp nhất để không phải hỏi lại
+    codes = [code for code, listings in sorted(fixtures.items())
+             if any("hợp nhất" in report["title"].lower() for report in next(iter(listings.values())))]
+    combinations = itertools.cycle(itertools.product(codes, (2023, 2024, 2025), PERIODS))
+    return [
+        ReportRequest(request_id=f"req_{i + 1}", stock_code=code, year=year, period=period,
+                      quarter=quarter, consolidation_status="Hợp nhất")
+        for i, (code, year, (period, quarter)) in zip(range(size), combinations)
+    ]
+
+
+def checkpoint_bytes(conn, thread_id):
+    checkpoints, latest, count = conn.execute(
+        "SELECT COALESCE(SUM(LENGTH(checkpoint) + LENGTH(metadata)), 0), MAX(LENGTH(checkpoint)), COUNT(*) "
+        "FROM checkpoints WHERE thread_id = ?", (thread_id,)).fetchone()
+    writes = conn.execute("SELECT COALESCE(SUM(LENGTH(value)), 0) FROM writes WHERE thread_id = ?",
+                          (thread_id,)).fetchone()[0]
+    return checkpoints + writes, latest, count, writes
+
+
+def run(mode, size, fixtures, repeats):
+    from langgraph.checkpoint.sqlite import SqliteSaver
+
+    from agent import build_graph
+    from nodes.extract_link import get_report_index
+    from nodes.process_query import set_intent_chain
+    from pydantic_models import AnalysisIntent
+
+    query = QUERY.format(size=size)
+    requests = build_requests(fixtures, size)
+    for request in requests:
+        get_report_index(request.stock_code, request.year)
+    set_intent_chain(StubIntentChain({query: AnalysisIntent(requests=requests, comparison_context="benchmark")}))
+
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    agent = build_graph(mode, clarification="interrupt", checkpointer=SqliteSaver(conn))
+    timings = []
+    for _ in range(repeats):
+        thread_id = uuid.uuid4().hex
+        config = {"configurable": {"thread_id": thread_id}, "max_concurrency": 4, "recursion_limit": 10 + 5 * size}
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            final_state = agent.invoke({"query": query}, config=config)
+        timings.append(time.perf_counter() - started)
+    assert len(final_state["collected_links"]) == size, final_state.get("collected_links")
+    total, latest, steps, writes = checkpoint_bytes(conn, thread_id)
+    elapsed = min(timings)
+    print(f"{mode:<9} requests={size:<4} steps={steps:<4} checkpoint tổng={total / 1024:9.1f}KB  "
+          f"lớn nhất={latest / 1024:7.1f}KB  writes={writes / 1024:8.1f}KB  thời gian={elapsed * 1000:8.1f}ms  mỗi bước={elapsed / steps * 1000:6.2f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--mode", choices=["serial", "parallel"], action="append")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    os.environ["REPORT_CACHE_DISABLED"] = "1"
+    os.environ["INTENT_CACHE_DISABLED"] = "1"
+    fixtures = load_fixtures()
+    server, base_url = start_server(fixtures=fixtures)
+    os.environ["VIETSTOCK_BASE_URL"] = base_url
+    try:
+        for mode in args.mode or ["serial", "parallel"]:
+            for size in args.sizes:
+                run(mode, size, fixtures, args.repeats)
+    finally:
+        server.shutdown()
@@ -0,0 +1,69 @@
+"""Tỉ lệ trang bỏ qua OCR nhờ lớp text (`ocr.text_layer`) và thời gian tiết kiệm được.
+
+Mặc định thời gian OCR mỗi trang là ước lượng `--ocr-seconds`; `--engine` chạy OCR
+thật trên mọi trang (cần model) để lấy thời gian từng trang:
+    python -m benchmarks.bench_text_layer
+    python -m benchmarks.bench_text_layer --engine vintern --device cpu DBC/DBC_marker_ocr.pdf
+"""
+import argparse
+import time
+from collections import Counter
+
+import pypdfium2 as pdfium
+
+DEFAULT_PDFS = ["ocr/FPT_Baocaotaichinh_Q3_2025_Congtyme.pdf", "DBC/DBC_marker_ocr.pdf"]
+
+
+def ocr_seconds_per_page(engine, pdf_path, page_numbers):
+    """Thời gian OCR từng trang khi chạy engine trên mọi trang."""
+    timings = {}
+    started = time.perf_counter()
+    for page, _ in engine.iter_page_markdown(pdf_path, page_numbers):
+        now = time.perf_counter()
+        timings[page] = now - started
+        started = now
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pdfs", nargs="*", default=DEFAULT_PDFS)
+    parser.add_argument("--ocr-seconds", type=float, default=10.0, help="Thời gian OCR ước lượng mỗi trang")
+    parser.add_argument("--engine", help="Đo thời gian OCR thật bằng engine này thay vì ước lượng")
+    parser.add_argument("--device", default=None)
+    args = parser.parse_args()
+
+    from ocr.text_layer import triage
+
+    engine = None
+    if args.engine:
+        from ocr.engines import load_engine
+        engine = load_engine(args.engine, args.device, text_layer=False)
+
+    total_pages = total_skipped = 0
+    total_saved = 0.0
+    for pdf_path in args.pdfs:
+        with pdfium.PdfDocument(pdf_path) as pdf:
+            page_numbers = list(range(1, len(pdf) + 1))
+        started = time.perf_counter()
+        results = list(triage(pdf_path, page_numbers))
+        triage_seconds = time.perf_counter() - started
+        skipped = [quality.page for quality, _ in results if quality.passed]
+        reasons = Counter(quality.reason for quality, _ in results if not quality.passed)
+        if engine is not None:
+            timings = ocr_seconds_per_page(engine, pdf_path, page_numbers)
+            saved = sum(timings[page] for page in skipped) - triage_seconds
+            ocr_total = sum(timings.values())
+        else:
+            saved = len(skipped) * args.ocr_seconds - triage_seconds
+            ocr_total = len(page_numbers) * args.ocr_seconds
+        total_pages += len(page_numbers)
+        total_skipped += len(skipped)
+        total_saved += saved
+        print(f"{pdf_path}: {len(skipped)}/{len(page_numbers)} trang bỏ qua OCR ({len(skipped) / len(page_numbers):.0%}), "
+              f"lọc + trích {triage_seconds / len(page_numbers) * 1000:.1f}ms/trang, "
+              f"tiết kiệm {saved:.1f}s / {ocr_total:.1f}s OCR"
+              + (f", OCR vì: {dict(reasons)}" if reasons else ""))
+    basis = f"engine {args.engine}" if engine is not None else f"ước lượng {args.ocr_seconds:g}s/trang"
+    print(f"Tổng: {total_skipped}/{total_pages} trang bỏ qua ({total_skipped / total_pages:.0%}), "
+          f"tiết kiệm {total_saved:.1f}s ({basis})")
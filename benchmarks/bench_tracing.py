@@ -0,0 +1,50 @@
+"""Đo chi phí của lớp tracing trên một node rỗng.
+
+So sánh gọi node trực tiếp, qua `traced_node` khi không bật sink nào, và khi
+bật sink histogram (kèm một span con):
+    python -m benchmarks.bench_tracing -n 200000
+"""
+import argparse
+import time
+
+from pydantic_models import ReportRequest
+from tracing import HistogramSink, Tracer, set_tracer, span, traced_node
+
+
+def empty_node(state):
+    return {"pending_requests": 1}
+
+
+def node_with_child_span(state):
+    with span("child"):
+        return {"pending_requests": 1}
+
+
+def measure(func, state, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func(state)
+    return (time.perf_counter() - started) / iterations
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", type=int, default=200000)
+    args = parser.parse_args()
+    request = ReportRequest(request_id="req_1", stock_code="FPT", year=2024, period="Cả năm")
+    state = {"current": {"request": request}}
+
+    set_tracer(Tracer([]))
+    cases = [
+        ("trực tiếp", empty_node),
+        ("traced, tắt", traced_node("empty", empty_node)),
+        ("traced + span con, tắt", traced_node("empty", node_with_child_span)),
+    ]
+    results = [(name, measure(func, state, args.n)) for name, func in cases]
+    set_tracer(Tracer([HistogramSink()]))
+    results.append(("traced, histogram", measure(traced_node("empty", empty_node), state, args.n)))
+    results.append(("traced + span con, histogram", measure(traced_node("empty", node_with_child_span), state, args.n)))
+
+    baseline = results[0][1]
+    for name, per_call in results:
+        print(f"{name:<30} {per_call * 1e9:9.0f} ns/lần  (+{(per_call - baseline) * 1e9:7.0f} ns)")
@@ -0,0 +1,47 @@
+"""Đo số trang/giây của Vintern khi chạy từng trang và khi ghép tile nhiều trang vào một lô.
+
+Nạp model một lần, render `--pages` trang đầu của PDF, rồi chạy lần lượt từng
+ngân sách tile (0 = từng trang bằng `chat`) với chế độ giải mã đã chọn. Với
+`--decoding greedy` in thêm số trang có kết quả khác với chạy từng trang:
+    python -m benchmarks.bench_vintern_batch --device cpu --pages 4 --budgets 0 14 28 --decoding greedy
+    python -m benchmarks.bench_vintern_batch --device cuda --pages 12 --budgets 0 14 28 56
+"""
+import argparse
+import time
+
+DEFAULT_PDF = "ocr/FPT_Baocaotaichinh_Q3_2025_Congtyme.pdf"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf", default=DEFAULT_PDF)
+    parser.add_argument("--pages", type=int, default=4, help="Số trang đầu của PDF dùng để đo")
+    parser.add_argument("--budgets", type=int, nargs="+", default=[0, 14, 28], help="Số tile tối đa mỗi lô, 0 = từng trang")
+    parser.add_argument("--decoding", choices=["greedy", "beam"], default="greedy")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--max-new-tokens", type=int, help="Giới hạn số token sinh ra mỗi trang (rút ngắn thời gian đo)")
+    args = parser.parse_args()
+
+    from pdf2image import convert_from_path
+
+    from ocr.vintern.vintern_ocr import VinternEngine
+
+    pages = convert_from_path(args.pdf, first_page=1, last_page=args.pages)
+    started = time.perf_counter()
+    engine = VinternEngine(device=args.device, decoding=args.decoding)
+    print(f"Nạp model: {time.perf_counter() - started:.1f}s, {len(pages)} trang, giải mã {args.decoding}, {args.device}")
+    if args.max_new_tokens:
+        engine.generation_config = {**engine.generation_config, "max_new_tokens": args.max_new_tokens}
+
+    baseline = None
+    for budget in args.budgets:
+        engine.tile_budget = budget
+        started = time.perf_counter()
+        responses = engine.convert_pages(pages)
+        elapsed = time.perf_counter() - started
+        line = f"tile_budget={budget:<4} {len(pages) / elapsed:6.3f} trang/s  ({elapsed:7.1f}s)"
+        if baseline is None:
+            baseline = responses
+        elif args.decoding == "greedy":
+            line += f"  khác chạy từng trang: {sum(a != b for a, b in zip(responses, baseline))}/{len(pages)} trang"
+        print(line)
@@ -0,0 +1,173 @@
+"""Đo thời gian tiền xử lý một trang cho Vintern: cắt tile bằng PIL + transform từng tile so với `ocr.vintern.preprocess`.
+
+Mặc định dùng ảnh trang A4 tổng hợp ở DPI đã chọn (dọc và ngang); `--pdf` để dùng
+các trang render từ PDF thật (cần poppler). Kiểm tra luôn hai cách cho tensor giống hệt nhau:
+    python -m benchmarks.bench_vintern_preprocess
+    python -m benchmarks.bench_vintern_preprocess --pdf ocr/FPT_Baocaotaichinh_Q3_2025_Congtyme.pdf --max-num 6
+"""
+import argparse
+import time
+
+import torch
+import torchvision.transforms as T
+from PIL import Image, ImageDraw
+from torchvision.transforms.functional import InterpolationMode
+
+A4_INCHES = (8.27, 11.69)
+# Như trong vintern_ocr.py cũ; không lấy từ ocr.vintern.preprocess để hai cách độc lập với nhau
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+
+def synthetic_pages(dpi):
+    width, height = int(A4_INCHES[0] * dpi), int(A4_INCHES[1] * dpi)
+    pages = []
+    for size in ((width, height), (height, width)):
+        image = Image.new("RGB", size, "white")
+        draw = ImageDraw.Draw(image)
+        for y in range(0, size[1], 40):
+            draw.line((0, y, size[0], y), fill=(y % 256, 0, 0), width=2)
+        pages.append(image)
+    return pages
+
+
+# Bản gốc trong vintern_ocr.py (theo model card Vintern), chép nguyên văn làm mốc so sánh
+def build_transform(input_size):
+    MEAN, STD = IMAGENET_MEAN, IMAGENET_STD
+    transform = T.Compose([
+        T.Lambda(lambda img: img.convert('RGB') if img.mode != 'RGB' else img),
+        T.Resize((input_size, input_size), interpolation=InterpolationMode.BICUBIC),
+        T.ToTensor(),
+        T.Normalize(mean=MEAN, std=STD)
+    ])
+    return transform
+
+def find_closest_aspect_ratio(aspect_ratio, target_ratios, width, height, image_size):
+    best_ratio_diff = float('inf')
+    best_ratio = (1, 1)
+    area = width * height
+    for ratio in target_ratios:
+        target_aspect_ratio = ratio[0] / ratio[1]
+        ratio_diff = abs(aspect_ratio - target_aspect_ratio)
+        if ratio_diff < best_ratio_diff:
+            best_ratio_diff = ratio_diff
+            best_ratio = ratio
+        elif ratio_diff == best_ratio_diff:
+            if area > 0.5 * image_size * image_size * ratio[0] * ratio[1]:
+                best_ratio = ratio
+    return best_ratio
+
+def dynamic_preprocess(image, min_num=1, max_num=12, image_size=448, use_thumbnail=False):
+    orig_width, orig_height = image.size
+    aspect_ratio = orig_width / orig_height
+
+    # calculate the existing image aspect ratio
+    target_ratios = set(
+        (i, j) for n in range(min_num, max_num + 1) for i in range(1, n + 1) for j in range(1, n + 1) if
+        i * j <= max_num and i * j >= min_num)
+    target_ratios = sorted(target_ratios, key=lambda x: x[0] * x[1])
+
+    # find the closest aspect ratio to the target
+    target_aspect_ratio = find_closest_aspect_ratio(
+        aspect_ratio, target_ratios, orig_width, orig_height, image_size)
+
+    # calculate the target width and height
+    target_width = image_size * target_aspect_ratio[0]
+    target_height = image_size * target_aspect_ratio[1]
+    blocks = target_aspect_ratio[0] * target_aspect_ratio[1]
+
+    # resize the image
+    resized_img = image.resize((target_width, target_height))
+    processed_images = []
+    for i in range(blocks):
+        box = (
+            (i % (target_width // image_size)) * image_size,
+            (i // (target_width // image_size)) * image_size,
+            ((i % (target_width // image_size)) + 1) * image_size,
+            ((i // (target_width // image_size)) + 1) * image_size
+        )
+        # split the image
+        split_img = resized_img.crop(box)
+        processed_images.append(split_img)
+    assert len(processed_images) == blocks
+    if use_thumbnail and len(processed_images) != 1:
+        thumbnail_img = image.resize((image_size, image_size))
+        processed_images.append(thumbnail_img)
+    return processed_images
+
+
+def legacy_preprocess(image, max_num):
+    image = image.convert('RGB')
+    transform = build_transform(input_size=448)
+    images = dynamic_preprocess(image, image_size=448, use_thumbnail=True, max_num=max_num)
+    return torch.stack([transform(tile) for tile in images])
+
+
+def check_grid_search(max_num):
+    """`closest_grid` chọn đúng lưới như vòng tìm tỉ lệ gốc, trên nhiều kích thước trang."""
+    from ocr.vintern.preprocess import closest_grid
+
+    sizes = [(width, height) for width in range(100, 4001, 37) for height in range(100, 4001, 41)]
+    # Các kích thước có tỉ lệ trùng khớp một lưới (hoà nhau giữa các lưới)
+    sizes += [(448 * columns * scale, 448 * rows * scale) for columns in range(1, 13) for rows in range(1, 13)
+              for scale in (0.25, 0.5, 1, 2)]
+    for min_num in (1, 2):
+        for size in sizes:
+            width, height = int(size[0]), int(size[1])
+            target_ratios = sorted(set(
+                (i, j) for n in range(min_num, max_num + 1) for i in range(1, n + 1) for j in range(1, n + 1) if
+                i * j <= max_num and i * j >= min_num), key=lambda x: x[0] * x[1])
+            expected = find_closest_aspect_ratio(width / height, target_ratios, width, height, 448)
+            assert closest_grid(width, height, min_num, max_num, 448) == expected, (size, min_num)
+    return len(sizes) * 2
+
+
+def resize_only(image, max_num):
+    """Hai lần resize bicubic (lưới tile và thumbnail) mà cả hai cách đều phải làm."""
+    from ocr.vintern.preprocess import closest_grid
+
+    columns, rows = closest_grid(*image.size, 1, max_num, 448)
+    image.resize((448 * columns, 448 * rows))
+    image.resize((448, 448))
+
+
+def measure(func, pages, max_num, repeats):
+    timings = []
+    for _ in range(repeats):
+        for page in pages:
+            started = time.perf_counter()
+            func(page, max_num)
+            timings.append(time.perf_counter() - started)
+    timings.sort()
+    return timings[len(timings) // 2], timings[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf", help="Dùng các trang của PDF này thay vì ảnh tổng hợp")
+    parser.add_argument("--dpi", type=int, default=200)
+    parser.add_argument("--max-num", type=int, default=6, help="Số tile tối đa mỗi trang (vintern_ocr dùng 6)")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    from ocr.vintern.preprocess import preprocess_image
+
+    if args.pdf:
+        from pdf2image import convert_from_path
+        pages = convert_from_path(args.pdf, dpi=args.dpi)
+    else:
+        pages = synthetic_pages(args.dpi)
+
+    vectorized = lambda page, max_num: preprocess_image(page, max_num=max_num)
+    for page in pages:
+        assert torch.equal(legacy_preprocess(page, args.max_num), vectorized(page, args.max_num))
+    print(f"{len(pages)} trang, {pages[0].size[0]}x{pages[0].size[1]}, max_num={args.max_num}: kết quả giống hệt; "
+          f"chọn lưới khớp bản gốc trên {check_grid_search(args.max_num)} kích thước")
+    resize_best = measure(resize_only, pages, args.max_num, args.repeats)[1]
+    results = [("PIL + Compose", measure(legacy_preprocess, pages, args.max_num, args.repeats)),
+               ("preprocess", measure(vectorized, pages, args.max_num, args.repeats))]
+    print(f"{'resize PIL':<14} min={resize_best * 1000:7.1f}ms/trang (chung cho cả hai cách)")
+    for name, (median, best) in results:
+        print(f"{name:<14} p50={median * 1000:7.1f}ms/trang  min={best * 1000:7.1f}ms  "
+              f"không tính resize: min={(best - resize_best) * 1000:6.1f}ms")
+    print(f"nhanh hơn {results[0][1][0] / results[1][1][0]:.2f} lần (p50)")
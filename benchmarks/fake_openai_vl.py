@@ -0,0 +1,108 @@
+"""Server VL giả lập với endpoint OpenAI-compatible `/v1/chat/completions`, để kiểm thử `ocr/paddle/pipelined.py`.
+
+Trả nội dung theo prompt của PaddleOCR-VL ("Table Recognition:" trả bảng OTSL,
+"Formula Recognition:" trả công thức, còn lại trả một đoạn văn) sau `latency` giây.
+`slots` giới hạn số request được xử lý cùng lúc như số sequence của vLLM (0: không
+giới hạn); `error_rate` trả 503 ngẫu nhiên. Server ghi lại số request đồng thời cao nhất:
+
+    python -m benchmarks.fake_openai_vl --port 8118 --latency-ms 300 --slots 16
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TABLE_OTSL = "<fcel>Chỉ tiêu<fcel>Mã số<fcel>Số cuối kỳ<nl><fcel>Tiền<fcel>111<fcel>1.000<nl><fcel>Hàng tồn kho<fcel>141<ecel><nl>"
+RESPONSES = {
+    "Table Recognition:": TABLE_OTSL,
+    "Formula Recognition:": "x = a + b",
+    "Chart Recognition:": "| Năm | Doanh thu |\n|---|---|\n| 2025 | 100 |",
+}
+DEFAULT_RESPONSE = "Báo cáo tài chính quý 3 năm 2025."
+
+
+class FakeVLState:
+    def __init__(self, latency=0.3, slots=0, error_rate=0.0, seed=0):
+        self.latency = latency
+        self.slots = threading.Semaphore(slots) if slots else None
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+        self.requests = 0
+        self.errors = 0
+
+
+class FakeVLHandler(BaseHTTPRequestHandler):
+    state: FakeVLState = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        state = self.state
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._send(404, {"error": {"message": "Not found"}})
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        prompt = next((part["text"] for message in request["messages"] for part in message["content"]
+                       if part.get("type") == "text"), "")
+        with state.lock:
+            state.requests += 1
+            if state.random.random() < state.error_rate:
+                state.errors += 1
+                return self._send(503, {"error": {"message": "Service unavailable"}})
+        if state.slots:
+            state.slots.acquire()
+        try:
+            with state.lock:
+                state.active += 1
+                state.peak = max(state.peak, state.active)
+            time.sleep(state.latency)
+            with state.lock:
+                state.active -= 1
+        finally:
+            if state.slots:
+                state.slots.release()
+        self._send(200, {
+            "id": f"chatcmpl-{state.requests}",
+            "object": "chat.completion",
+            "model": request.get("model"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": RESPONSES.get(prompt, DEFAULT_RESPONSE)}}],
+        })
+
+
+def start_server(port=0, **options):
+    """Khởi động server trong thread nền, trả về (server, state, base_url kèm /v1)."""
+    state = FakeVLState(**options)
+    handler = type("Handler", (FakeVLHandler,), {"state": state})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Server VL giả lập (OpenAI-compatible)")
+    parser.add_argument("--port", type=int, default=8118)
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="Thời gian xử lý mỗi request")
+    parser.add_argument("--slots", type=int, default=0, help="Số request xử lý cùng lúc tối đa (0: không giới hạn)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Tỉ lệ request trả 503")
+    args = parser.parse_args()
+    server, state, base_url = start_server(args.port, latency=args.latency_ms / 1000, slots=args.slots,
+                                           error_rate=args.error_rate)
+    print(f"Đang phục vụ tại {base_url} (đặt PADDLE_VL_SERVER_URL={base_url})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
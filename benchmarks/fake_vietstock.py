@@ -0,0 +1,133 @@
+"""Site Vietstock giả lập để benchmark/kiểm thử offline.
+
+Phục vụ trang `/{CODE}/tai-tai-lieu.htm` với cùng cấu trúc DOM mà
+`extract_report_link_node` đọc (select.dropdown-year, div.p-t-xs p.i-b-d a),
+dữ liệu lấy từ `benchmarks/fixtures/vietstock_reports.json`. Khi đổi năm trong
+dropdown, trang gọi endpoint `/data/documents` của site giả để tải lại danh sách
+(endpoint này chỉ có ở đây, không phải XHR của vietstock.vn).
+
+Chạy độc lập: python -m benchmarks.fake_vietstock --port 8765
+"""
+import argparse
+import html
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+FIXTURE_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "vietstock_reports.json")
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="vi">
+<head>
+<meta charset="utf-8">
+<title>{code} - Tải tài liệu</title>
+<link rel="stylesheet" href="/static/site.css">
+</head>
+<body>
+<img src="/static/logo.png" alt="logo">
+<select class="dropdown-year">{options}</select>
+<div id="doc-list" class="p-t-xs">{rows}</div>
+<script>
+document.querySelector("select.dropdown-year").addEventListener("change", function (e) {{
+    fetch("/data/documents?code={code}&doctype=1&year=" + e.target.value)
+        .then(function (r) {{ return r.text(); }})
+        .then(function (body) {{ document.getElementById("doc-list").innerHTML = body; }});
+}});
+</script>
+</body>
+</html>"""
+
+NOT_FOUND_PAGE = "<!DOCTYPE html><html><body><h1>Không tìm thấy mã chứng khoán</h1></body></html>"
+
+STATIC_FILES = {
+    "/static/site.css": ("text/css", b"@font-face{font-family:x;src:url(/static/font.woff2)} body{font-family:x}"),
+    "/static/logo.png": ("image/png", b"\x89PNG\r\n\x1a\n" + b"\0" * 2048),
+    "/static/font.woff2": ("font/woff2", b"\0" * 4096),
+}
+
+
+def load_fixtures(path=FIXTURE_PATH):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def render_rows(reports):
+    rows = []
+    for report in reports:
+        rows.append(
+            f'<p class="i-b-d"><a href="{html.escape(report["href"])}" target="_blank">'
+            f'{html.escape(report["title"])} <span class="pull-right">{report["published"]}</span></a></p>'
+        )
+    return "\n".join(rows)
+
+
+def render_page(code, listings):
+    years = sorted(listings, reverse=True)
+    options = "".join(f'<option value="{y}">{y}</option>' for y in years)
+    return PAGE_TEMPLATE.format(code=code, options=options, rows=render_rows(listings[years[0]]))
+
+
+class FakeVietstockHandler(BaseHTTPRequestHandler):
+    fixtures = {}
+    latency = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, content_type, body):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.latency:
+            time.sleep(self.latency)
+        parsed = urlparse(self.path)
+        if parsed.path in STATIC_FILES:
+            content_type, body = STATIC_FILES[parsed.path]
+            return self._send(200, content_type, body)
+
+        if parsed.path == "/data/documents":
+            params = parse_qs(parsed.query)
+            code = params.get("code", [""])[0].upper()
+            year = params.get("year", [""])[0]
+            listings = self.fixtures.get(code, {})
+            return self._send(200, "text/html; charset=utf-8", render_rows(listings.get(year, [])))
+
+        parts = parsed.path.strip("/").split("/")
+        if len(parts) == 2 and parts[1] == "tai-tai-lieu.htm":
+            code = parts[0].upper()
+            if code in self.fixtures:
+                return self._send(200, "text/html; charset=utf-8", render_page(code, self.fixtures[code]))
+        return self._send(404, "text/html; charset=utf-8", NOT_FOUND_PAGE)
+
+
+def start_server(port=0, latency=0.0, fixtures=None):
+    """Khởi động site giả lập trong thread nền, trả về (server, base_url)."""
+    handler = type("Handler", (FakeVietstockHandler,), {
+        "fixtures": fixtures if fixtures is not None else load_fixtures(),
+        "latency": latency,
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Site Vietstock giả lập")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Độ trễ giả lập cho mỗi response")
+    args = parser.parse_args()
+    server, base_url = start_server(args.port, args.latency_ms / 1000)
+    print(f"Đang phục vụ tại {base_url} (đặt VIETSTOCK_BASE_URL={base_url})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,94 @@
+"""Đo throughput của graph bất đồng bộ khi phục vụ nhiều query cùng lúc.
+
+Dùng site Vietstock giả lập và LLM giả (độ trễ cố định), tắt cache báo cáo và
+cache intent, rồi chạy cùng một tập query ở các mức đồng thời khác nhau:
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --levels 1 10 50 --queries 100 --llm-latency-ms 500
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import statistics
+import time
+
+from benchmarks.fake_vietstock import load_fixtures, start_server
+from benchmarks.stub_llm import StubIntentChain
+from pydantic_models import AnalysisIntent, ReportRequest
+
+PERIOD_CHOICES = [("Quý", 1), ("Quý", 2), ("Quý", 3), ("6 tháng", None), ("Cả năm", None)]
+
+
+def build_workload(fixtures, count, seed=0):
+    """Sinh `count` query cùng intent tương ứng; mỗi query hỏi 1-3 mã trong fixture.
+
+    Câu query cố ý có từ lạ để bộ phân tích theo luật bỏ qua và phải gọi LLM."""
+    rng = random.Random(seed)
+    codes = sorted(fixtures)
+    intents = {}
+    queries = []
+    for i in range(count):
+        selected = rng.sample(codes, rng.randint(1, 3))
+        year = rng.choice([2023, 2024, 2025])
+        period, quarter = rng.choice(PERIOD_CHOICES)
+        query = f"#{i} xem giúp {' và '.join(selected)} {period} {quarter or ''} {year} cảm ơn"
+        intents[query] = AnalysisIntent(
+            requests=[ReportRequest(request_id=f"req_{n + 1}", stock_code=code, year=year, period=period,
+                                    quarter=quarter, consolidation_status="Hợp nhất")
+                      for n, code in enumerate(selected)],
+            comparison_context=f"Benchmark query {i}",
+        )
+        queries.append(query)
+    return queries, intents
+
+
+async def run_level(queries, concurrency, args):
+    from batch import run_batch
+    from nodes.extract_link import _index_registry
+
+    # Mỗi mức bắt đầu với index rỗng để các mức so sánh được với nhau
+    _index_registry.clear()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = await run_batch([{"query": query} for query in queries], max_concurrency=concurrency,
+                                  max_pages=args.max_pages, max_llm_calls=args.max_llm_calls)
+    elapsed = time.perf_counter() - started
+    failed = [result for result in results if "error" in result or not result.get("collected_links")]
+    latencies = sorted(result["elapsed"] for result in results)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f"concurrency={concurrency:<4} queries={len(queries):<5} "
+          f"throughput={len(queries) / elapsed:8.2f} q/s  "
+          f"p50={statistics.median(latencies) * 1000:8.1f}ms  p95={p95 * 1000:8.1f}ms  failed={len(failed)}")
+
+
+async def main(args):
+    for level in args.levels:
+        await run_level(args.queries_list, level, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--site-latency-ms", type=float, default=50.0)
+    parser.add_argument("--max-pages", type=int, default=4)
+    parser.add_argument("--max-llm-calls", type=int, default=50)
+    args = parser.parse_args()
+
+    os.environ["REPORT_CACHE_DISABLED"] = "1"
+    os.environ["INTENT_CACHE_DISABLED"] = "1"
+    fixtures = load_fixtures()
+    server, base_url = start_server(latency=args.site_latency_ms / 1000, fixtures=fixtures)
+    os.environ["VIETSTOCK_BASE_URL"] = base_url
+
+    from nodes.process_query import set_intent_chain
+
+    args.queries_list, intents = build_workload(fixtures, args.queries)
+    set_intent_chain(StubIntentChain(intents, latency=args.llm_latency_ms / 1000))
+    try:
+        asyncio.run(main(args))
+    finally:
+        server.shutdown()
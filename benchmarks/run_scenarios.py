@@ -0,0 +1,207 @@
+"""Benchmark end-to-end offline: site Vietstock giả lập + LLM giả + các kịch bản query.
+
+Chạy từng kịch bản trong `benchmarks/fixtures/scenarios.json` nhiều lần qua graph
+thật, đo p50/p95 end-to-end và theo từng node, rồi ghi kết quả ra JSON để so
+sánh giữa các phiên bản:
+    python -m benchmarks.run_scenarios -n 20 --output bench_results.json
+    python -m benchmarks.run_scenarios --mode serial --compare bench_results.json
+
+Mỗi lần chạy bắt đầu với index báo cáo rỗng và không dùng cache trên đĩa, trừ
+khi có `--warm`. Khi agent hỏi lại, lựa chọn `choice` của kịch bản (mặc định 1)
+được gửi tiếp qua `Command(resume=...)`, thời gian chờ này nằm trong end-to-end.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+
+from langgraph.types import Command
+
+from benchmarks.fake_vietstock import load_fixtures, start_server
+from benchmarks.stub_llm import StubIntentChain
+
+SCENARIOS_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "scenarios.json")
+
+
+def load_scenarios(path=SCENARIOS_PATH, names=None):
+    with open(path, encoding="utf-8") as f:
+        scenarios = json.load(f)
+    if names:
+        scenarios = [scenario for scenario in scenarios if scenario["name"] in names]
+    return scenarios
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def summarize(samples):
+    return {
+        "n": len(samples),
+        "p50_ms": percentile(samples, 0.5) * 1000,
+        "p95_ms": percentile(samples, 0.95) * 1000,
+        "mean_ms": sum(samples) / len(samples) * 1000,
+    }
+
+
+def make_node_timer():
+    """Callback LangChain ghi thời gian chạy của từng node LangGraph (không tính router và chain con)."""
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class NodeTimer(BaseCallbackHandler):
+        def __init__(self):
+            self.started = {}
+            self.timings = defaultdict(list)
+
+        def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+            node = (metadata or {}).get("langgraph_node")
+            if node and kwargs.get("name") == node:
+                self.started[run_id] = (node, time.perf_counter())
+
+        def _finish(self, run_id):
+            entry = self.started.pop(run_id, None)
+            if entry is not None:
+                self.timings[entry[0]].append(time.perf_counter() - entry[1])
+
+        def on_chain_end(self, outputs, *, run_id, **kwargs):
+            self._finish(run_id)
+
+        def on_chain_error(self, error, *, run_id, **kwargs):
+            self._finish(run_id)
+
+    return NodeTimer()
+
+
+async def _arun(agent, graph_input, config, choice):
+    final_state = await agent.ainvoke(graph_input, config=config)
+    while "__interrupt__" in final_state:
+        final_state = await agent.ainvoke(Command(resume=choice), config=config)
+    return final_state
+
+
+def _run(agent, graph_input, config, choice):
+    final_state = agent.invoke(graph_input, config=config)
+    while "__interrupt__" in final_state:
+        final_state = agent.invoke(Command(resume=choice), config=config)
+    return final_state
+
+
+def run_scenario(agent, scenario, iterations, use_async, warm):
+    from nodes.extract_link import _index_registry
+
+    end_to_end = []
+    node_timings = defaultdict(list)
+    errors = 0
+    for _ in range(iterations):
+        if not warm:
+            _index_registry.clear()
+        timer = make_node_timer()
+        config = {"callbacks": [timer], "max_concurrency": 4, "configurable": {"thread_id": uuid.uuid4().hex}}
+        graph_input, choice = {"query": scenario["query"]}, scenario.get("choice", 1)
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            if use_async:
+                final_state = asyncio.run(_arun(agent, graph_input, config, choice))
+            else:
+                final_state = _run(agent, graph_input, config, choice)
+        end_to_end.append(time.perf_counter() - started)
+        for node, samples in timer.timings.items():
+            node_timings[node].extend(samples)
+        collected = final_state.get("collected_links") or {}
+        errors += sum(1 for result in collected.values() if result.startswith("LỖI"))
+    return {
+        "description": scenario.get("description"),
+        "end_to_end": summarize(end_to_end),
+        "nodes": {node: summarize(samples) for node, samples in sorted(node_timings.items())},
+        "failed_requests": errors,
+        "collected_links": collected,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(SCENARIOS_PATH)).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def print_report(results, previous=None):
+    for name, result in results["scenarios"].items():
+        e2e = result["end_to_end"]
+        line = f"{name:<18} e2e p50={e2e['p50_ms']:8.1f}ms p95={e2e['p95_ms']:8.1f}ms"
+        old = (previous or {}).get("scenarios", {}).get(name)
+        if old:
+            line += f"  (trước: p50={old['end_to_end']['p50_ms']:8.1f}ms, {e2e['p50_ms'] / old['end_to_end']['p50_ms'] - 1:+.0%})"
+        print(line + f"  lỗi={result['failed_requests']}")
+        for node, stats in result["nodes"].items():
+            print(f"    {node:<24} p50={stats['p50_ms']:8.1f}ms p95={stats['p95_ms']:8.1f}ms n={stats['n']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--iterations", type=int, default=10)
+    parser.add_argument("--scenario", action="append", help="Chỉ chạy kịch bản này (lặp lại được)")
+    parser.add_argument("--mode", choices=["serial", "parallel"], default="parallel")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="Chạy graph bằng các node bất đồng bộ")
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--site-latency-ms", type=float, default=30.0)
+    parser.add_argument("--warm", action="store_true", help="Giữ index báo cáo giữa các lần chạy")
+    parser.add_argument("--output", help="Ghi kết quả ra file JSON")
+    parser.add_argument("--compare", help="File JSON kết quả trước đó để so sánh")
+    args = parser.parse_args()
+
+    os.environ["REPORT_CACHE_DISABLED"] = "1"
+    os.environ["INTENT_CACHE_DISABLED"] = "1"
+    fixtures = load_fixtures()
+    server, base_url = start_server(latency=args.site_latency_ms / 1000, fixtures=fixtures)
+    os.environ["VIETSTOCK_BASE_URL"] = base_url
+
+    from langgraph.checkpoint.memory import InMemorySaver
+
+    from agent import build_graph
+    from nodes.process_query import set_intent_chain
+    from pydantic_models import AnalysisIntent
+
+    scenarios = load_scenarios(names=args.scenario)
+    intents = {scenario["query"]: AnalysisIntent.model_validate(scenario["intent"])
+               for scenario in scenarios if "intent" in scenario}
+    set_intent_chain(StubIntentChain(intents, latency=args.llm_latency_ms / 1000))
+    agent = build_graph(args.mode, use_async=args.use_async, clarification="interrupt",
+                        checkpointer=InMemorySaver())
+
+    results = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "scenarios": {},
+    }
+    try:
+        for scenario in scenarios:
+            results["scenarios"][scenario["name"]] = run_scenario(
+                agent, scenario, args.iterations, args.use_async, args.warm)
+    finally:
+        server.shutdown()
+
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)
+    print_report(results, previous)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"Đã ghi kết quả vào {args.output}", file=sys.stderr)
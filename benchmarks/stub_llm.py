@@ -0,0 +1,31 @@
+"""LLM giả cho benchmark: trả về `AnalysisIntent` định sẵn sau một độ trễ cố định.
+
+Dùng thay chain Gemini qua `nodes.process_query.set_intent_chain`.
+"""
+import asyncio
+import time
+from typing import Dict, Optional
+
+from pydantic_models import AnalysisIntent
+
+
+class StubIntentChain:
+    def __init__(self, intents: Optional[Dict[str, AnalysisIntent]] = None, latency: float = 0.0):
+        self.intents = intents or {}
+        self.latency = latency
+        self.calls = 0
+
+    def _answer(self, inputs: dict) -> AnalysisIntent:
+        self.calls += 1
+        intent = self.intents.get(inputs["query"])
+        if intent is None:
+            return AnalysisIntent(requests=[], comparison_context="")
+        return intent.model_copy(deep=True)
+
+    def invoke(self, inputs: dict, config=None) -> AnalysisIntent:
+        time.sleep(self.latency)
+        return self._answer(inputs)
+
+    async def ainvoke(self, inputs: dict, config=None) -> AnalysisIntent:
+        await asyncio.sleep(self.latency)
+        return self._answer(inputs)
@@ -0,0 +1,156 @@
+"""Marker API giả lập (giao thức submit/check của datalab.to) để kiểm thử `ocr/marker/marker_api.py` offline.
+
+POST `/api/v1/marker` (multipart, `file` hoặc `file_url`) trả về `request_check_url`;
+GET URL đó trả `{"status": "processing"}` cho tới khi hết thời gian xử lý giả lập rồi
+`{"status": "complete", "markdown": ...}`. Cấu hình được độ trễ xử lý, tỉ lệ lỗi 5xx
+ở submit/check, tỉ lệ tài liệu thất bại và số tài liệu đang xử lý tối đa (vượt thì
+trả 429 kèm Retry-After). Với `paginate=true`, mỗi trang trong `page_range` (mặc định
+trang 0) có dấu phân trang như API thật:
+
+    python -m benchmarks.stub_marker_api --port 8766 --delay 3 --check-error-rate 0.1 --max-active 4
+"""
+import argparse
+import email.parser
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+API_PATH = "/api/v1/marker"
+
+
+class StubMarkerState:
+    def __init__(self, delay=2.0, jitter=0.5, submit_error_rate=0.0, check_error_rate=0.0, failure_rate=0.0,
+                 max_active=0, retry_after=1.0, seed=0):
+        self.delay = delay
+        self.jitter = jitter
+        self.submit_error_rate = submit_error_rate
+        self.check_error_rate = check_error_rate
+        self.failure_rate = failure_rate
+        self.max_active = max_active
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.jobs = {}
+        self.counts = {"submits": 0, "checks": 0, "errors": 0, "rate_limited": 0}
+
+    def active(self, now):
+        return sum(1 for job in self.jobs.values() if job["ready_at"] > now)
+
+
+class StubMarkerHandler(BaseHTTPRequestHandler):
+    state: StubMarkerState = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _form(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        message = email.parser.BytesParser().parsebytes(
+            f"Content-Type: {self.headers.get('Content-Type')}\r\n\r\n".encode() + body)
+        fields = {}
+        for part in message.get_payload() if message.is_multipart() else []:
+            fields[part.get_param("name", header="content-disposition")] = (
+                part.get_filename(), part.get_payload(decode=True))
+        return fields
+
+    def do_POST(self):
+        state = self.state
+        if urlparse(self.path).path != API_PATH:
+            return self._send(404, {"success": False, "error": "Not found"})
+        fields = self._form()
+        now = time.monotonic()
+        with state.lock:
+            state.counts["submits"] += 1
+            if state.random.random() < state.submit_error_rate:
+                state.counts["errors"] += 1
+                return self._send(503, {"success": False, "error": "Service unavailable"})
+            if state.max_active and state.active(now) >= state.max_active:
+                state.counts["rate_limited"] += 1
+                return self._send(429, {"success": False, "error": "Too many requests"},
+                                  {"Retry-After": f"{state.retry_after:g}"})
+            if "file" in fields:
+                name = fields["file"][0]
+            elif "file_url" in fields:
+                name = fields["file_url"][1].decode("utf-8").rsplit("/", 1)[-1]
+            else:
+                return self._send(400, {"success": False, "error": "file hoặc file_url là bắt buộc"})
+            page_range = fields.get("page_range", (None, b"0"))[1].decode("utf-8")
+            request_id = str(next(state.ids))
+            delay = max(0.0, state.delay + state.random.uniform(-state.jitter, state.jitter))
+            state.jobs[request_id] = {
+                "name": name,
+                "pages": [int(page) for page in page_range.split(",") if page.strip()],
+                "paginate": fields.get("paginate", (None, b""))[1] == b"true",
+                "ready_at": now + delay,
+                "runtime": delay,
+                "failed": state.random.random() < state.failure_rate,
+            }
+        host = f"http://{self.headers.get('Host')}"
+        self._send(200, {"success": True, "request_id": request_id,
+                         "request_check_url": f"{host}{API_PATH}/{request_id}"})
+
+    def do_GET(self):
+        state = self.state
+        path = urlparse(self.path).path
+        request_id = path[len(API_PATH) + 1:] if path.startswith(API_PATH + "/") else None
+        with state.lock:
+            state.counts["checks"] += 1
+            job = state.jobs.get(request_id)
+            if job is None:
+                return self._send(404, {"success": False, "error": "Không có request này"})
+            if state.random.random() < state.check_error_rate:
+                state.counts["errors"] += 1
+                return self._send(502, {"success": False, "error": "Bad gateway"})
+        if time.monotonic() < job["ready_at"]:
+            return self._send(200, {"status": "processing"})
+        if job["failed"]:
+            return self._send(200, {"status": "failed", "success": False, "error": "Conversion failed"})
+        pages = [(f"\n\n{{{page}}}" + "-" * 48 + "\n\n" if job["paginate"] else "")
+                 + f"# {job['name']}\n\n| Chỉ tiêu | Số cuối kỳ |\n|---|---|\n| Tiền | {page + 1}.000 |\n"
+                 for page in job["pages"]]
+        self._send(200, {"status": "complete", "success": True, "page_count": len(pages), "runtime": job["runtime"],
+                         "markdown": "".join(pages)})
+
+
+def start_server(port=0, **options):
+    """Khởi động stub trong thread nền, trả về (server, state, api_url)."""
+    state = StubMarkerState(**options)
+    handler = type("Handler", (StubMarkerHandler,), {"state": state})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state, f"http://127.0.0.1:{server.server_address[1]}{API_PATH}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Marker API giả lập")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--delay", type=float, default=2.0, help="Thời gian xử lý giả lập mỗi tài liệu (giây)")
+    parser.add_argument("--jitter", type=float, default=0.5)
+    parser.add_argument("--submit-error-rate", type=float, default=0.0, help="Tỉ lệ submit trả 503")
+    parser.add_argument("--check-error-rate", type=float, default=0.0, help="Tỉ lệ check trả 502")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Tỉ lệ tài liệu kết thúc với status failed")
+    parser.add_argument("--max-active", type=int, default=0, help="Số tài liệu xử lý cùng lúc tối đa (0: không giới hạn)")
+    args = parser.parse_args()
+    server, state, api_url = start_server(
+        args.port, delay=args.delay, jitter=args.jitter, submit_error_rate=args.submit_error_rate,
+        check_error_rate=args.check_error_rate, failure_rate=args.failure_rate, max_active=args.max_active)
+    print(f"Đang phục vụ tại {api_url} (đặt MARKER_API_URL={api_url})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,229 @@
+import asyncio
+import atexit
+import contextvars
+import os
+import threading
+from contextlib import asynccontextmanager
+
+from concurrency import get_budget
+from tracing import span
+
+# Các loại tài nguyên không cần cho việc đọc danh sách báo cáo
+BLOCKED_RESOURCE_TYPES = frozenset({"image", "font", "stylesheet", "media"})
+
+
+async def _ablock_resources(route):
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+class BrowserPool:
+    """Pool Chromium cho graph đồng bộ, kể cả các nhánh song song.
+
+    Đối tượng Playwright chỉ dùng được trên thread đã tạo ra nó, mà LangGraph chạy
+    các nhánh Send trên thread pool mới ở mỗi lần invoke. Vì vậy mọi thao tác trình
+    duyệt chạy trên một thread chủ duy nhất: thread này chạy event loop riêng với một
+    `AsyncBrowserPool`, các thread gọi gửi coroutine sang qua `run` và chờ kết quả.
+    Số trình duyệt luôn là `size` dù có bao nhiêu thread gọi, page của các nhánh chạy
+    xen kẽ trên loop (tối đa `max_pages` cùng lúc) và `close_all` đóng được từ mọi thread.
+    """
+
+    def __init__(self, size=1, contexts_per_browser=2, max_pages=4, headless=True, block_resources=True):
+        self.max_pages = max_pages
+        self._async_pool = AsyncBrowserPool(size, contexts_per_browser, headless, block_resources, max_pages=max_pages)
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            size=int(os.getenv("BROWSER_POOL_SIZE", "1")),
+            contexts_per_browser=int(os.getenv("BROWSER_POOL_CONTEXTS", "2")),
+            max_pages=int(os.getenv("BROWSER_POOL_MAX_PAGES", "4")),
+            headless=os.getenv("BROWSER_HEADLESS", "1") != "0",
+            block_resources=os.getenv("BROWSER_BLOCK_RESOURCES", "1") != "0",
+        )
+
+    def _submit(self, coroutine):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="browser-pool", daemon=True)
+                self._thread.start()
+            loop = self._loop
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("BrowserPool.run không được gọi từ chính thread của pool")
+        return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
+
+    def run(self, function, *args):
+        """Mượn một page, chạy `await function(page, *args)` trên thread chủ và trả về kết quả.
+
+        Span đang mở ở thread gọi được chuyển sang để span con vẫn có cha đúng."""
+        context = contextvars.copy_context()
+
+        async def call():
+            for variable, value in context.items():
+                variable.set(value)
+            async with self._async_pool.lease_page() as page:
+                return await function(page, *args)
+
+        return self._submit(call())
+
+    def warm(self):
+        """Khởi động trước các trình duyệt."""
+        self._submit(self._async_pool.start())
+
+    def close(self):
+        """Đóng mọi trình duyệt; lần dùng sau sẽ khởi động lại."""
+        if self._loop is not None:
+            self._submit(self._async_pool.close())
+
+    def close_all(self):
+        """Đóng trình duyệt và dừng thread chủ (gọi khi tiến trình kết thúc)."""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+        if loop is None:
+            return
+        try:
+            self.close()
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout=10)
+            with self._lock:
+                self._loop = self._thread = None
+            loop.close()
+
+
+class AsyncBrowserPool:
+    """Pool Chromium cho graph bất đồng bộ, dùng chung trên một event loop.
+
+    Giữ `size` trình duyệt ấm, phân page xoay vòng giữa chúng; mỗi trình duyệt
+    giữ tối đa `contexts_per_browser` context rảnh. Số page mở đồng thời bị giới
+    hạn bởi `max_pages` nếu có, không thì bởi ngân sách toàn cục trong `concurrency`.
+    """
+
+    def __init__(self, size=1, contexts_per_browser=2, headless=True, block_resources=True, max_pages=None):
+        self.size = size
+        self.contexts_per_browser = contexts_per_browser
+        self.headless = headless
+        self.block_resources = block_resources
+        self._playwright = None
+        self._browsers = []
+        self._idle_contexts = {}
+        self._next = 0
+        self._start_lock = None
+        # Không có `max_pages` thì dùng ngân sách page toàn cục của `concurrency`
+        self._pages = asyncio.Semaphore(max_pages) if max_pages else None
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            size=int(os.getenv("BROWSER_POOL_SIZE", "1")),
+            contexts_per_browser=int(os.getenv("BROWSER_POOL_CONTEXTS", "2")),
+            headless=os.getenv("BROWSER_HEADLESS", "1") != "0",
+            block_resources=os.getenv("BROWSER_BLOCK_RESOURCES", "1") != "0",
+        )
+
+    async def start(self):
+        """Khởi động (hoặc khởi động lại) các trình duyệt; gọi trước để giữ ấm."""
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._playwright is None:
+                from playwright.async_api import async_playwright
+
+                self._playwright = await async_playwright().start()
+            for i in range(self.size):
+                if i < len(self._browsers) and self._browsers[i].is_connected():
+                    continue
+                with span("browser.launch"):
+                    browser = await self._playwright.chromium.launch(headless=self.headless)
+                if i < len(self._browsers):
+                    self._idle_contexts.pop(self._browsers[i], None)
+                    self._browsers[i] = browser
+                else:
+                    self._browsers.append(browser)
+                self._idle_contexts[browser] = []
+
+    async def _new_context(self, browser):
+        context = await browser.new_context()
+        if self.block_resources:
+            await context.route("**/*", _ablock_resources)
+        return context
+
+    @asynccontextmanager
+    async def lease_page(self):
+        """Cho mượn một page mới; page được đóng và context được trả lại pool khi xong."""
+        async with self._pages or get_budget().pages:
+            if len(self._browsers) < self.size or not all(b.is_connected() for b in self._browsers):
+                await self.start()
+            browser = self._browsers[self._next % len(self._browsers)]
+            self._next += 1
+            idle = self._idle_contexts[browser]
+            context = idle.pop() if idle else await self._new_context(browser)
+            page = await context.new_page()
+            try:
+                yield page
+            finally:
+                try:
+                    await page.close()
+                except Exception:
+                    pass
+                if len(idle) < self.contexts_per_browser and browser.is_connected():
+                    idle.append(context)
+                else:
+                    try:
+                        await context.close()
+                    except Exception:
+                        pass
+
+    async def close(self):
+        for browser in self._browsers:
+            try:
+                await browser.close()
+            except Exception:
+                pass
+        self._browsers.clear()
+        self._idle_contexts.clear()
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_async_pool = None
+
+
+def get_browser_pool() -> BrowserPool:
+    """Trả về pool dùng chung của tiến trình, khởi tạo từ biến môi trường ở lần gọi đầu."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = BrowserPool.from_env()
+                atexit.register(_pool.close_all)
+    return _pool
+
+
+def set_browser_pool(pool: BrowserPool) -> None:
+    """Thay pool dùng chung (dùng cho benchmark hoặc cấu hình tuỳ chỉnh)."""
+    global _pool
+    with _pool_lock:
+        _pool = pool
+
+
+def get_async_browser_pool() -> AsyncBrowserPool:
+    """Pool bất đồng bộ dùng chung, khởi tạo từ biến môi trường ở lần gọi đầu."""
+    global _async_pool
+    if _async_pool is None:
+        _async_pool = AsyncBrowserPool.from_env()
+    return _async_pool
+
+
+def set_async_browser_pool(pool: AsyncBrowserPool) -> None:
+    global _async_pool
+    _async_pool = pool
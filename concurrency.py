@@ -0,0 +1,39 @@
+"""Ngân sách đồng thời toàn cục khi chạy graph bất đồng bộ trên một event loop.
+
+Giới hạn tổng số page trình duyệt đang mở và số lời gọi LLM đang chạy, dùng
+chung cho mọi query trong tiến trình.
+"""
+import asyncio
+import os
+
+
+class ConcurrencyBudget:
+    def __init__(self, max_pages: int = 4, max_llm_calls: int = 8):
+        self.max_pages = max_pages
+        self.max_llm_calls = max_llm_calls
+        self.pages = asyncio.Semaphore(max_pages)
+        self.llm_calls = asyncio.Semaphore(max_llm_calls)
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_pages=int(os.getenv("BROWSER_POOL_MAX_PAGES", "4")),
+            max_llm_calls=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+        )
+
+
+_budget = None
+
+
+def get_budget() -> ConcurrencyBudget:
+    global _budget
+    if _budget is None:
+        _budget = ConcurrencyBudget.from_env()
+    return _budget
+
+
+def set_budget(max_pages: int, max_llm_calls: int) -> ConcurrencyBudget:
+    """Đặt lại ngân sách (gọi trước khi chạy batch)."""
+    global _budget
+    _budget = ConcurrencyBudget(max_pages, max_llm_calls)
+    return _budget
@@ -0,0 +1,487 @@
+"""Kho số liệu báo cáo tài chính dạng cột (Apache Arrow), dựng từ markdown OCR.
+
+`parse_statements` đọc ba bảng chính (cân đối kế toán, kết quả kinh doanh, lưu chuyển
+tiền tệ) trong markdown thành các dòng chỉ tiêu chuẩn hoá: (báo cáo, mã số, cột, giá trị
+theo VNĐ). `FinancialStore` lưu chúng cùng khoá (mã CK, năm, quý, kỳ, loại báo cáo) trong
+một file Arrow IPC không nén, sắp theo mã CK:
+    - file được memory-map khi mở, không đọc hay giải mã cả file vào bộ nhớ
+    - các cột chuỗi mã hoá dictionary: lọc là so sánh mảng chỉ số nguyên
+    - mỗi mã CK là một đoạn hàng liền nhau, index mã CK -> (hàng đầu, hàng cuối)
+So sánh giữa các công ty (`cross_section`) và giữa các kỳ (`series`) là phép toán trên
+cột (numpy/pyarrow.compute), không đọc lại markdown.
+
+CLI:
+    python financial_store.py ingest DBC/DBC_Baocaotaichinh_Q3_2025_Hopnhat.md
+    python financial_store.py ingest bctc.md --ticker FPT --year 2025 --quarter 3 --consolidation "Công ty mẹ"
+    python financial_store.py compare income 10 --year 2025 --quarter 3
+    python financial_store.py series income 60 DBC FPT
+    python financial_store.py export financials.parquet
+    python financial_store.py stats
+"""
+import argparse
+import json
+import os
+import re
+import threading
+import unicodedata
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from ocr.markdown_tables import SEPARATOR_ROW, parse_number, split_row
+
+# Báo cáo -> tiêu đề (không dấu, viết hoa) mà dòng tiêu đề bắt đầu bằng
+STATEMENT_TITLES = {
+    "balance": ("BANG CAN DOI KE TOAN", "BAO CAO TINH HINH TAI CHINH"),
+    "income": ("BAO CAO KET QUA",),
+    "cash_flow": ("BAO CAO LUU CHUYEN TIEN TE",),
+}
+FORM_CODES = {"1": "balance", "2": "income", "3": "cash_flow"}  # Mẫu số B01/B02/B03
+FORM_CODE = re.compile(r"^MAU SO B0([123])")
+NOTES_TITLE = "THUYET MINH BAO CAO"
+# Cột mặc định khi so sánh: số cuối kỳ, quý này, luỹ kế từ đầu năm
+DEFAULT_COLUMNS = {"balance": "closing", "income": "current", "cash_flow": "ytd"}
+UNIT_SCALES = (("TY DONG", 1e9), ("TRIEU DONG", 1e6), ("NGHIN DONG", 1e3))
+PER_SHARE_CODES = {("income", "70"), ("income", "71")}  # Lãi trên cổ phiếu: không nhân theo đơn vị
+ITEM_CODE = re.compile(r"^\d{1,3}[a-z]?$")
+REPORT_NAME = re.compile(r"^([A-Z0-9]{3,})_.*?(?:Q([1-4])_)?(\d{4})_(Hopnhat|Congtyme)", re.IGNORECASE)
+
+DICTIONARY = pa.dictionary(pa.int32(), pa.string())
+SCHEMA = pa.schema([
+    ("ticker", DICTIONARY),
+    ("year", pa.int16()),
+    ("quarter", pa.int8()),  # 0 khi kỳ không phải "Quý"
+    ("period", DICTIONARY),  # "Quý", "6 tháng", "Cả năm"
+    ("consolidation", DICTIONARY),  # "Hợp nhất", "Công ty mẹ"
+    ("statement", DICTIONARY),
+    ("code", DICTIONARY),
+    ("column", DICTIONARY),
+    ("label", DICTIONARY),
+    ("value", pa.float64()),
+])
+DICTIONARY_COLUMNS = [field.name for field in SCHEMA if pa.types.is_dictionary(field.type)]
+REPORT_KEY_COLUMNS = ("ticker", "year", "quarter", "period", "consolidation")
+# Sắp theo mã CK trước để mỗi mã là một đoạn hàng liền nhau
+SORT_KEYS = ("ticker", "statement", "code", "column", "consolidation", "period", "year", "quarter")
+
+
+class ReportKey(NamedTuple):
+    ticker: str
+    year: int
+    quarter: Optional[int]
+    period: str
+    consolidation: str
+
+
+class LineItem(NamedTuple):
+    statement: str
+    code: str
+    column: str
+    label: str
+    value: float
+
+
+def _ascii(text: str) -> str:
+    """Bỏ dấu, viết hoa, gộp khoảng trắng: "Bảng cân đối kế toán" -> "BANG CAN DOI KE TOAN"."""
+    text = unicodedata.normalize("NFD", text.replace("Đ", "D").replace("đ", "d"))
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(re.sub(r"[^\w%]+", " ", re.sub(r"<br\s*/?>", " ", text, flags=re.IGNORECASE)).upper().split())
+
+
+def _cell_text(cell: str) -> str:
+    return " ".join(re.sub(r"<br\s*/?>", " ", cell).split())
+
+
+def statement_for_title(line: str) -> Optional[str]:
+    title = _ascii(line.lstrip("#* "))
+    form = FORM_CODE.match(title)
+    if form:
+        return FORM_CODES[form.group(1)]
+    for statement, prefixes in STATEMENT_TITLES.items():
+        if title.startswith(prefixes):
+            return statement
+    return None
+
+
+def column_kind(header: str) -> str:
+    """Tên chuẩn của một cột giá trị theo tiêu đề cột."""
+    text = _ascii(header)
+    prior = "TRUOC" in text
+    if "LUY KE" in text or "TU DAU NAM" in text:
+        return "prior_ytd" if prior else "ytd"
+    if "DAU NAM" in text or "DAU KY" in text:
+        return "opening"
+    if "CUOI" in text:
+        return "closing"
+    return "prior" if prior else "current"
+
+
+def _header_columns(row: List[str]) -> Optional[Tuple[int, Dict[int, str]]]:
+    """(vị trí cột mã số, {vị trí cột giá trị: tên cột}) nếu `row` là hàng tiêu đề."""
+    headers = [_ascii(cell) for cell in row]
+    if "MA SO" not in headers:
+        return None
+    code_index = headers.index("MA SO")
+    values = {}
+    for index in range(code_index + 1, len(row)):
+        if headers[index] and not headers[index].startswith("THUYET MINH"):
+            values[index] = column_kind(row[index])
+    return code_index, values
+
+
+def _unit_scale(line: str) -> Optional[float]:
+    text = _ascii(line)
+    if "DON VI TINH" not in text:
+        return None
+    return next((scale for unit, scale in UNIT_SCALES if unit in text), 1.0)
+
+
+def parse_statements(markdown: str) -> List[LineItem]:
+    """Các dòng chỉ tiêu (có mã số) trong bảng cân đối kế toán, kết quả kinh doanh và lưu chuyển tiền tệ.
+
+    Bảng được gán cho báo cáo theo dòng tiêu đề gần nhất phía trên; bảng bị ngắt trang
+    không có hàng tiêu đề dùng lại các cột của bảng trước cùng báo cáo. Ô "-" là 0."""
+    items = []
+    statement = None
+    columns = None
+    scale = 1.0
+
+    def read_table(rows):
+        nonlocal columns, scale
+        for row in rows:
+            code = ""
+            if columns is not None:
+                code_index, value_columns = columns
+                code = row[code_index].strip() if code_index < len(row) else ""
+            if not ITEM_CODE.match(code):
+                # Hàng không có mã số: tiêu đề cột, đơn vị tính hoặc tiêu đề nhóm
+                unit = _unit_scale(" ".join(row))
+                if unit is not None:
+                    scale = unit
+                columns = _header_columns(row) or columns
+                continue
+            code = code.zfill(2)
+            label = _cell_text(row[0]) if code_index else ""
+            for index, column in value_columns.items():
+                cell = row[index].strip() if index < len(row) else ""
+                value = 0.0 if cell in ("-", "—") else parse_number(cell)
+                if value is None:
+                    continue
+                if (statement, code) not in PER_SHARE_CODES:
+                    value *= scale
+                items.append(LineItem(statement, code, column, label, value))
+
+    rows = []
+    for line in markdown.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("|"):
+            if not SEPARATOR_ROW.match(stripped):
+                rows.append(split_row(stripped))
+            continue
+        if rows:
+            if statement:
+                read_table(rows)
+            rows = []
+        if not stripped:
+            continue
+        unit = _unit_scale(stripped)
+        if unit is not None:
+            scale = unit
+        title = statement_for_title(stripped)
+        if title and title != statement:
+            statement, columns, scale = title, None, 1.0
+        elif _ascii(stripped.lstrip("#* ")).startswith(NOTES_TITLE):
+            statement, columns = None, None
+    if rows and statement:
+        read_table(rows)
+    return items
+
+
+def parse_report_name(path: str) -> Optional[ReportKey]:
+    """Khoá báo cáo suy ra từ tên file kiểu "DBC_Baocaotaichinh_Q3_2025_Hopnhat.md"."""
+    match = REPORT_NAME.match(os.path.basename(path))
+    if not match:
+        return None
+    ticker, quarter, year, consolidation = match.groups()
+    return ReportKey(ticker.upper(), int(year), int(quarter) if quarter else None,
+                     "Quý" if quarter else "Cả năm",
+                     "Hợp nhất" if consolidation.lower() == "hopnhat" else "Công ty mẹ")
+
+
+def items_table(key: ReportKey, items: Sequence[LineItem]) -> pa.Table:
+    """Bảng Arrow (cột chuỗi chưa mã hoá) cho các dòng chỉ tiêu của một báo cáo."""
+    count = len(items)
+    columns = {
+        "ticker": [key.ticker] * count,
+        "year": np.full(count, key.year, dtype=np.int16),
+        "quarter": np.full(count, key.quarter or 0, dtype=np.int8),
+        "period": [key.period] * count,
+        "consolidation": [key.consolidation] * count,
+    }
+    for index, name in enumerate(LineItem._fields[:-1]):
+        columns[name] = [item[index] for item in items]
+    columns["value"] = np.array([item.value for item in items], dtype=np.float64)
+    return pa.table({field.name: pa.array(columns[field.name], field.type.value_type
+                                          if pa.types.is_dictionary(field.type) else field.type)
+                     for field in SCHEMA})
+
+
+def _decode(table: pa.Table) -> pa.Table:
+    """Cột dictionary -> chuỗi (để sắp xếp và ghép bảng)."""
+    for name in DICTIONARY_COLUMNS:
+        index = table.schema.get_field_index(name)
+        table = table.set_column(index, name, table.column(name).cast(pa.string()))
+    return table
+
+
+def _encode(table: pa.Table) -> pa.Table:
+    for name in DICTIONARY_COLUMNS:
+        index = table.schema.get_field_index(name)
+        table = table.set_column(index, name, pc.dictionary_encode(table.column(name)))
+    return table
+
+
+class FinancialStore:
+    """Các dòng chỉ tiêu của mọi báo cáo đã nạp, trong một file Arrow được memory-map."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._table = None
+        self._ticker_rows: Dict[str, Tuple[int, int]] = {}
+        self._mtime = None
+
+    @classmethod
+    def from_env(cls):
+        return cls(path=os.getenv("FINANCIAL_STORE_PATH", os.path.join(".cache", "financials.arrow")))
+
+    @property
+    def table(self) -> pa.Table:
+        """Bảng hiện tại; mở lại (memory-map) nếu file đã được tiến trình khác ghi."""
+        mtime = os.path.getmtime(self.path) if os.path.exists(self.path) else None
+        if self._table is None or mtime != self._mtime:
+            with self._lock:
+                self._load(mtime)
+        return self._table
+
+    def _load(self, mtime):
+        if mtime is None:
+            table = SCHEMA.empty_table()
+        else:
+            table = pa.ipc.open_file(pa.memory_map(self.path)).read_all()
+        # Mỗi mã CK là một đoạn hàng liền nhau vì file được sắp theo mã CK
+        self._ticker_rows = {}
+        if table.num_rows:
+            tickers = table.column("ticker").chunk(0)
+            indices = tickers.indices.to_numpy()
+            starts = np.concatenate([[0], np.flatnonzero(indices[1:] != indices[:-1]) + 1])
+            stops = np.append(starts[1:], len(indices))
+            names = tickers.dictionary.to_pylist()
+            self._ticker_rows = {names[indices[start]]: (int(start), int(stop)) for start, stop in zip(starts, stops)}
+        self._table, self._mtime = table, mtime
+
+    def add_many(self, reports: Iterable[Tuple[ReportKey, Sequence[LineItem]]]) -> int:
+        """Nạp nhiều báo cáo trong một lần ghi file; báo cáo đã có (cùng khoá) bị thay thế. Trả về số dòng đã nạp."""
+        new = [items_table(key, items) for key, items in reports if items]
+        if not new:
+            return 0
+        added = pa.concat_tables(new)
+        existing = _decode(self.table)
+        if existing.num_rows:
+            # Bỏ các báo cáo sắp được nạp lại
+            keys = pa.table({name: added.column(name) for name in REPORT_KEY_COLUMNS}).group_by(
+                list(REPORT_KEY_COLUMNS)).aggregate([])
+            existing = existing.join(keys, list(REPORT_KEY_COLUMNS), join_type="left anti")
+            existing = existing.select(SCHEMA.names)
+        table = pa.concat_tables([existing, added]).sort_by([(name, "ascending") for name in SORT_KEYS])
+        table = _encode(table).combine_chunks()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Ghi ra file tạm rồi đổi tên: tiến trình đang memory-map file cũ không bị ảnh hưởng
+        temporary = self.path + ".part"
+        with pa.OSFile(temporary, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=max(table.num_rows, 1))
+        with self._lock:
+            os.replace(temporary, self.path)
+            self._table = None
+        return added.num_rows
+
+    def add(self, key: ReportKey, items: Sequence[LineItem]) -> int:
+        return self.add_many([(key, items)])
+
+    def ingest(self, markdown: str, key: ReportKey) -> int:
+        return self.add(key, parse_statements(markdown))
+
+    def _rows(self, table: pa.Table, filters: List[Tuple[str, object]]) -> Optional[np.ndarray]:
+        """Chỉ số các hàng khớp mọi bộ lọc (giá trị đơn hoặc list), None nếu không có bộ lọc.
+
+        Bộ lọc đầu tiên quét cả cột; các bộ lọc sau chỉ xét các hàng còn lại, nên đặt
+        bộ lọc chọn lọc nhất (mã số chỉ tiêu) lên trước."""
+        rows = None
+        for name, wanted in filters:
+            if wanted is None:
+                continue
+            wanted = list(wanted) if isinstance(wanted, (list, tuple, set)) else [wanted]
+            column = table.column(name)
+            column = column.chunk(0) if column.num_chunks == 1 else column.combine_chunks()
+            if pa.types.is_dictionary(column.type):
+                # Bảng tra theo chỉ số dictionary: một phép gather thay vì so chuỗi
+                ids = pc.index_in(pa.array(wanted, pa.string()), value_set=column.dictionary).drop_null()
+                lookup = np.zeros(len(column.dictionary), dtype=bool)
+                lookup[ids.to_numpy()] = True
+                values = column.indices.to_numpy()
+                keep = lookup[values if rows is None else values[rows]]
+            else:
+                values = column.to_numpy()
+                values = values if rows is None else values[rows]
+                keep = values == wanted[0] if len(wanted) == 1 else np.isin(values, wanted)
+            rows = np.flatnonzero(keep) if rows is None else rows[keep]
+        return rows
+
+    def query(self, tickers: Optional[Sequence[str]] = None, statement: Optional[str] = None,
+              codes=None, column=None, year=None, quarter=None, period=None,
+              consolidation: Optional[str] = None) -> pa.Table:
+        """Các dòng chỉ tiêu khớp bộ lọc; `tickers` dùng index nên chỉ đụng tới các đoạn hàng của các mã đó."""
+        table = self.table
+        if tickers is not None:
+            slices = []
+            for ticker in tickers:
+                rows = self._ticker_rows.get(ticker)
+                if rows:  # Mã chưa có trong kho thì bỏ qua
+                    slices.append(table.slice(rows[0], rows[1] - rows[0]))
+            table = pa.concat_tables(slices) if slices else table.slice(0, 0)
+        rows = self._rows(table, [("code", codes), ("statement", statement), ("column", column), ("year", year),
+                                  ("quarter", quarter), ("period", period), ("consolidation", consolidation)])
+        return table if rows is None else table.take(rows)
+
+    def cross_section(self, statement: str, code: str, year: int, quarter: Optional[int] = None,
+                      column: Optional[str] = None, consolidation: str = "Hợp nhất",
+                      tickers: Optional[Sequence[str]] = None) -> pa.Table:
+        """Một chỉ tiêu của nhiều công ty trong cùng kỳ, giảm dần theo giá trị, kèm thứ hạng."""
+        table = self.query(tickers, statement, code, column or DEFAULT_COLUMNS[statement], year, quarter or 0,
+                           "Quý" if quarter else "Cả năm", consolidation)
+        table = pa.table({"ticker": table.column("ticker").cast(pa.string()), "value": table.column("value")})
+        table = table.sort_by([("value", "descending")])
+        return table.append_column("rank", pa.array(np.arange(1, table.num_rows + 1, dtype=np.int32)))
+
+    def series(self, tickers: Sequence[str], statement: str, code: str, column: Optional[str] = None,
+               consolidation: str = "Hợp nhất") -> pa.Table:
+        """Chuỗi theo quý của một chỉ tiêu cho từng mã, kèm tăng trưởng so với quý trước (qoq) và cùng kỳ (yoy)."""
+        table = self.query(tickers, statement, code, column or DEFAULT_COLUMNS[statement], period="Quý",
+                           consolidation=consolidation)
+        table = pa.table({
+            "ticker": table.column("ticker").cast(pa.string()),
+            "year": table.column("year"),
+            "quarter": table.column("quarter"),
+            "value": table.column("value"),
+        }).sort_by([("ticker", "ascending"), ("year", "ascending"), ("quarter", "ascending")])
+        if not table.num_rows:
+            return table.append_column("qoq", pa.array([], pa.float64())).append_column("yoy", pa.array([], pa.float64()))
+        _, ticker_ids = np.unique(table.column("ticker").to_numpy(zero_copy_only=False), return_inverse=True)
+        ordinal = table.column("year").to_numpy().astype(np.int64) * 4 + table.column("quarter").to_numpy() - 1
+        # Khoá (mã, số thứ tự quý) tăng dần: tìm quý trước/cùng kỳ năm trước bằng searchsorted
+        keys = ticker_ids.astype(np.int64) * 100_000 + ordinal
+        values = table.column("value").to_numpy()
+
+        def change(lag):
+            position = np.searchsorted(keys, keys - lag)
+            found = (position < len(keys)) & (keys[np.minimum(position, len(keys) - 1)] == keys - lag)
+            base = np.where(found, values[np.minimum(position, len(keys) - 1)], np.nan)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                return np.where(found & (base != 0), (values - base) / np.abs(base), np.nan)
+
+        return table.append_column("qoq", pa.array(change(1), from_pandas=True)).append_column(
+            "yoy", pa.array(change(4), from_pandas=True))
+
+    def export_parquet(self, path: str) -> None:
+        import pyarrow.parquet as pq
+
+        pq.write_table(self.table, path, compression="zstd")
+
+    def stats(self) -> dict:
+        table = self.table
+        reports = table.group_by(list(REPORT_KEY_COLUMNS)).aggregate([]).num_rows if table.num_rows else 0
+        return {
+            "path": self.path,
+            "rows": table.num_rows,
+            "reports": reports,
+            "tickers": len(self._ticker_rows),
+            "bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_financial_store() -> FinancialStore:
+    """Trả về kho dùng chung của tiến trình, khởi tạo từ biến môi trường ở lần gọi đầu."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = FinancialStore.from_env()
+    return _store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Kho số liệu báo cáo tài chính (Arrow)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    ingest_parser = subparsers.add_parser("ingest", help="Nạp markdown OCR của báo cáo")
+    ingest_parser.add_argument("paths", nargs="+")
+    ingest_parser.add_argument("--ticker", help="Mặc định suy từ tên file (MÃ_..._Q3_2025_Hopnhat.md)")
+    ingest_parser.add_argument("--year", type=int)
+    ingest_parser.add_argument("--quarter", type=int)
+    ingest_parser.add_argument("--period", choices=["Quý", "6 tháng", "Cả năm"])
+    ingest_parser.add_argument("--consolidation", choices=["Hợp nhất", "Công ty mẹ"])
+    compare_parser = subparsers.add_parser("compare", help="Một chỉ tiêu của các công ty trong cùng kỳ")
+    series_parser = subparsers.add_parser("series", help="Chuỗi theo quý của một chỉ tiêu")
+    for subparser in (compare_parser, series_parser):
+        subparser.add_argument("statement", choices=list(STATEMENT_TITLES))
+        subparser.add_argument("code", help="Mã số chỉ tiêu, ví dụ 10 (doanh thu thuần), 60 (LNST), 270 (tổng tài sản)")
+        subparser.add_argument("--column", help=f"Mặc định {DEFAULT_COLUMNS}")
+        subparser.add_argument("--consolidation", default="Hợp nhất")
+    compare_parser.add_argument("--year", type=int, required=True)
+    compare_parser.add_argument("--quarter", type=int)
+    compare_parser.add_argument("--tickers", nargs="+")
+    series_parser.add_argument("tickers", nargs="+")
+    export_parser = subparsers.add_parser("export", help="Xuất ra Parquet")
+    export_parser.add_argument("output")
+    subparsers.add_parser("stats", help="Thống kê kho")
+
+    args = parser.parse_args()
+    store = get_financial_store()
+    if args.command == "ingest":
+        reports = []
+        for path in args.paths:
+            key = parse_report_name(path)
+            if args.ticker:
+                quarter = args.quarter if args.quarter is not None else (key.quarter if key else None)
+                key = ReportKey(args.ticker.upper(), args.year or (key.year if key else None), quarter,
+                                args.period or ("Quý" if quarter else "Cả năm"),
+                                args.consolidation or (key.consolidation if key else "Hợp nhất"))
+            if key is None or key.year is None:
+                parser.error(f"Không suy được mã/năm từ tên file {path}, dùng --ticker và --year")
+            with open(path, encoding="utf-8") as f:
+                items = parse_statements(f.read())
+            print(f"{path}: {len(items)} dòng chỉ tiêu -> {key.ticker} {key.period} {key.quarter or ''} "
+                  f"{key.year} {key.consolidation}")
+            reports.append((key, items))
+        store.add_many(reports)
+    elif args.command == "compare":
+        rows = store.cross_section(args.statement, args.code.zfill(2), args.year, args.quarter, args.column,
+                                   args.consolidation, args.tickers).to_pylist()
+        for row in rows:
+            print(f"{row['rank']:>4}  {row['ticker']:<6} {row['value']:>24,.0f}")
+    elif args.command == "series":
+        rows = store.series([ticker.upper() for ticker in args.tickers], args.statement, args.code.zfill(2),
+                            args.column, args.consolidation).to_pylist()
+        for row in rows:
+            growth = "  ".join(f"{name}={row[name]:+.1%}" for name in ("qoq", "yoy") if row[name] is not None)
+            print(f"{row['ticker']:<6} Q{row['quarter']}/{row['year']}  {row['value']:>24,.0f}  {growth}")
+    elif args.command == "export":
+        store.export_parquet(args.output)
+    print(json.dumps(store.stats(), ensure_ascii=False))
@@ -0,0 +1,205 @@
+"""Cache query -> AnalysisIntent đặt trước chain LLM trong process_query_node.
+
+Khoá là query đã chuẩn hoá (chữ thường, bỏ dấu, gộp khoảng trắng, thống nhất
+cách viết quý/năm/mã). Bộ nhớ là LRU giới hạn kích thước, phía sau là SQLite để
+giữ kết quả giữa các lần chạy. Mỗi mục gắn với quý hiện tại lúc tạo: khi sang
+quý mới, kết quả cũ bị bỏ vì việc lọc báo cáo tương lai phụ thuộc vào ngày.
+
+CLI:
+    python intent_cache.py stats
+    python intent_cache.py clear
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+
+import regex as re
+
+from pydantic_models import AnalysisIntent
+from query_parser import normalize_text
+
+QUARTER_WORD_PATTERN = re.compile(r"\b(?:quy|q)\s*([1-4])\b")
+YEAR_WORD_PATTERN = re.compile(r"\bnam\s+(20\d{2})\b")
+REPORT_WORDS_PATTERN = re.compile(r"\bbao cao tai chinh\b")
+PUNCTUATION_PATTERN = re.compile(r"[^\w\s]")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS intents (
+    query_key TEXT PRIMARY KEY,
+    quarter_tag TEXT NOT NULL,
+    intent TEXT NOT NULL,
+    last_used REAL NOT NULL
+);
+"""
+
+
+def normalize_query(query: str) -> str:
+    """Chuẩn hoá query để các cách viết gần giống nhau dùng chung một khoá."""
+    text = normalize_text(query)
+    text = PUNCTUATION_PATTERN.sub(" ", text)
+    text = REPORT_WORDS_PATTERN.sub("bctc", text)
+    text = QUARTER_WORD_PATTERN.sub(r"q\1", text)
+    text = YEAR_WORD_PATTERN.sub(r"\1", text)
+    return " ".join(text.split())
+
+
+def current_quarter_tag(now: Optional[datetime] = None) -> str:
+    now = now or datetime.now()
+    return f"{now.year}Q{(now.month - 1) // 3 + 1}"
+
+
+class IntentCache:
+    """LRU trong bộ nhớ + SQLite, có thống kê hit rate và giới hạn số mục."""
+
+    def __init__(self, path: Optional[str], max_size: int = 1024, max_persistent: int = 10000, enabled: bool = True):
+        self.path = path
+        self.max_size = max_size
+        self.max_persistent = max_persistent
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            path=os.getenv("INTENT_CACHE_PATH", os.path.join(".cache", "intents.sqlite3")) or None,
+            max_size=int(os.getenv("INTENT_CACHE_SIZE", "1024")),
+            max_persistent=int(os.getenv("INTENT_CACHE_MAX_ENTRIES", "10000")),
+            enabled=os.getenv("INTENT_CACHE_DISABLED", "0") != "1",
+        )
+
+    def _connect(self):
+        if self.path is None:
+            return None
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def _remember(self, key: str, quarter_tag: str, intent: AnalysisIntent):
+        self._memory[key] = (quarter_tag, intent)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, query: str) -> Optional[AnalysisIntent]:
+        if not self.enabled:
+            return None
+        key = normalize_query(query)
+        quarter_tag = current_quarter_tag()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[0] == quarter_tag:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[1].model_copy(deep=True)
+
+            conn = self._connect()
+            row = None
+            if conn is not None:
+                row = conn.execute(
+                    "SELECT quarter_tag, intent FROM intents WHERE query_key = ?", (key,)
+                ).fetchone()
+            if row is not None and row[0] == quarter_tag:
+                intent = AnalysisIntent.model_validate_json(row[1])
+                conn.execute("UPDATE intents SET last_used = ? WHERE query_key = ?", (time.time(), key))
+                conn.commit()
+                self._remember(key, quarter_tag, intent)
+                self.hits += 1
+                return intent.model_copy(deep=True)
+
+            # Mục của quý trước không còn đúng nữa
+            if entry is not None:
+                del self._memory[key]
+            if row is not None:
+                conn.execute("DELETE FROM intents WHERE query_key = ?", (key,))
+                conn.commit()
+            self.misses += 1
+            return None
+
+    def put(self, query: str, intent: AnalysisIntent) -> None:
+        if not self.enabled:
+            return
+        key = normalize_query(query)
+        quarter_tag = current_quarter_tag()
+        with self._lock:
+            self._remember(key, quarter_tag, intent.model_copy(deep=True))
+            conn = self._connect()
+            if conn is None:
+                return
+            conn.execute(
+                "INSERT OR REPLACE INTO intents (query_key, quarter_tag, intent, last_used) VALUES (?, ?, ?, ?)",
+                (key, quarter_tag, intent.model_dump_json(), time.time()),
+            )
+            # Giữ kho trên đĩa trong giới hạn, bỏ các mục lâu không dùng nhất
+            conn.execute(
+                "DELETE FROM intents WHERE query_key IN ("
+                "SELECT query_key FROM intents ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_persistent,),
+            )
+            conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            conn = self._connect()
+            if conn is not None:
+                conn.execute("DELETE FROM intents")
+                conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            conn = self._connect()
+            persistent = conn.execute("SELECT COUNT(*) FROM intents").fetchone()[0] if conn is not None else 0
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._memory),
+                "max_size": self.max_size,
+                "persistent_entries": persistent,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_intent_cache() -> IntentCache:
+    """Trả về cache dùng chung của tiến trình, khởi tạo từ biến môi trường ở lần gọi đầu."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = IntentCache.from_env()
+    return _cache
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Quản lý cache query -> AnalysisIntent")
+    parser.add_argument("command", choices=["stats", "clear"])
+    args = parser.parse_args()
+    cache = get_intent_cache()
+    if args.command == "clear":
+        cache.clear()
+    print(json.dumps(cache.stats(), ensure_ascii=False))
@@ -1,6 +1,13 @@
-from .process_query import process_query_node
-from .extract_link import extract_report_link_node, prepare_next_extraction_node
-from .collect_results import collect_result_node
-from .ask_user import ask_user_for_clarification_node
-from .routing import should_continue_extraction, check_extraction_result
-from .generate_response import generate_final_response_node
\ No newline at end of file
+from .process_query import process_query_node, aprocess_query_node
+from .extract_link import (
+    extract_report_link_node, extract_request_node, prepare_next_extraction_node,
+    aextract_report_link_node, aextract_request_node, aprepare_next_extraction_node,
+)
+from .collect_results import collect_result_node, acollect_result_node
+from .ask_user import (
+    ask_user_for_clarification_node, prepare_next_clarification_node, defer_clarification_node, interrupt_clarification_node,
+    aask_user_for_clarification_node, aprepare_next_clarification_node, adefer_clarification_node,
+    ainterrupt_clarification_node,
+)
+from .routing import should_continue_extraction, check_extraction_result, dispatch_extractions, check_pending_clarification
+from .generate_response import generate_final_response_node, agenerate_final_response_node
\ No newline at end of file
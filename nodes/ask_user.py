@@ -1,12 +1,16 @@
+import asyncio
 from state import StockReportState
 
+def _resolved(current, selected_choice) -> dict:
+    return {"request": current["request"], "report_link": selected_choice["link"]}
+
 def ask_user_for_clarification_node(state: StockReportState) -> StockReportState:
     """Hiển thị prompt và chờ người dùng nhập liệu."""
-    print("Bắt đầu Node: Hỏi người dùng")
-    prompt = state.get("clarification_prompt")
-    choices = state.get("possible_choices")
+    current = state["current"]
+    prompt = current.get("clarification_prompt")
+    choices = current.get("possible_choices")
     if not prompt or not choices:
-        return {**state, "error_message": "Lỗi logic: Thiếu prompt hoặc lựa chọn để hỏi người dùng."}
+        return {"current": {**current, "error_message": "Lỗi logic: Thiếu prompt hoặc lựa chọn để hỏi người dùng."}}
     print(prompt)
 
     while True:
@@ -15,14 +19,73 @@ def ask_user_for_clarification_node(state: StockReportState) -> StockReportState
             if 0 <= choice_idx < len(choices):
                 selected_choice = choices[choice_idx]
                 print(f"Bạn đã chọn: {selected_choice['title']}")
-                # Cập nhật state với link đã được giải quyết
-                return {
-                    **state,
-                    "report_link": selected_choice["link"],
-                    "clarification_prompt": None,
-                    "possible_choices": None
-                }
+                # Cập nhật yêu cầu hiện tại với link đã được giải quyết
+                return {"current": _resolved(current, selected_choice)}
             else:
                 print(f"Lựa chọn không hợp lệ. Vui lòng chọn một số từ 1 đến {len(choices)}.")
         except ValueError:
-            print("Vui lòng chỉ nhập số.")
\ No newline at end of file
+            print("Vui lòng chỉ nhập số.")
+
+async def aask_user_for_clarification_node(state: StockReportState) -> StockReportState:
+    """Bản bất đồng bộ: chờ nhập liệu trong thread riêng để không chặn các query khác trên event loop."""
+    return await asyncio.to_thread(ask_user_for_clarification_node, state)
+
+def interrupt_clarification_node(state: StockReportState) -> StockReportState:
+    """Chế độ server: tạm dừng graph bằng interrupt (state được lưu ở checkpointer) và chờ lựa chọn.
+
+    Graph chạy tiếp khi nhận `Command(resume=<số thứ tự lựa chọn>)`; lựa chọn không hợp lệ thì hỏi lại."""
+    current = state["current"]
+    prompt = current.get("clarification_prompt")
+    choices = current.get("possible_choices")
+    if not prompt or not choices:
+        return {"current": {**current, "error_message": "Lỗi logic: Thiếu prompt hoặc lựa chọn để hỏi người dùng."}}
+    from langgraph.types import interrupt
+
+    question = {
+        "request_id": current["request"].request_id,
+        "clarification_prompt": prompt,
+        "possible_choices": [choice["title"] for choice in choices],
+    }
+    while True:
+        answer = interrupt(question)
+        try:
+            choice_idx = int(answer) - 1
+        except (TypeError, ValueError):
+            choice_idx = -1
+        if 0 <= choice_idx < len(choices):
+            break
+        question = {**question, "error": f"Lựa chọn không hợp lệ. Vui lòng chọn một số từ 1 đến {len(choices)}."}
+    selected_choice = choices[choice_idx]
+    print(f"Người dùng đã chọn: {selected_choice['title']}")
+    return {"current": _resolved(current, selected_choice)}
+
+async def ainterrupt_clarification_node(state: StockReportState) -> StockReportState:
+    return interrupt_clarification_node(state)
+
+def defer_clarification_node(state: StockReportState) -> StockReportState:
+    """Chạy không tương tác (batch): ghi lại yêu cầu cần hỏi lại thay vì chờ người dùng chọn."""
+    current = state["current"]
+    choices = current.get("possible_choices") or []
+    titles = "; ".join(f"{i+1}. {choice['title']}" for i, choice in enumerate(choices))
+    return {"current": {
+        "request": current["request"],
+        "error_message": f"Cần người dùng chọn một trong các báo cáo: {titles}",
+    }}
+
+async def adefer_clarification_node(state: StockReportState) -> StockReportState:
+    return defer_clarification_node(state)
+
+def prepare_next_clarification_node(state: StockReportState) -> StockReportState:
+    """Chế độ song song: lấy yêu cầu cần hỏi lại tiếp theo (chưa có kết quả) làm yêu cầu hiện tại."""
+    collected = state.get("collected_links") or {}
+    update = {"current": None}
+    if state.get("pending_requests"):
+        # Tới đây mọi yêu cầu trong hàng đợi đều đã được gửi đi trích xuất
+        update["pending_requests"] = []
+    for request_id, record in (state.get("pending_clarifications") or {}).items():
+        if request_id not in collected:
+            return {**update, "current": record}
+    return update
+
+async def aprepare_next_clarification_node(state: StockReportState) -> StockReportState:
+    return prepare_next_clarification_node(state)
@@ -1,25 +1,24 @@
 from state import StockReportState
 
-def collect_result_node(state: StockReportState) -> StockReportState:
-    """Lưu kết quả của lần trích xuất vừa rồi vào collected_links."""
-    print("Bắt đầu Node: Thu thập Kết quả")
-
-    request_id = state["current_request_id"]
-    collected = state["collected_links"]
-
-    if state.get("report_link"):
-        result = state["report_link"]
+def format_result(request_id, report_link, error_message) -> str:
+    """Chuyển kết quả trích xuất của một yêu cầu thành chuỗi lưu trong collected_links."""
+    if report_link:
+        result = report_link
         print(f"Thành công: Yêu cầu {request_id} -> {result}")
-    elif state.get("error_message"):
-        result = f"LỖI: {state['error_message']}"
+    elif error_message:
+        result = f"LỖI: {error_message}"
         print(f"Thất bại: Yêu cầu {request_id} -> {result}")
     else:
         result = "LỖI: Không có link hoặc thông báo lỗi được trả về."
         print(f"Thất bại: Yêu cầu {request_id} -> {result}")
+    return result
+
+def collect_result_node(state: StockReportState) -> StockReportState:
+    """Lưu kết quả của lần trích xuất vừa rồi vào collected_links (reducer gộp theo request_id)."""
+    current = state["current"]
+    request_id = current["request"].request_id
+    result = format_result(request_id, current.get("report_link"), current.get("error_message"))
+    return {"collected_links": {request_id: result}}
 
-    collected[request_id] = result
-    
-    return {
-        **state,
-        "collected_links": collected
-    }
\ No newline at end of file
+async def acollect_result_node(state: StockReportState) -> StockReportState:
+    return collect_result_node(state)
\ No newline at end of file
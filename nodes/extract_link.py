@@ -1,149 +1,240 @@
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
-from state import StockReportState
+import os
+import time
+from browser_pool import get_async_browser_pool, get_browser_pool
+from report_cache import get_report_cache
+from report_index import CONSOLIDATION_STATUSES, ReportIndex, ReportIndexRegistry
+from state import StockReportState, ExtractionTask
+from tracing import span
+from .collect_results import format_result
 import regex as re
 
+REPORT_ROW_SELECTOR = "div.p-t-xs p.i-b-d"
+# Trả về [title, href] của link đầu tiên trong mỗi dòng, bỏ các dòng không có link
+EXTRACT_ROWS_JS = """
+rows => rows.flatMap(row => {
+    const a = row.querySelector("a");
+    return a ? [[a.innerText, a.getAttribute("href")]] : [];
+})
+"""
+YEAR_SELECTOR = "select.dropdown-year"
+# Chờ tới khi dòng đầu tiên thuộc năm vừa chọn
+YEAR_LOADED_JS = """
+(year) => {
+    const firstReport = document.querySelector("div.p-t-xs p.i-b-d a");
+    return firstReport && firstReport.innerText.includes(year);
+}
+"""
+TIMESTAMP_PATTERN = re.compile(r'\s*(\d{2}/\d{2}/\d{4}\s+\d{2}:\d{2})\s*$')
+
+# Index (mã, năm) dùng chung trong tiến trình, hết hạn theo cùng quy tắc với cache trên đĩa
+_index_registry = ReportIndexRegistry(lambda year, fetched_at: get_report_cache().is_expired(year, fetched_at))
+
+def get_vietstock_base_url() -> str:
+    """Địa chỉ gốc của Vietstock (có thể trỏ sang site giả lập khi benchmark)."""
+    return os.getenv("VIETSTOCK_BASE_URL", "https://finance.vietstock.vn").rstrip("/")
+
 def prepare_next_extraction_node(state: StockReportState) -> StockReportState:
-    """Lấy yêu cầu tiếp theo từ danh sách chờ và cập nhật State."""
-    print("Bắt đầu Node: Chuẩn bị Trích xuất")
-    pending = state["pending_requests"]
+    """Lấy yêu cầu đầu tiên khỏi hàng đợi và đặt làm yêu cầu hiện tại."""
+    pending = state.get("pending_requests")
     if not pending:
-        return {**state, "error_message": "Không có yêu cầu nào đang chờ."}
-    next_request = pending.pop(0) # Lấy yêu cầu đầu tiên
-    print(f"Đang xử lý yêu cầu: {next_request.request_id} - {next_request.stock_code} {next_request.period} {next_request.quarter}/{next_request.year}")
-
-    return {
-        **state,
-        "pending_requests": pending,
-        "current_request_id": next_request.request_id,
-        "stock_code": next_request.stock_code,
-        "year": next_request.year,
-        "period": next_request.period,
-        "quarter": next_request.quarter,
-        "consolidation_status": next_request.consolidation_status,
-        # Reset
-        "report_link": None,
-        "error_message": None,
-        "clarification_prompt": None,
-        "notification": None,
-    }
+        return {"error_message": "Không có yêu cầu nào đang chờ."}
+    # Reducer consume_queue bỏ phần tử đầu, không cần chép lại danh sách
+    return {"pending_requests": 1, "current": {"request": pending[0]}}
+
+def _find_for_request(request):
+    return find_report_link(
+        request.stock_code, request.year, request.period, request.quarter, request.consolidation_status
+    )
+
+async def _afind_for_request(request):
+    return await afind_report_link(
+        request.stock_code, request.year, request.period, request.quarter, request.consolidation_status
+    )
 
 def extract_report_link_node(state: StockReportState) -> StockReportState:
     """Node để trích xuất link PDF."""
-    print(f"Bắt đầu Node: Trích xuất link cho {state['stock_code']}")
-    # Khởi tạo
-    stock_code = state["stock_code"]
-    year = state["year"]
-    period = state["period"]
-    user_consol_status = state.get("consolidation_status")
-    output_state = { "report_link": None, "error_message": None, "clarification_prompt": None, "notification": None }
-    try:
-        with sync_playwright() as p:
-            # Truy cập vietstock
-            browser = p.chromium.launch(headless=True)
-            page = browser.new_page()
-            url = f"https://finance.vietstock.vn/{stock_code.upper()}/tai-tai-lieu.htm?doctype=1"
-            page.goto(url, wait_until="domcontentloaded", timeout=30000)
-            if period != "Mới nhất" and year:
-                # Chọn năm
-                year_selector = 'select.dropdown-year'
-                page.wait_for_selector(year_selector, timeout=30000) 
-                page.select_option(year_selector, str(year))
-                page.wait_for_function("""
-                            (year) => {
-                                const firstReport = document.querySelector("div.p-t-xs p.i-b-d a");
-                                return firstReport && firstReport.innerText.includes(year);
-                            }
-                        """, arg=str(year), timeout=60000)
-            reports_data = page.query_selector_all("div.p-t-xs p.i-b-d")
-            # Lấy tên và link của tất cả pdf báo cáo trong năm
-            scraped_reports = []
-            for row in reports_data:
-                title_element = row.query_selector("a")
-                if title_element:
-                    title = title_element.inner_text().strip()
-                    link = title_element.get_attribute('href')
-                    if link and not link.startswith('http'):
-                        link = "https://finance.vietstock.vn" + link
-                    # Bỏ thời gian tạo
-                    cleaned_title = re.sub(r'\s*\d{2}/\d{2}/\d{4}\s+\d{2}:\d{2}\s*$', '', title)
-                    scraped_reports.append({"title": cleaned_title, "link": link})
-            browser.close()
-            if not scraped_reports:
-                output_state["error_message"] = f"Không tìm thấy báo cáo nào cho mã {stock_code} năm {year}."
-                return {**state, **output_state}
-    except PlaywrightTimeoutError:
+    request = state["current"]["request"]
+    return {"current": {"request": request, **_find_for_request(request)}}
+
+async def aprepare_next_extraction_node(state: StockReportState) -> StockReportState:
+    return prepare_next_extraction_node(state)
+
+async def aextract_report_link_node(state: StockReportState) -> StockReportState:
+    """Bản bất đồng bộ của `extract_report_link_node`."""
+    request = state["current"]["request"]
+    return {"current": {"request": request, **await _afind_for_request(request)}}
+
+def extract_request_node(task: ExtractionTask) -> StockReportState:
+    """Node trích xuất cho một yêu cầu trong chế độ song song (nhận qua Send).
+
+    Chỉ ghi vào các key có reducer gộp để các nhánh chạy song song không đè lên nhau."""
+    request = task["request"]
+    return _request_update(request, _find_for_request(request))
+
+async def aextract_request_node(task: ExtractionTask) -> StockReportState:
+    """Bản bất đồng bộ của `extract_request_node`."""
+    request = task["request"]
+    return _request_update(request, await _afind_for_request(request))
+
+def _request_update(request, output_state) -> StockReportState:
+    if output_state.get("clarification_prompt"):
+        # Để dành, hỏi người dùng sau khi mọi nhánh khác đã xong
+        return {"pending_clarifications": {request.request_id: {
+            "request": request,
+            "clarification_prompt": output_state["clarification_prompt"],
+            "possible_choices": output_state["possible_choices"],
+        }}}
+    result = format_result(request.request_id, output_state.get("report_link"), output_state.get("error_message"))
+    return {"collected_links": {request.request_id: result}}
+
+def get_report_index(stock_code, year=None) -> ReportIndex:
+    """Index danh sách báo cáo, dùng chung giữa các yêu cầu cùng (mã, năm)."""
+    return _index_registry.get_or_build(stock_code, year, lambda: get_reports(stock_code, year))
+
+async def aget_report_index(stock_code, year=None) -> ReportIndex:
+    return await _index_registry.aget_or_build(stock_code, year, lambda: aget_reports(stock_code, year))
+
+def get_reports(stock_code, year=None) -> tuple:
+    """(danh sách báo cáo, fetched_at) của một mã trong năm (year=None: danh sách mới nhất), ưu tiên cache trên đĩa."""
+    cache = get_report_cache()
+    entry = cache.get_entry(stock_code, year)
+    if entry is not None:
+        return entry
+    scraped_reports = scrape_reports(stock_code, year)
+    fetched_at = time.time()
+    if scraped_reports:
+        cache.put(stock_code, year, scraped_reports)
+    return scraped_reports, fetched_at
+
+async def aget_reports(stock_code, year=None) -> tuple:
+    cache = get_report_cache()
+    entry = cache.get_entry(stock_code, year)
+    if entry is not None:
+        return entry
+    scraped_reports = await ascrape_reports(stock_code, year)
+    fetched_at = time.time()
+    if scraped_reports:
+        cache.put(stock_code, year, scraped_reports)
+    return scraped_reports, fetched_at
+
+def parse_report_rows(rows, base_url) -> list:
+    """Chuẩn hoá các cặp [title, href] lấy từ trang thành danh sách báo cáo."""
+    find_timestamp = TIMESTAMP_PATTERN.search
+    scraped_reports = []
+    for title, link in rows:
+        if link and not link.startswith('http'):
+            link = base_url + link
+        title = title.strip()
+        # Tách thời gian tạo khỏi tiêu đề
+        match = find_timestamp(title)
+        if match:
+            scraped_reports.append({"title": title[:match.start()], "link": link, "published": match.group(1)})
+        else:
+            scraped_reports.append({"title": title, "link": link, "published": None})
+    return scraped_reports
+
+async def _extract_listing_rows(page, base_url, stock_code, year):
+    """Mở trang tài liệu của mã trên `page`, chọn năm (nếu có) và đọc các hàng báo cáo."""
+    # Truy cập vietstock
+    url = f"{base_url}/{stock_code.upper()}/tai-tai-lieu.htm?doctype=1"
+    with span("page.load"):
+        await page.goto(url, wait_until="domcontentloaded", timeout=30000)
+    if year:
+        # Chọn năm
+        with span("page.select_year", year=year):
+            await page.wait_for_selector(YEAR_SELECTOR, timeout=30000)
+            await page.select_option(YEAR_SELECTOR, str(year))
+            await page.wait_for_function(YEAR_LOADED_JS, arg=str(year), timeout=60000)
+    # Lấy tên và link của tất cả pdf báo cáo trong năm bằng một lần gọi vào trang
+    with span("page.extract_rows"):
+        return await page.eval_on_selector_all(REPORT_ROW_SELECTOR, EXTRACT_ROWS_JS)
+
+def scrape_reports(stock_code, year=None) -> list:
+    """Scrape tên và link của tất cả pdf báo cáo trên Vietstock (year=None: danh sách mới nhất)."""
+    base_url = get_vietstock_base_url()
+    # Page mượn từ pool dùng chung, chạy trên thread chủ của pool
+    rows = get_browser_pool().run(_extract_listing_rows, base_url, stock_code, year)
+    return parse_report_rows(rows, base_url)
+
+async def ascrape_reports(stock_code, year=None) -> list:
+    """Bản bất đồng bộ của `scrape_reports`, dùng pool trình duyệt bất đồng bộ."""
+    base_url = get_vietstock_base_url()
+    async with get_async_browser_pool().lease_page() as page:
+        rows = await _extract_listing_rows(page, base_url, stock_code, year)
+    return parse_report_rows(rows, base_url)
+
+def _empty_output() -> dict:
+    return { "report_link": None, "error_message": None, "clarification_prompt": None, "notification": None }
+
+def _scrape_error_output(stock_code, error) -> dict:
+    # Playwright chỉ được import khi thực sự dùng tới
+    from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+    output_state = _empty_output()
+    if isinstance(error, PlaywrightTimeoutError):
         output_state["error_message"] = f"Không tìm thấy thông tin cho mã chứng khoán '{stock_code}'. Vui lòng kiểm tra lại mã."
-        return {**state, **output_state}
+    else:
+        output_state["error_message"] = f"Lỗi khi scraping web: {str(error)}"
+    return output_state
+
+def find_report_link(stock_code, year, period, user_quarter, user_consol_status) -> dict:
+    """Scrape Vietstock và chọn báo cáo phù hợp; trả về các trường kết quả cần cập nhật vào State."""
+    try:
+        index = get_report_index(stock_code, year if period != "Mới nhất" else None)
+    except Exception as e:
+        return _scrape_error_output(stock_code, e)
+    return select_report(index, stock_code, year, period, user_quarter, user_consol_status)
+
+async def afind_report_link(stock_code, year, period, user_quarter, user_consol_status) -> dict:
+    """Bản bất đồng bộ của `find_report_link`."""
+    try:
+        index = await aget_report_index(stock_code, year if period != "Mới nhất" else None)
     except Exception as e:
-        output_state["error_message"] = f"Lỗi khi scraping web: {str(e)}"
-        return {**state, **output_state}
-    
+        return _scrape_error_output(stock_code, e)
+    return select_report(index, stock_code, year, period, user_quarter, user_consol_status)
+
+def select_report(index: ReportIndex, stock_code, year, period, user_quarter, user_consol_status) -> dict:
+    """Chọn báo cáo phù hợp từ index đã có (không truy cập mạng)."""
+    # Khởi tạo
+    output_state = _empty_output()
+    if not index.records:
+        output_state["error_message"] = f"Không tìm thấy báo cáo nào cho mã {stock_code} năm {year}."
+        return output_state
+
     if period == "Mới nhất":
-        if not scraped_reports:
-            output_state["error_message"] = f"Không tìm thấy báo cáo nào cho mã {stock_code}."
-            return {**state, **output_state}
-            
         # Lọc theo Hợp nhất/Công ty mẹ nếu có yêu cầu
         if user_consol_status:
-            for report in scraped_reports:
-                if user_consol_status.lower() in report["title"].lower():
-                    output_state["report_link"] = report["link"]
-                    output_state["notification"] = f"Đã tìm thấy báo cáo mới nhất theo yêu cầu: '{report['title']}'."
-                    return {**state, **output_state}
+            report = index.latest(user_consol_status)
+            if report:
+                output_state["report_link"] = report.link
+                output_state["notification"] = f"Đã tìm thấy báo cáo mới nhất theo yêu cầu: '{report.title}'."
+                return output_state
 
             output_state["error_message"] = f"Không tìm thấy báo cáo '{user_consol_status}' mới nhất cho mã {stock_code}."
-            return {**state, **output_state}
+            return output_state
         else:
             # Nếu không yêu cầu, lấy cái đầu tiên (mới nhất)
-            selected_report = scraped_reports[0]
-            output_state["report_link"] = selected_report["link"]
-            output_state["notification"] = f"Đã tìm thấy báo cáo mới nhất: '{selected_report['title']}'. (Mặc định lấy báo cáo đầu tiên trong danh sách)."
-            return {**state, **output_state}
-
-    available_reports = {
-        "Cả năm": {"Hợp nhất": [], "Công ty mẹ": []},
-        "6 tháng": {"Hợp nhất": [], "Công ty mẹ": []},
-        "Quý": {
-            1: {"Hợp nhất": [], "Công ty mẹ": []}, 2: {"Hợp nhất": [], "Công ty mẹ": []},
-            3: {"Hợp nhất": [], "Công ty mẹ": []}, 4: {"Hợp nhất": [], "Công ty mẹ": []}
-        }
-    }
-
-    for report in scraped_reports:
-        title_lower = report["title"].lower()
-        consol_status = "Hợp nhất" if "hợp nhất" in title_lower else "Công ty mẹ"
-
-        if "kiểm toán" in title_lower: # Báo cáo năm
-            available_reports["Cả năm"][consol_status].append(report)
-        elif "soát xét" in title_lower: # Báo cáo 6 tháng
-            available_reports["6 tháng"][consol_status].append(report)
-        elif "quý" in title_lower: # Báo cáo quý
-            for q in range(1, 5):
-                if f"quý {q}" in title_lower:
-                    available_reports["Quý"][q][consol_status].append(report)
-                    break
-
-    user_quarter = state.get("quarter")
+            selected_report = index.latest()
+            output_state["report_link"] = selected_report.link
+            output_state["notification"] = f"Đã tìm thấy báo cáo mới nhất: '{selected_report.title}'. (Mặc định lấy báo cáo đầu tiên trong danh sách)."
+            return output_state
 
     # Trường hợp 1: Người dùng đã cung cấp đủ thông tin
     if period and user_consol_status:
-        found_reports = []
+        selected_report = None
         if period == "Quý" and user_quarter:
-            found_reports = available_reports["Quý"][user_quarter][user_consol_status]
-        elif period == "6 tháng":
-            found_reports = available_reports["6 tháng"][user_consol_status]
-        elif period == "Cả năm":
-            found_reports = available_reports["Cả năm"][user_consol_status]
-
-        if found_reports:
-            selected_report = found_reports[0]
-            output_state["report_link"] = selected_report["link"]
-            output_state["notification"] = f"Đã tìm thấy báo cáo '{selected_report['title']}' theo yêu cầu."
-            return {**state, **output_state}
+            selected_report = index.get("Quý", user_quarter, user_consol_status)
+        elif period in ("6 tháng", "Cả năm"):
+            selected_report = index.get(period, None, user_consol_status)
+
+        if selected_report:
+            output_state["report_link"] = selected_report.link
+            output_state["notification"] = f"Đã tìm thấy báo cáo '{selected_report.title}' theo yêu cầu."
+            return output_state
         else:
             req_str = f"{period} Quý {user_quarter}" if period == "Quý" else period
             output_state["error_message"] = f"Không tìm thấy báo cáo '{req_str} - {user_consol_status}' bạn yêu cầu."
-            return {**state, **output_state}
+            return output_state
 
     # Trường hợp 2: Agent tự tìm và hỏi lại
     possible_choices = []
@@ -151,36 +242,32 @@ def extract_report_link_node(state: StockReportState) -> StockReportState:
 
     # Tìm chính xác quý người dùng yêu cầu (nếu họ yêu cầu quý)
     if period == "Quý" and user_quarter:
-        for cons_stat in ["Hợp nhất", "Công ty mẹ"]:
-            if available_reports["Quý"][user_quarter][cons_stat]:
-                report_item = available_reports["Quý"][user_quarter][cons_stat][0]
-                possible_choices.append({"period": "Quý", "quarter": user_quarter, "consolidation_status": cons_stat, **report_item})
+        for cons_stat in CONSOLIDATION_STATUSES:
+            report = index.get("Quý", user_quarter, cons_stat)
+            if report:
+                possible_choices.append({"period": "Quý", "quarter": user_quarter, "consolidation_status": cons_stat, **report.as_report()})
 
-        # Nếu không tìm thấy quý yêu cầu
+        # Nếu không tìm thấy quý yêu cầu thì lấy quý gần nhất trước đó
         if not possible_choices:
             requested_quarter_failed = True
-            # Bắt đầu tìm lùi từ quý trước đó
-            for q_fallback in range(user_quarter - 1, 0, -1):
-                found_in_fallback_quarter = False
-                for cons_stat in ["Hợp nhất", "Công ty mẹ"]:
-                    if available_reports["Quý"][q_fallback][cons_stat]:
-                        report_item = available_reports["Quý"][q_fallback][cons_stat][0]
-                        possible_choices.append({"period": "Quý", "quarter": q_fallback, "consolidation_status": cons_stat, **report_item})
-                        found_in_fallback_quarter = True
-                if found_in_fallback_quarter:
-                    break 
+            q_fallback = index.fallback_quarter(user_quarter)
+            if q_fallback:
+                for cons_stat in CONSOLIDATION_STATUSES:
+                    report = index.get("Quý", q_fallback, cons_stat)
+                    if report:
+                        possible_choices.append({"period": "Quý", "quarter": q_fallback, "consolidation_status": cons_stat, **report.as_report()})
 
     # Nếu không có lựa chọn nào từ quý (hoặc người dùng không hỏi quý) thì tìm "6 tháng" và "Cả năm"
     if not possible_choices:
         if not requested_quarter_failed: 
-            for cons_stat in ["Hợp nhất", "Công ty mẹ"]:
-                if period != "Cả năm" and available_reports["6 tháng"][cons_stat]:
-                    report_item = available_reports["6 tháng"][cons_stat][0]
-                    possible_choices.append({"period": "6 tháng", "consolidation_status": cons_stat, **report_item})
+            for cons_stat in CONSOLIDATION_STATUSES:
+                report = index.get("6 tháng", None, cons_stat)
+                if period != "Cả năm" and report:
+                    possible_choices.append({"period": "6 tháng", "consolidation_status": cons_stat, **report.as_report()})
 
-                if period != "6 tháng" and available_reports["Cả năm"][cons_stat]:
-                    report_item = available_reports["Cả năm"][cons_stat][0]
-                    possible_choices.append({"period": "Cả năm", "consolidation_status": cons_stat, **report_item})
+                report = index.get("Cả năm", None, cons_stat)
+                if period != "6 tháng" and report:
+                    possible_choices.append({"period": "Cả năm", "consolidation_status": cons_stat, **report.as_report()})
 
     if len(possible_choices) == 0:
         if requested_quarter_failed:
@@ -208,4 +295,4 @@ def extract_report_link_node(state: StockReportState) -> StockReportState:
         prompt_text += "Bạn muốn tôi phân tích báo cáo nào?"
         output_state["clarification_prompt"] = prompt_text
         output_state["possible_choices"] = possible_choices
-    return {**state, **output_state}
\ No newline at end of file
+    return output_state
\ No newline at end of file
@@ -2,7 +2,6 @@ from state import StockReportState
 
 def generate_final_response_node(state: StockReportState) -> StockReportState:
     """Tạo câu trả lời cuối cùng dựa trên kết quả thu thập được."""
-    print("Bắt đầu Node: Tạo Phản hồi Cuối cùng")
     
     collected = state.get("collected_links", {})
     context = state.get("comparison_context", "")
@@ -13,10 +12,10 @@ def generate_final_response_node(state: StockReportState) -> StockReportState:
             f"Mục tiêu: {context}\n\n"
             f"Trạng thái:\n{notification}"
         )
-        return {**state, "final_response": final_response}
+        return {"final_response": final_response}
         
     if not collected and not notification:
-        return {**state, "final_response": "Rất tiếc, tôi không thể xử lý yêu cầu của bạn. Vui lòng thử lại với một truy vấn khác."}
+        return {"final_response": "Rất tiếc, tôi không thể xử lý yêu cầu của bạn. Vui lòng thử lại với một truy vấn khác."}
 
     response_parts = []
     response_parts.append(f"Mục tiêu phân tích: {context}")
@@ -32,4 +31,7 @@ def generate_final_response_node(state: StockReportState) -> StockReportState:
             else:
                 response_parts.append(f"Yêu cầu {req_id}: Thành công. Link: {result}")
     
-    return {**state, "final_response": "\n".join(response_parts)}
\ No newline at end of file
+    return {"final_response": "\n".join(response_parts)}
+
+async def agenerate_final_response_node(state: StockReportState) -> StockReportState:
+    return generate_final_response_node(state)
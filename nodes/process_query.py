@@ -1,26 +1,49 @@
+import threading
+from concurrency import get_budget
+from intent_cache import get_intent_cache
 from pydantic_models import AnalysisIntent, ReportRequest
+from query_parser import parse_query
+from tracing import span
 from state import StockReportState
-from tools import get_current_time
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import ChatPromptTemplate, FewShotChatMessagePromptTemplate
 from datetime import datetime
 
-def process_query_node(state: StockReportState) -> StockReportState:
-    print("Bắt đầu Node: Xử lý Query")
-    query = state["query"]
+SYSTEM_PROMPT = """Bạn là một chuyên gia phân tích tài chính thông minh. Nhiệm vụ của bạn là phân tích yêu cầu của người dùng và chia nó thành một danh sách các yêu cầu báo cáo riêng lẻ.
 
-    tools = [get_current_time]
-    llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0).bind_tools(tools)
-    llm_with_tools = llm.with_structured_output(AnalysisIntent)
-
-    system_prompt = """Bạn là một chuyên gia phân tích tài chính thông minh. Nhiệm vụ của bạn là phân tích yêu cầu của người dùng và chia nó thành một danh sách các yêu cầu báo cáo riêng lẻ.
+    {today}.
 
     QUY TẮC:
     1.  Bạn PHẢI trả lời bằng cách gọi hàm `AnalysisIntent` với danh sách TẤT CẢ các báo cáo cần thiết.
-    2.  Sử dụng tool `get_current_time` để biết ngày hiện tại. Dựa vào đó, nếu người dùng yêu cầu một báo cáo trong tương lai (ví dụ: hỏi BCTC Quý 4 vào tháng 10), hãy hiểu rằng báo cáo đó chưa tồn tại và KHÔNG đưa nó vào danh sách yêu cầu.
+    2.  Dựa vào ngày hiện tại ở trên, nếu người dùng yêu cầu một báo cáo trong tương lai (ví dụ: hỏi BCTC Quý 4 vào tháng 10), hãy hiểu rằng báo cáo đó chưa tồn tại và KHÔNG đưa nó vào danh sách yêu cầu.
     3.  Nếu người dùng không nói rõ "quý", "6 tháng" hay "cả năm" (ví dụ: "so sánh FPT 2023 và 2024"), hãy giả định họ muốn xem báo cáo "Cả năm".
     4.  Điền vào `comparison_context` một mô tả ngắn gọn về những gì người dùng muốn làm với các báo cáo này.
     """
+
+_intent_chain = None
+_intent_chain_lock = threading.Lock()
+
+def get_intent_chain():
+    """Chain prompt -> Gemini dùng chung cho cả tiến trình, dựng ở lần gọi đầu; ngày hiện tại được truyền vào lúc gọi."""
+    global _intent_chain
+    if _intent_chain is None:
+        with _intent_chain_lock:
+            if _intent_chain is None:
+                _intent_chain = build_intent_chain()
+    return _intent_chain
+
+def set_intent_chain(chain) -> None:
+    """Thay chain dùng chung (ví dụ LLM giả khi benchmark); chain cần có `invoke` và `ainvoke`."""
+    global _intent_chain
+    with _intent_chain_lock:
+        _intent_chain = chain
+
+def build_intent_chain():
+    # Import ở đây để khởi động nhanh: chỉ cần tới LangChain/Gemini khi query phải đi qua LLM
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    from langchain_core.prompts import ChatPromptTemplate, FewShotChatMessagePromptTemplate
+
+    llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0)
+    llm_structured = llm.with_structured_output(AnalysisIntent)
+
     # Few-shot examples
     examples = [
         {
@@ -79,66 +102,102 @@ def process_query_node(state: StockReportState) -> StockReportState:
         examples=examples,
     )
     final_prompt = ChatPromptTemplate.from_messages([
-        ("system", system_prompt),
+        ("system", SYSTEM_PROMPT),
         few_shot_prompt,
         ("user", "{query}")
     ])
 
-    chain = final_prompt | llm_with_tools
+    return final_prompt | llm_structured
+
+def process_query_node(state: StockReportState) -> StockReportState:
+    query = state["query"]
 
     try:
-        analysis_intent = chain.invoke({"query": query})
-        # Loại bỏ các báo cáo tương lai
-        now = datetime.now()
-        valid_requests = []
-        future_requests_messages = []
-
-        if not analysis_intent.requests:
-            return {
-                **state,
-                "pending_requests": [],
-                "comparison_context": analysis_intent.comparison_context,
-                "notification": "Tôi nhận thấy yêu cầu của bạn dành cho một báo cáo trong tương lai và chưa được phát hành. Do đó, không có tác vụ tìm kiếm nào được thực hiện.",
-                "collected_links": {}
-            }
-
-        for req in analysis_intent.requests:
-            if req.year is not None:
-                end_month = 12
-                if req.period == "Quý" and req.quarter:
-                    end_month = req.quarter * 3
-                elif req.period == "6 tháng":
-                    end_month = 6
-                
-                report_is_in_future = False
-                if req.year > now.year:
-                    report_is_in_future = True
-                elif req.year == now.year and end_month >= now.month:
-                     report_is_in_future = True
-
-                if report_is_in_future:
-                    req_str = f"{req.stock_code} {req.period} {req.quarter}/{req.year}" if req.period == "Quý" else f"{req.stock_code} {req.period}/{req.year}"
-                    future_requests_messages.append(f"- {req_str}")
-                    continue
-            
-            valid_requests.append(req)
-        
-        notification = None
-        if future_requests_messages:
-            notification = "Một số báo cáo bạn yêu cầu chưa đến kỳ phát hành và đã được bỏ qua:\n" + "\n".join(future_requests_messages)
+        # Thử bộ phân tích theo luật trước, chỉ gọi LLM khi nó không chắc chắn
+        with span("query.parse") as parse_span:
+            analysis_intent = parse_query(query)
+            parse_span.set(parsed=analysis_intent is not None)
+        if analysis_intent is None:
+            intent_cache = get_intent_cache()
+            analysis_intent = intent_cache.get(query)
+            if analysis_intent is None:
+                from tools import current_date_text
+                with span("llm.intent"):
+                    analysis_intent = get_intent_chain().invoke({"query": query, "today": current_date_text()})
+                intent_cache.put(query, analysis_intent)
+        return _intent_update(state, analysis_intent)
+    except Exception as e:
+        return _query_error_update(state, e)
 
-        return {
-            **state,
-            "pending_requests": valid_requests,
-            "comparison_context": analysis_intent.comparison_context,
-            "notification": notification,
-            "collected_links": {}
-        }
+async def aprocess_query_node(state: StockReportState) -> StockReportState:
+    """Bản bất đồng bộ của `process_query_node`; lời gọi LLM nằm trong ngân sách đồng thời chung."""
+    query = state["query"]
+
+    try:
+        with span("query.parse") as parse_span:
+            analysis_intent = parse_query(query)
+            parse_span.set(parsed=analysis_intent is not None)
+        if analysis_intent is None:
+            intent_cache = get_intent_cache()
+            analysis_intent = intent_cache.get(query)
+            if analysis_intent is None:
+                from tools import current_date_text
+                async with get_budget().llm_calls:
+                    with span("llm.intent"):
+                        analysis_intent = await get_intent_chain().ainvoke({"query": query, "today": current_date_text()})
+                intent_cache.put(query, analysis_intent)
+        return _intent_update(state, analysis_intent)
     except Exception as e:
-        print(f"Lỗi khi xử lý query: {e}")
+        return _query_error_update(state, e)
+
+def _intent_update(state: StockReportState, analysis_intent: AnalysisIntent) -> StockReportState:
+    """Loại bỏ các báo cáo tương lai và đưa các yêu cầu còn lại vào danh sách chờ."""
+    # Loại bỏ các báo cáo tương lai
+    now = datetime.now()
+    valid_requests = []
+    future_requests_messages = []
+
+    if not analysis_intent.requests:
         return {
-            **state,
             "pending_requests": [],
-            "collected_links": {},
-            "error_message": f"Lỗi nghiêm trọng khi xử lý query: {e}"
-        }
\ No newline at end of file
+            "comparison_context": analysis_intent.comparison_context,
+            "notification": "Tôi nhận thấy yêu cầu của bạn dành cho một báo cáo trong tương lai và chưa được phát hành. Do đó, không có tác vụ tìm kiếm nào được thực hiện.",
+        }
+
+    for req in analysis_intent.requests:
+        if req.year is not None:
+            end_month = 12
+            if req.period == "Quý" and req.quarter:
+                end_month = req.quarter * 3
+            elif req.period == "6 tháng":
+                end_month = 6
+
+            report_is_in_future = False
+            if req.year > now.year:
+                report_is_in_future = True
+            elif req.year == now.year and end_month >= now.month:
+                 report_is_in_future = True
+
+            if report_is_in_future:
+                req_str = f"{req.stock_code} {req.period} {req.quarter}/{req.year}" if req.period == "Quý" else f"{req.stock_code} {req.period}/{req.year}"
+                future_requests_messages.append(f"- {req_str}")
+                continue
+
+        valid_requests.append(req)
+
+    notification = None
+    if future_requests_messages:
+        notification = "Một số báo cáo bạn yêu cầu chưa đến kỳ phát hành và đã được bỏ qua:\n" + "\n".join(future_requests_messages)
+
+    return {
+        "pending_requests": valid_requests,
+        "comparison_context": analysis_intent.comparison_context,
+        "notification": notification,
+    }
+
+def _query_error_update(state: StockReportState, e: Exception) -> StockReportState:
+    print(f"Lỗi khi xử lý query: {e}")
+    return {
+        "pending_requests": [],
+        "error_message": f"Lỗi nghiêm trọng khi xử lý query: {e}"
+    }
\ No newline at end of file
@@ -1,17 +1,26 @@
-from typing import Literal
+from typing import List, Literal, Union
 from state import StockReportState
 
 def should_continue_extraction(state: StockReportState) -> Literal["continue", "end_extraction"]:
     """Kiểm tra xem còn yêu cầu nào trong danh sách chờ không."""
-    print("Router (Loop): Kiểm tra điều kiện lặp")
-    return "continue" if state["pending_requests"] else "end_extraction"
+    return "continue" if state.get("pending_requests") else "end_extraction"
 
 def check_extraction_result(state: StockReportState) -> Literal["ask_user", "collect"]:
     """Kiểm tra kết quả của node trích xuất để quyết định nhánh đi tiếp theo."""
-    print("Router (Result): Kiểm tra kết quả trích xuất")
-    if state.get("clarification_prompt"):
-        print("Quyết định: Cần hỏi người dùng.")
+    if (state.get("current") or {}).get("clarification_prompt"):
         return "ask_user"
     else:
-        print("Quyết định: Có thể thu thập kết quả.")
-        return "collect"
\ No newline at end of file
+        return "collect"
+
+def dispatch_extractions(state: StockReportState) -> Union[List, Literal["end_extraction"]]:
+    """Chế độ song song: gửi mọi yêu cầu đang chờ đi trích xuất cùng lúc (danh sách `Send`)."""
+    from langgraph.types import Send
+
+    pending = state.get("pending_requests") or []
+    if not pending:
+        return "end_extraction"
+    return [Send("extract_request", {"request": request}) for request in pending]
+
+def check_pending_clarification(state: StockReportState) -> Literal["ask_user", "end_extraction"]:
+    """Chế độ song song: còn yêu cầu nào cần hỏi lại người dùng không."""
+    return "ask_user" if (state.get("current") or {}).get("clarification_prompt") else "end_extraction"
@@ -0,0 +1,272 @@
+"""Cache kết quả OCR trên đĩa (SQLite), đánh địa chỉ theo nội dung.
+
+Khoá là SHA-256 của file PDF + tên engine + các tuỳ chọn ảnh hưởng tới kết quả
+(`engine.cache_options()`), nên đổi tên hay chép file không làm mất cache còn đổi
+model/cấu hình thì không dùng nhầm kết quả cũ. Markdown được lưu theo từng trang
+ngay khi trang đó xong: lần chạy bị lỗi giữa chừng chỉ phải OCR lại các trang còn thiếu.
+
+Tổng dung lượng markdown bị giới hạn bởi `OCR_CACHE_MAX_MB`; khi vượt, các tài liệu
+lâu nhất chưa được dùng bị xoá trước.
+
+CLI:
+    python -m ocr.cache stats
+    python -m ocr.cache evict --max-mb 100
+    python -m ocr.cache clear
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Dict, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ocr_documents (
+    key TEXT PRIMARY KEY,
+    pdf_sha256 TEXT NOT NULL,
+    engine TEXT NOT NULL,
+    options TEXT NOT NULL,
+    page_count INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ocr_pages (
+    key TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    markdown TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (key, page)
+);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class OcrCache:
+    """Markdown của từng trang theo (hash PDF, engine, tuỳ chọn)."""
+
+    def __init__(self, path: str, max_bytes: int = 1024 << 20, enabled: bool = True):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            path=os.getenv("OCR_CACHE_PATH", os.path.join(".cache", "ocr_results.sqlite3")),
+            max_bytes=int(float(os.getenv("OCR_CACHE_MAX_MB", "1024")) * (1 << 20)),
+            enabled=os.getenv("OCR_CACHE_DISABLED", "0") != "1",
+        )
+
+    def _connect(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    @staticmethod
+    def key(pdf_sha256: str, engine: str, options: dict) -> str:
+        payload = json.dumps([pdf_sha256, engine, options], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _count(self, conn, name: str, amount: int):
+        conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value", (name, amount)
+        )
+
+    def open_document(self, pdf_sha256: str, engine: str, options: dict, page_count: int) -> str:
+        """Đăng ký tài liệu (nếu chưa có), cập nhật thời điểm dùng và trả về khoá cache."""
+        key = self.key(pdf_sha256, engine, options)
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT INTO ocr_documents (key, pdf_sha256, engine, options, page_count, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(key) DO UPDATE SET last_used = excluded.last_used",
+                (key, pdf_sha256, engine, json.dumps(options, sort_keys=True), page_count, now, now),
+            )
+            conn.commit()
+        return key
+
+    def get_pages(self, key: str, page_count: int) -> Dict[int, str]:
+        """Các trang đã cache của tài liệu; đếm hit/miss theo số trang."""
+        with self._lock:
+            conn = self._connect()
+            pages = dict(conn.execute("SELECT page, markdown FROM ocr_pages WHERE key = ?", (key,)).fetchall())
+            hits = len(pages)
+            self.hits += hits
+            self.misses += page_count - hits
+            self._count(conn, "page_hits", hits)
+            self._count(conn, "page_misses", page_count - hits)
+            conn.commit()
+        return pages
+
+    def put_page(self, key: str, page: int, markdown: str) -> None:
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO ocr_pages (key, page, markdown, size, created_at) VALUES (?, ?, ?, ?, ?)",
+                (key, page, markdown, len(markdown.encode("utf-8")), time.time()),
+            )
+            conn.commit()
+
+    def evict(self, max_bytes: Optional[int] = None) -> int:
+        """Xoá tài liệu lâu nhất chưa dùng cho tới khi tổng dung lượng <= `max_bytes`. Trả về số tài liệu đã xoá."""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        evicted = 0
+        with self._lock:
+            conn = self._connect()
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM ocr_pages").fetchone()[0]
+            if total <= max_bytes:
+                return 0
+            rows = conn.execute(
+                "SELECT d.key, COALESCE(SUM(p.size), 0) FROM ocr_documents d LEFT JOIN ocr_pages p ON p.key = d.key "
+                "GROUP BY d.key ORDER BY d.last_used"
+            ).fetchall()
+            for key, size in rows:
+                if total <= max_bytes:
+                    break
+                conn.execute("DELETE FROM ocr_pages WHERE key = ?", (key,))
+                conn.execute("DELETE FROM ocr_documents WHERE key = ?", (key,))
+                total -= size
+                evicted += 1
+            self._count(conn, "evicted", evicted)
+            conn.commit()
+        return evicted
+
+    def clear(self) -> int:
+        with self._lock:
+            conn = self._connect()
+            deleted = conn.execute("DELETE FROM ocr_documents").rowcount
+            conn.execute("DELETE FROM ocr_pages")
+            conn.commit()
+        return deleted
+
+    def stats(self) -> dict:
+        with self._lock:
+            conn = self._connect()
+            documents = conn.execute("SELECT COUNT(*) FROM ocr_documents").fetchone()[0]
+            pages, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM ocr_pages").fetchone()
+            counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+        return {
+            "documents": documents,
+            "pages": pages,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "total_hits": counters.get("page_hits", 0),
+            "total_misses": counters.get("page_misses", 0),
+            "total_evicted": counters.get("evicted", 0),
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_ocr_cache() -> OcrCache:
+    """Trả về cache dùng chung của tiến trình, khởi tạo từ biến môi trường ở lần gọi đầu."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = OcrCache.from_env()
+    return _cache
+
+
+def page_count(pdf_path: str) -> int:
+    import pypdfium2 as pdfium
+
+    with pdfium.PdfDocument(pdf_path) as pdf:
+        return len(pdf)
+
+
+def _download(url: str) -> str:
+    """Tải PDF từ URL về file tạm để có thể băm nội dung."""
+    import requests
+
+    response = requests.get(url, timeout=120)
+    response.raise_for_status()
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+        f.write(response.content)
+    return f.name
+
+
+def convert_cached(engine, pdf_path: str, cache: Optional[OcrCache] = None) -> str:
+    """Chuyển PDF bằng `engine`, chỉ OCR các trang chưa có trong cache.
+
+    Engine cần có `name`, `cache_options()`, `iter_page_markdown(pdf_path, page_numbers)`
+    (trả về (số trang, markdown) theo thứ tự) và `join_pages(list markdown)`. Trang nào
+    engine không trả về thì báo RuntimeError thay vì coi là trang rỗng."""
+    cache = cache or get_ocr_cache()
+    downloaded = None
+    if "://" in pdf_path:
+        pdf_path = downloaded = _download(pdf_path)
+    try:
+        count = page_count(pdf_path)
+        all_pages = list(range(1, count + 1))
+        if not cache.enabled:
+            pages = dict(engine.iter_page_markdown(pdf_path, all_pages))
+        else:
+            key = cache.open_document(file_sha256(pdf_path), engine.name, engine.cache_options(), count)
+            pages = cache.get_pages(key, count)
+            missing = [page for page in all_pages if page not in pages]
+            if missing:
+                # Ghi từng trang ngay khi xong để lần chạy sau tiếp tục từ chỗ bị lỗi
+                for page, markdown in engine.iter_page_markdown(pdf_path, missing):
+                    cache.put_page(key, page, markdown)
+                    pages[page] = markdown
+                cache.evict()
+        # Không ghép tài liệu có lỗ: trang engine không trả về sẽ được OCR lại ở lần sau
+        missing = [page for page in all_pages if page not in pages]
+        if missing:
+            raise RuntimeError(f"{engine.name}: không có kết quả cho trang {missing} của {pdf_path}")
+        return engine.join_pages([pages[page] for page in all_pages])
+    finally:
+        if downloaded:
+            os.remove(downloaded)
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Quản lý cache kết quả OCR")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("stats", help="Thống kê cache")
+    evict_parser = subparsers.add_parser("evict", help="Xoá tài liệu cũ cho tới khi dưới giới hạn dung lượng")
+    evict_parser.add_argument("--max-mb", type=float, help="Giới hạn (MB), mặc định OCR_CACHE_MAX_MB")
+    subparsers.add_parser("clear", help="Xoá toàn bộ cache")
+
+    args = parser.parse_args()
+    cache = get_ocr_cache()
+    if args.command == "evict":
+        max_bytes = int(args.max_mb * (1 << 20)) if args.max_mb is not None else None
+        print(f"Đã xoá {cache.evict(max_bytes)} tài liệu")
+    elif args.command == "clear":
+        print(f"Đã xoá {cache.clear()} tài liệu")
+    print(json.dumps(cache.stats(), ensure_ascii=False))
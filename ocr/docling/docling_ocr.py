@@ -5,40 +5,145 @@ from docling.datamodel.pipeline_options import (
 )
 from docling.document_converter import DocumentConverter, PdfFormatOption
 from docling.datamodel.accelerator_options import AcceleratorDevice
+from concurrent.futures import ProcessPoolExecutor
 from time import time
+import math
+import multiprocessing
 import os
 
-start = time()
-input_doc_path = "https://static2.vietstock.vn/data/HNX/2025/BCTC/VN/QUY%202/SHS_Baocaotaichinh_Q2_2025.pdf"
-doc_name = 'SHS_Q2_2025.pdf'
+from ocr.cache import convert_cached
 
-pipeline_options = PdfPipelineOptions()
-pipeline_options.accelerator_options.device = AcceleratorDevice.CUDA
-pipeline_options.do_ocr = True
-pipeline_options.do_table_structure = True
-pipeline_options.table_structure_options.do_cell_matching = True
+OUTPUT_DIR = "ocr/docling/output"
+# Số trang tối đa mỗi lần convert: lỗi giữa chừng chỉ làm mất một đoạn
+PAGES_PER_CALL = 8
 
-ocr_options = TesseractCliOcrOptions(force_full_page_ocr=True, lang=['vie'])
-#ocr_options = EasyOcrOptions(force_full_page_ocr=True, lang=['vi'])
+def build_converter(device="cuda", num_threads=None):
+    pipeline_options = PdfPipelineOptions()
+    pipeline_options.accelerator_options.device = AcceleratorDevice(device.split(":")[0])
+    if num_threads:
+        pipeline_options.accelerator_options.num_threads = num_threads
+    pipeline_options.do_ocr = True
+    pipeline_options.do_table_structure = True
+    pipeline_options.table_structure_options.do_cell_matching = True
 
-pipeline_options.ocr_options = ocr_options
+    ocr_options = TesseractCliOcrOptions(force_full_page_ocr=True, lang=['vie'])
+    #ocr_options = EasyOcrOptions(force_full_page_ocr=True, lang=['vi'])
 
-converter = DocumentConverter(
-    format_options={
-        InputFormat.PDF: PdfFormatOption(
-            pipeline_options=pipeline_options,
-        )
-    }
-)
+    pipeline_options.ocr_options = ocr_options
+
+    return DocumentConverter(
+        format_options={
+            InputFormat.PDF: PdfFormatOption(
+                pipeline_options=pipeline_options,
+            )
+        }
+    )
+
+def page_chunks(page_numbers, size):
+    """Gom các trang liên tiếp thành đoạn tối đa `size` trang để convert bằng page_range."""
+    chunks = []
+    for page in page_numbers:
+        if chunks and page == chunks[-1][-1] + 1 and len(chunks[-1]) < size:
+            chunks[-1].append(page)
+        else:
+            chunks.append([page])
+    return chunks
+
+def convert_range(converter, pdf_path, pages):
+    # page_range đánh số từ 1, gồm hai đầu; số trang trong document giữ nguyên như PDF gốc
+    document = converter.convert(pdf_path, page_range=(pages[0], pages[-1])).document
+    return [(page, document.export_to_markdown(page_no=page)) for page in pages]
+
+# Converter của tiến trình worker, nạp một lần trong initializer của pool
+_worker_converter = None
+
+def _init_worker(num_threads):
+    global _worker_converter
+    # Tesseract (OpenMP) và torch chỉ dùng phần lõi của tiến trình này
+    os.environ["OMP_NUM_THREADS"] = str(num_threads)
+    os.environ["OMP_THREAD_LIMIT"] = str(num_threads)
+    _worker_converter = build_converter("cpu", num_threads=num_threads)
+    _worker_converter.initialize_pipeline(InputFormat.PDF)
+
+def _worker_convert_range(pdf_path, pages):
+    return convert_range(_worker_converter, pdf_path, pages)
+
+def _worker_ready(_):
+    return os.getpid()
+
+class DoclingEngine:
+    """Giữ DocumentConverter (model layout, bảng) trong bộ nhớ để chuyển nhiều PDF liên tiếp.
+
+    Trên CPU, `workers` > 1 (mặc định `DOCLING_WORKERS`) chia PDF thành các đoạn trang và
+    chạy song song trên một pool tiến trình, mỗi tiến trình giữ một converter đã nạp sẵn
+    và dùng `số lõi / workers` thread; markdown được ghép lại theo thứ tự trang gốc."""
+    name = "docling"
+
+    def __init__(self, device="cuda", workers=None):
+        if workers is None:
+            workers = int(os.getenv("DOCLING_WORKERS", "1"))
+        if workers > 1 and device != "cpu":
+            raise ValueError("Docling nhiều tiến trình chỉ dùng với device='cpu'")
+        self.workers = workers
+        self.output_dir = OUTPUT_DIR
+        self.converter = None
+        self.pool = None
+        if workers > 1:
+            # spawn: không fork tiến trình đã nạp torch
+            self.pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker, initargs=(max(1, (os.cpu_count() or 1) // workers),))
+            # Nạp model trong mọi worker ngay thay vì ở lần chuyển đầu tiên
+            list(self.pool.map(_worker_ready, range(workers)))
+        else:
+            self.converter = build_converter(device)
+            # Nạp model ngay thay vì ở lần chuyển đầu tiên
+            self.converter.initialize_pipeline(InputFormat.PDF)
+
+    def cache_options(self):
+        return {"ocr": "tesseract", "lang": ["vie"], "force_full_page_ocr": True, "table_cell_matching": True}
+
+    def iter_page_markdown(self, pdf_path, page_numbers):
+        if self.pool is None:
+            for chunk in page_chunks(page_numbers, PAGES_PER_CALL):
+                yield from convert_range(self.converter, pdf_path, chunk)
+            return
+        # Khoảng hai đoạn mỗi worker để cân tải khi các trang nặng nhẹ khác nhau
+        size = max(1, min(PAGES_PER_CALL, math.ceil(len(page_numbers) / (self.workers * 2))))
+        futures = [self.pool.submit(_worker_convert_range, pdf_path, chunk) for chunk in page_chunks(page_numbers, size)]
+        try:
+            # Lấy kết quả theo thứ tự đoạn nên trang ra đúng thứ tự dù các đoạn xong lệch nhau
+            for future in futures:
+                yield from future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+    def join_pages(self, pages):
+        return "\n\n".join(page for page in pages if page)
+
+    def convert(self, pdf_path):
+        return convert_cached(self, pdf_path)
+
+if __name__ == "__main__":
+    start = time()
+    input_doc_path = "https://static2.vietstock.vn/data/HNX/2025/BCTC/VN/QUY%202/SHS_Baocaotaichinh_Q2_2025.pdf"
+    doc_name = 'SHS_Q2_2025.pdf'
+
+    engine = DoclingEngine(device=os.getenv("OCR_DEVICE", "cuda"))
+    md = engine.convert(input_doc_path)
+    engine.close()
 
-doc = converter.convert(input_doc_path).document
-md = doc.export_to_markdown()
+    md_filename = doc_name.split('.')[0] + ".md"
+    output_filepath = os.path.join(OUTPUT_DIR, md_filename)
 
-md_filename = doc_name.split('.')[0] + ".md"
-output_filepath = os.path.join("ocr/docling/output", md_filename)
+    with open(output_filepath, "w", encoding="utf-8") as f:
+        f.write(md)
 
-with open(output_filepath, "w", encoding="utf-8") as f:
-    f.write(md)
-    
-end = time()
-print(f"Total time: {end - start} seconds")
\ No newline at end of file
+    end = time()
+    print(f"Total time: {end - start} seconds")
\ No newline at end of file
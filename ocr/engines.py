@@ -0,0 +1,84 @@
+"""Danh sách engine OCR cho worker.
+
+Mỗi engine nạp model một lần trong `__init__` và có `convert(pdf_path) -> markdown`
+cùng thư mục output mặc định `output_dir`. Module của engine (và torch, paddle...)
+chỉ được import khi engine được chọn.
+
+`convert` đi qua `ocr.cache.convert_cached`, nên engine còn có `cache_options()`,
+`iter_page_markdown(pdf_path, page_numbers)` (OCR riêng các trang được yêu cầu) và
+`join_pages(markdown từng trang)`. Giao diện chung được mô tả bởi `OcrEngine`.
+Engine "text_layer" chỉ đọc lớp text (không model, không GPU) và "marker_api" gọi
+API Datalab, cả hai chạy được trên CI.
+
+`OCR_DEVICE` chọn thiết bị ("cuda" mặc định, "cpu" để chạy không cần GPU).
+`OCR_TEXT_LAYER=0` tắt bước lọc trang theo lớp text (`ocr.text_layer`), buộc OCR mọi trang.
+"""
+import importlib
+import os
+from typing import Iterator, List, Protocol, Sequence, Tuple
+
+# Tên engine -> (module, lớp engine)
+ENGINES = {
+    "vintern": ("ocr.vintern.vintern_ocr", "VinternEngine"),
+    "marker": ("ocr.marker.marker_ocr", "MarkerEngine"),
+    "docling": ("ocr.docling.docling_ocr", "DoclingEngine"),
+    "paddle": ("ocr.paddle.paddle_ocr", "PaddleEngine"),
+    "marker_api": ("ocr.marker.marker_api", "MarkerApiEngine"),
+    "text_layer": ("ocr.text_layer", "TextLayerEngine"),
+}
+# Engine không cần GPU, dùng cho benchmark trên CI
+CPU_ENGINES = ("text_layer", "marker_api")
+
+
+class OcrEngine(Protocol):
+    """PDF -> markdown theo từng trang (trang đánh số từ 1)."""
+    name: str
+    output_dir: str
+
+    def cache_options(self) -> dict: ...
+
+    def iter_page_markdown(self, pdf_path: str, page_numbers: Sequence[int]) -> Iterator[Tuple[int, str]]: ...
+
+    def join_pages(self, pages: List[str]) -> str: ...
+
+    def convert(self, pdf_path: str) -> str: ...
+
+
+def default_device() -> str:
+    return os.getenv("OCR_DEVICE", "cuda")
+
+
+def text_layer_enabled() -> bool:
+    return os.getenv("OCR_TEXT_LAYER", "1") != "0"
+
+
+def load_engine(name: str, device: str = None, text_layer: bool = None, **options) -> OcrEngine:
+    """Import module của engine và nạp model; `options` được truyền thẳng cho lớp engine.
+
+    Với `text_layer` (mặc định theo `OCR_TEXT_LAYER`), trang có lớp text tốt được trích
+    thẳng và chỉ các trang còn lại mới đưa vào engine."""
+    if name not in ENGINES:
+        raise ValueError(f"Engine OCR không hợp lệ: {name!r} (chọn một trong {', '.join(ENGINES)})")
+    module_name, class_name = ENGINES[name]
+    engine_class = getattr(importlib.import_module(module_name), class_name)
+    engine = engine_class(device=device or default_device(), **options)
+    if text_layer is None:
+        text_layer = text_layer_enabled()
+    if text_layer and name != "text_layer":
+        from ocr.text_layer import TriagedEngine
+
+        engine = TriagedEngine(engine)
+    return engine
+
+
+def markdown_path(pdf_path: str, output_dir: str) -> str:
+    return os.path.join(output_dir, os.path.splitext(os.path.basename(pdf_path))[0] + ".md")
+
+
+def write_markdown(pdf_path: str, markdown: str, output_dir: str) -> str:
+    """Ghi markdown vào `output_dir/<tên pdf>.md`, trả về đường dẫn file."""
+    os.makedirs(output_dir, exist_ok=True)
+    path = markdown_path(pdf_path, output_dir)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(markdown)
+    return path
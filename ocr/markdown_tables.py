@@ -0,0 +1,88 @@
+"""Đọc bảng markdown trong kết quả OCR và chấm điểm các ô số so với markdown tham chiếu.
+
+Số theo kiểu báo cáo Việt Nam: dấu chấm phân cách hàng nghìn, dấu phẩy thập phân,
+số âm trong ngoặc: "1.885.909.938.569", "(3.897.720)", "3,5%". Dạng kiểu Anh
+("1,885,909", "3.5") cũng được nhận khi không nhập nhằng.
+"""
+import re
+from collections import Counter
+from typing import Iterator, List, Optional
+
+NUMERIC_CELL = re.compile(r"^\(?[-+]?[\d.,]*\d[\d.,]*\)?%?$")
+SEPARATOR_ROW = re.compile(r"^\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?$")
+
+
+def split_row(line: str) -> List[str]:
+    line = line.strip()
+    if line.startswith("|"):
+        line = line[1:]
+    if line.endswith("|"):
+        line = line[:-1]
+    return [cell.strip() for cell in line.split("|")]
+
+
+def iter_tables(markdown: str) -> Iterator[List[List[str]]]:
+    """Mỗi bảng markdown (các dòng liền nhau bắt đầu bằng "|") là một list hàng, bỏ dòng phân cách."""
+    rows = []
+    for line in markdown.splitlines():
+        if line.lstrip().startswith("|"):
+            if not SEPARATOR_ROW.match(line.strip()):
+                rows.append(split_row(line))
+            continue
+        if rows:
+            yield rows
+            rows = []
+    if rows:
+        yield rows
+
+
+def parse_number(cell: str) -> Optional[float]:
+    """Giá trị của một ô số, hoặc None nếu ô không phải số."""
+    text = cell.replace(" ", "").replace(" ", "")
+    if not NUMERIC_CELL.match(text):
+        return None
+    negative = text.startswith("(") and text.endswith(")") or text.lstrip("(").startswith("-")
+    text = text.strip("()%+-")
+    if "." in text and "," in text:
+        # Dấu xuất hiện sau cùng là dấu thập phân
+        thousands, decimal = (".", ",") if text.rfind(",") > text.rfind(".") else (",", ".")
+        text = text.replace(thousands, "").replace(decimal, ".")
+    elif "." in text or "," in text:
+        mark = "." if "." in text else ","
+        groups = text.split(mark)
+        if len(groups) > 2 or (mark == "." and len(groups[1]) == 3):
+            # Nhiều dấu, hoặc "1.000": phân cách hàng nghìn
+            if not all(len(group) == 3 for group in groups[1:]):
+                return None
+            text = "".join(groups)
+        else:
+            text = text.replace(mark, ".")
+    try:
+        value = float(text)
+    except ValueError:
+        return None
+    return -value if negative else value
+
+
+def numeric_cells(markdown: str) -> Counter:
+    """Multiset các giá trị số trong mọi ô của mọi bảng."""
+    values = Counter()
+    for table in iter_tables(markdown):
+        for row in table:
+            for cell in row:
+                value = parse_number(cell)
+                if value is not None:
+                    values[value] += 1
+    return values
+
+
+def score_numeric_cells(reference: str, hypothesis: str) -> dict:
+    """Precision/recall/F1 của các ô số trong bảng, so theo giá trị (không phụ thuộc vị trí bảng)."""
+    expected, found = numeric_cells(reference), numeric_cells(hypothesis)
+    matched = sum((expected & found).values())
+    total_expected, total_found = sum(expected.values()), sum(found.values())
+    precision = matched / total_found if total_found else 0.0
+    recall = matched / total_expected if total_expected else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"reference_cells": total_expected, "found_cells": total_found, "matched": matched,
+            "precision": precision, "recall": recall, "f1": f1}
@@ -1,47 +1,272 @@
-import requests
+"""Client bất đồng bộ cho Marker API (datalab.to): gửi nhiều PDF cùng lúc và ghi markdown ngay khi xong.
+
+Mỗi PDF (đường dẫn file hoặc URL) đi qua submit -> poll `request_check_url` -> ghi
+`<output-dir>/<tên>.md`. Tối đa `--max-in-flight` tài liệu được xử lý cùng lúc; khoảng
+poll tăng dần (`--poll-interval` nhân 1.5 tới `--max-poll-interval`); khi poll, lỗi
+mạng, 429 và 5xx được thử lại với backoff luỹ thừa (429 làm mọi request tạm dừng theo
+Retry-After). Submit chỉ thử lại khi chưa kết nối được hoặc bị 429, vì server có thể
+đã nhận (và tính tiền) một request bị timeout hay trả 5xx. Mỗi tài liệu in một dòng JSON khi xong. Tài liệu đã có file markdown
+được bỏ qua (mỗi lần gọi API đều tốn tiền), trừ khi có `--overwrite`.
+
+    python -m ocr.marker.marker_api ocr/FPT_Baocaotaichinh_Q3_2025_Congtyme.pdf https://.../bctc.pdf
+    python -m ocr.marker.marker_api --api-url http://127.0.0.1:8766/api/v1/marker --max-in-flight 8 *.pdf
+
+Cần `MARKER_API_KEY`; `MARKER_API_URL` đổi endpoint (ví dụ stub `benchmarks/stub_marker_api.py`).
+"""
+import argparse
+import asyncio
+import json
 import os
+import random
+import re
 import time
-from dotenv import load_dotenv
-load_dotenv()
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+from urllib.parse import unquote, urlparse
+
+import httpx
+
 # 35s - 43 trang - 0.13 USD
-url = "https://www.datalab.to/api/v1/marker"
-#pdf_path = "ocr/FPT_Baocaotaichinh_Q3_2025_Congtyme.pdf"
-pdf_url = "https://static2.vietstock.vn/vietstock/2025/10/10/20251010___ijc___bctc_hop_nhat_quy_3_nam_2025.pdf"
-pdf_name = 'IJC_Q3_2025.pdf'
-form_data = {
-    #'file': (pdf_path, open(pdf_path, 'rb'), 'application/pdf'),
-    'file_url': (None, pdf_url),
-    "force_ocr": (None, True),
-    'output_format': (None, 'markdown'),
-    "use_llm": (None, True),
-    "disable_image_extraction": (None, True),
-    "paginate": (None, True),
-    "format_lines": (None, False),
-    "additional_config": (None, "{\"drop_repeated_text\": true}")
+API_URL = os.getenv("MARKER_API_URL", "https://www.datalab.to/api/v1/marker")
+OUTPUT_DIR = "ocr/marker/output"
+FORM_OPTIONS = {
+    "force_ocr": "true",
+    "output_format": "markdown",
+    "use_llm": "true",
+    "disable_image_extraction": "true",
+    "paginate": "true",
+    "format_lines": "false",
+    "additional_config": "{\"drop_repeated_text\": true}",
 }
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Với submit (POST, không idempotent) chỉ thử lại khi chắc chắn server chưa xử lý request
+SUBMIT_RETRY_STATUSES = {429}
+SUBMIT_RETRY_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+COST_PER_PAGE = float(os.getenv("MARKER_API_COST_PER_PAGE", "0.003"))
+# Với paginate, mỗi trang bắt đầu bằng "{số trang từ 0}" + 48 dấu "-"
+PAGE_SEPARATOR = re.compile(r"(?:^|\n\n)\{(\d+)\}-{48}\n*")
+
+
+class MarkerApiError(Exception):
+    """Marker API trả lỗi không thử lại được, hoặc hết số lần thử."""
+
+
+def source_name(source: str) -> str:
+    """Tên file markdown cho một đường dẫn hoặc URL PDF."""
+    path = unquote(urlparse(source).path) if "://" in source else source
+    return os.path.splitext(os.path.basename(path))[0] + ".md"
+
+
+def split_pages(markdown: str) -> Dict[int, str]:
+    """Markdown đã phân trang -> {số trang (từ 1): markdown của trang}."""
+    parts = PAGE_SEPARATOR.split(markdown)
+    return {int(page_id) + 1: text.strip() for page_id, text in zip(parts[1::2], parts[2::2])}
+
+
+class MarkerApiClient:
+    def __init__(self, api_key: Optional[str] = None, api_url: str = API_URL, max_in_flight: int = 4,
+                 max_retries: int = 5, poll_interval: float = 1.0, max_poll_interval: float = 15.0,
+                 max_wait: float = 700.0, timeout: float = 60.0, options: Optional[dict] = None):
+        self.api_key = api_key if api_key is not None else os.getenv("MARKER_API_KEY")
+        self.api_url = api_url
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.max_wait = max_wait
+        self.timeout = timeout
+        self.options = {**FORM_OPTIONS, **(options or {})}
+        self._paused_until = 0.0
+
+    async def _wait_for_pause(self):
+        # 429 ở một request làm mọi request khác cùng chờ, thay vì cùng bị từ chối
+        delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _retry_delay(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return min(30.0, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    async def _request(self, client: httpx.AsyncClient, method: str, url: str, stats: dict, **kwargs) -> dict:
+        """Gửi request, thử lại khi lỗi mạng/429/5xx (POST: chỉ lỗi kết nối/429); trả về JSON."""
+        idempotent = method != "POST"
+        retry_statuses = RETRY_STATUSES if idempotent else SUBMIT_RETRY_STATUSES
+        retry_errors = httpx.TransportError if idempotent else SUBMIT_RETRY_ERRORS
+        for attempt in range(self.max_retries + 1):
+            await self._wait_for_pause()
+            response = None
+            try:
+                response = await client.request(method, url, **kwargs)
+                if response.status_code not in retry_statuses:
+                    response.raise_for_status()
+                    return response.json()
+                error = f"HTTP {response.status_code}"
+            except retry_errors as e:
+                error = f"{type(e).__name__}: {e}"
+            except httpx.TransportError as e:
+                raise MarkerApiError(f"{method} {url} lỗi, không thử lại: {type(e).__name__}: {e}") from e
+            except httpx.HTTPStatusError as e:
+                raise MarkerApiError(f"HTTP {e.response.status_code}: {e.response.text[:200]}") from e
+            if attempt == self.max_retries:
+                break
+            stats["retries"] += 1
+            delay = self._retry_delay(attempt, response)
+            if response is not None and response.status_code == 429:
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            await asyncio.sleep(delay)
+        raise MarkerApiError(f"{method} {url} thất bại sau {self.max_retries + 1} lần: {error}")
+
+    def _client(self) -> httpx.AsyncClient:
+        limits = httpx.Limits(max_connections=self.max_in_flight * 2, max_keepalive_connections=self.max_in_flight)
+        headers = {"X-Api-Key": self.api_key} if self.api_key else {}
+        return httpx.AsyncClient(headers=headers, timeout=self.timeout, limits=limits)
+
+    async def _submit(self, client: httpx.AsyncClient, source: str, stats: dict,
+                      page_numbers: Optional[Sequence[int]] = None) -> str:
+        files = {name: (None, value) for name, value in self.options.items()}
+        if page_numbers:
+            # API nhận page_range với chỉ số trang từ 0
+            files["page_range"] = (None, ",".join(str(page - 1) for page in page_numbers))
+        if "://" in source:
+            files["file_url"] = (None, source)
+        else:
+            with open(source, "rb") as f:
+                files["file"] = (os.path.basename(source), f.read(), "application/pdf")
+        data = await self._request(client, "POST", self.api_url, stats, files=files)
+        if not data.get("request_check_url"):
+            raise MarkerApiError(f"Submit không trả về request_check_url: {data.get('error') or data}")
+        return data["request_check_url"]
+
+    async def _poll(self, client: httpx.AsyncClient, check_url: str, stats: dict) -> dict:
+        interval = self.poll_interval
+        deadline = time.monotonic() + self.max_wait
+        while True:
+            data = await self._request(client, "GET", check_url, stats)
+            stats["polls"] += 1
+            if data.get("status") == "complete":
+                if data.get("success") is False:
+                    raise MarkerApiError(data.get("error") or "Marker API báo chuyển đổi thất bại")
+                return data
+            if data.get("status") == "failed":
+                raise MarkerApiError(data.get("error") or "Marker API báo chuyển đổi thất bại")
+            if time.monotonic() + interval > deadline:
+                raise MarkerApiError(f"Quá {self.max_wait:g}s chưa xong")
+            await asyncio.sleep(interval)
+            interval = min(self.max_poll_interval, interval * 1.5)
+
+    async def convert(self, client: httpx.AsyncClient, source: str, output_dir: str, semaphore: asyncio.Semaphore,
+                      overwrite: bool = False) -> dict:
+        output_path = os.path.join(output_dir, source_name(source))
+        result = {"source": source, "output": output_path}
+        if not overwrite and os.path.exists(output_path):
+            return {**result, "status": "skipped"}
+        stats = {"polls": 0, "retries": 0}
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                check_url = await self._submit(client, source, stats)
+                data = await self._poll(client, check_url, stats)
+                # Ghi ra tên tạm rồi đổi tên để không để lại file dở khi bị ngắt
+                temporary = output_path + ".part"
+                with open(temporary, "w", encoding="utf-8") as f:
+                    f.write(data.get("markdown") or "")
+                os.replace(temporary, output_path)
+                result.update(status="done", pages=data.get("page_count"), runtime=data.get("runtime"))
+            except (MarkerApiError, OSError) as e:
+                result.update(status="failed", error=f"{type(e).__name__}: {e}")
+            result.update(stats, elapsed=time.perf_counter() - started)
+        return result
+
+    async def convert_many(self, sources: Iterable[str], output_dir: str = OUTPUT_DIR, overwrite: bool = False,
+                           emit: Optional[Callable[[dict], None]] = None) -> List[dict]:
+        """Chuyển mọi nguồn, tối đa `max_in_flight` cùng lúc; `emit` được gọi ngay khi mỗi tài liệu xong."""
+        os.makedirs(output_dir, exist_ok=True)
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+        async with self._client() as client:
+            tasks = [asyncio.ensure_future(self.convert(client, source, output_dir, semaphore, overwrite))
+                     for source in sources]
+            results = []
+            for task in asyncio.as_completed(tasks):
+                result = await task
+                if emit is not None:
+                    emit(result)
+                results.append(result)
+        return results
+
+    async def fetch(self, source: str, page_numbers: Optional[Sequence[int]] = None) -> dict:
+        """Chuyển một tài liệu (chỉ các trang `page_numbers`, đánh số từ 1, nếu có) và trả về kết quả của API."""
+        stats = {"polls": 0, "retries": 0}
+        async with self._client() as client:
+            check_url = await self._submit(client, source, stats, page_numbers)
+            return await self._poll(client, check_url, stats)
+
+
+class MarkerApiEngine:
+    """Marker qua API theo giao diện engine của `ocr.engines`: không cần GPU, tính tiền theo trang."""
+    name = "marker_api"
+
+    def __init__(self, device=None, cost_per_page: float = COST_PER_PAGE, **options):
+        self.client = MarkerApiClient(**options)
+        self.cost_per_page = cost_per_page
+        self.output_dir = OUTPUT_DIR
+
+    def cache_options(self):
+        return dict(self.client.options)
+
+    def iter_page_markdown(self, pdf_path, page_numbers):
+        # Một request cho mọi trang còn thiếu: API tự chia trang, gửi từng trang chỉ thêm chi phí poll
+        data = asyncio.run(self.client.fetch(pdf_path, page_numbers))
+        pages = split_pages(data.get("markdown") or "")
+        # Trang thiếu trong kết quả không được trả về dạng rỗng, nếu không cache sẽ giữ trang trắng mãi
+        missing = [page for page in page_numbers if page not in pages]
+        for page in page_numbers:
+            if page in pages:
+                yield page, pages[page]
+        if missing:
+            raise MarkerApiError(f"{pdf_path}: kết quả thiếu trang {missing} (có {sorted(pages)})")
+
+    def join_pages(self, pages):
+        return "\n\n".join(page for page in pages if page)
+
+    def convert(self, pdf_path):
+        from ocr.cache import convert_cached
+
+        return convert_cached(self, pdf_path)
+
+
+def convert_many(sources: Iterable[str], output_dir: str = OUTPUT_DIR, overwrite: bool = False,
+                 emit: Optional[Callable[[dict], None]] = None, **options) -> List[dict]:
+    """Bản đồng bộ của `MarkerApiClient.convert_many`; `options` truyền cho `MarkerApiClient`."""
+    return asyncio.run(MarkerApiClient(**options).convert_many(sources, output_dir, overwrite, emit))
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Chuyển nhiều PDF sang markdown qua Marker API")
+    parser.add_argument("sources", nargs="+", help="Đường dẫn PDF hoặc URL")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--api-url", default=API_URL)
+    parser.add_argument("--max-in-flight", type=int, default=int(os.getenv("MARKER_API_MAX_IN_FLIGHT", "4")))
+    parser.add_argument("--max-retries", type=int, default=5)
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Khoảng poll đầu tiên (giây)")
+    parser.add_argument("--max-poll-interval", type=float, default=15.0)
+    parser.add_argument("--max-wait", type=float, default=700.0, help="Thời gian chờ tối đa mỗi tài liệu (giây)")
+    parser.add_argument("--overwrite", action="store_true", help="Chuyển lại cả tài liệu đã có markdown")
+    args = parser.parse_args()
 
-headers = {"X-Api-Key": os.getenv("MARKER_API_KEY")}
-response = requests.post(url, files=form_data, headers=headers)
-data = response.json()
-
-max_polls = 350
-check_url = data["request_check_url"]
-for i in range(max_polls):
-    response = requests.get(check_url, headers=headers)
-    check_result = response.json()
-    if check_result['status'] == 'complete':
-        converted_document = check_result['markdown']
-        md_filename = pdf_name.split('.')[0] + ".md"
-        output_filepath = os.path.join("ocr/marker/output", md_filename)
-        with open(output_filepath, "w", encoding="utf-8") as f:
-            f.write(converted_document)
-
-        print(f"Elapsed time: {check_result['runtime']} seconds")
-        break
-
-    elif check_result["status"] == "failed":
-        print("Failed to convert, uh oh...")
-        break
-    else:
-        print("Waiting 2 more seconds to re-check conversion status")
-        time.sleep(2)
+    start = time.time()
+    results = convert_many(
+        args.sources, args.output_dir, args.overwrite,
+        emit=lambda result: print(json.dumps(result, ensure_ascii=False), flush=True),
+        api_url=args.api_url, max_in_flight=args.max_in_flight, max_retries=args.max_retries,
+        poll_interval=args.poll_interval, max_poll_interval=args.max_poll_interval, max_wait=args.max_wait,
+    )
+    done = sum(result["status"] == "done" for result in results)
+    print(f"{done}/{len(results)} tài liệu xong, elapsed time: {time.time() - start:.1f} seconds")
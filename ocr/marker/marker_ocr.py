@@ -5,41 +5,81 @@ from marker.models import create_model_dict
 from marker.output import text_from_rendered
 from marker.config.parser import ConfigParser
 from time import time
+
+from ocr.cache import convert_cached
+from ocr.marker.marker_api import split_pages
 load_dotenv()
 
-start = time()
-# Configs
-config = {
-    "output_format": "markdown",
-    "force_ocr": True,
-    "use_llm": True,
-    "gemini_api_key": os.getenv("GOOGLE_API_KEY"),
-    "TORCH_DEVICE": "cuda",
-    "disable_image_extraction": True,
-    }
-config_parser = ConfigParser(config)
-# OCR Model (Surya)
-model_artifacts = create_model_dict(device="cuda:0")
-
-converter = PdfConverter(
-    config=config_parser.generate_config_dict(),
-    artifact_dict=create_model_dict(),
-    processor_list=config_parser.get_processors(),
-    renderer=config_parser.get_renderer(),
-    llm_service=config_parser.get_llm_service()
-)
-
-pdf_path = "ocr/DBC_Baocaotaichinh_Q3_2025_Hopnhat.pdf"
-rendered = converter(pdf_path)
-
-text, _, images = text_from_rendered(rendered)
-
-pdf_filename = os.path.basename(pdf_path)
-md_filename = os.path.splitext(pdf_filename)[0] + ".md"
-output_filepath = os.path.join("ocr/marker/output", md_filename)
-
-with open(output_filepath, "w", encoding="utf-8") as f:
-    f.write(text)
-
-end = time()
-print(f"Elapsed time: {end - start} seconds")
\ No newline at end of file
+OUTPUT_DIR = "ocr/marker/output"
+# Số trang tối đa mỗi lần gọi converter: đủ lớn để các processor nhìn được nhiều trang liền nhau,
+# đủ nhỏ để lỗi giữa chừng chỉ làm mất một đoạn
+PAGES_PER_CALL = 8
+
+def build_converter(device="cuda", use_llm=True):
+    # Configs
+    config = {
+        "output_format": "markdown",
+        "force_ocr": True,
+        "use_llm": use_llm,
+        "gemini_api_key": os.getenv("GOOGLE_API_KEY"),
+        "TORCH_DEVICE": device,
+        "disable_image_extraction": True,
+        "paginate_output": True,
+        }
+    config_parser = ConfigParser(config)
+    # OCR Model (Surya), chỉ nạp một lần
+    return PdfConverter(
+        config=config_parser.generate_config_dict(),
+        artifact_dict=create_model_dict(device=device),
+        processor_list=config_parser.get_processors(),
+        renderer=config_parser.get_renderer(),
+        llm_service=config_parser.get_llm_service()
+    )
+
+class MarkerEngine:
+    """Giữ converter Marker (model Surya) trong bộ nhớ để chuyển nhiều PDF liên tiếp."""
+    name = "marker"
+
+    def __init__(self, device="cuda", use_llm=True):
+        self.use_llm = use_llm
+        self.converter = build_converter(device, use_llm)
+        self.output_dir = OUTPUT_DIR
+
+    def cache_options(self):
+        return {"force_ocr": True, "use_llm": self.use_llm}
+
+    def iter_page_markdown(self, pdf_path, page_numbers):
+        for start in range(0, len(page_numbers), PAGES_PER_CALL):
+            chunk = page_numbers[start:start + PAGES_PER_CALL]
+            # PdfProvider đọc page_range (chỉ số từ 0) từ config ở mỗi lần gọi
+            self.converter.config["page_range"] = [page - 1 for page in chunk]
+            rendered = self.converter(pdf_path)
+            text, _, images = text_from_rendered(rendered)
+            pages = split_pages(text)
+            for page in chunk:
+                # Trang không có trong kết quả thì bỏ qua để không bị cache thành trang rỗng
+                if page in pages:
+                    yield page, pages[page]
+
+    def join_pages(self, pages):
+        return "\n\n".join(page for page in pages if page)
+
+    def convert(self, pdf_path):
+        return convert_cached(self, pdf_path)
+
+if __name__ == "__main__":
+    start = time()
+    engine = MarkerEngine(device=os.getenv("OCR_DEVICE", "cuda"))
+
+    pdf_path = "ocr/DBC_Baocaotaichinh_Q3_2025_Hopnhat.pdf"
+    text = engine.convert(pdf_path)
+
+    pdf_filename = os.path.basename(pdf_path)
+    md_filename = os.path.splitext(pdf_filename)[0] + ".md"
+    output_filepath = os.path.join(OUTPUT_DIR, md_filename)
+
+    with open(output_filepath, "w", encoding="utf-8") as f:
+        f.write(text)
+
+    end = time()
+    print(f"Elapsed time: {end - start} seconds")
\ No newline at end of file
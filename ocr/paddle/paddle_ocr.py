@@ -1,31 +1,85 @@
+import os
 from pathlib import Path
+import numpy as np
 from paddleocr import PaddleOCRVL
 
-input_file = "ocr/FPT_Baocaotaichinh_Q3_2025_Congtyme.pdf"
-output_path = Path("ocr/paddle/output")
+from ocr.cache import convert_cached, page_count
+from ocr.page_source import PageStream
 
-pipeline = PaddleOCRVL(vl_rec_backend="vllm-server", vl_rec_server_url="http://127.0.0.1:8118/v1", use_doc_orientation_classify=True)
-output = pipeline.predict(input=input_file)
+OUTPUT_DIR = "ocr/paddle/output"
+VL_REC_SERVER_URL = os.getenv("PADDLE_VL_SERVER_URL", "http://127.0.0.1:8118/v1")
 
-markdown_list = []
-markdown_images = []
+def build_pipeline(device="cuda"):
+    # Model nhận dạng chạy trên vLLM server; device chỉ áp dụng cho các model layout/hướng trang
+    return PaddleOCRVL(vl_rec_backend="vllm-server", vl_rec_server_url=VL_REC_SERVER_URL, use_doc_orientation_classify=True,
+                       device="cpu" if device == "cpu" else device.replace("cuda", "gpu"))
 
-for res in output:
-    md_info = res.markdown
-    markdown_list.append(md_info)
-    markdown_images.append(md_info.get("markdown_images", {}))
+class PaddleEngine:
+    """Giữ pipeline PaddleOCR-VL trong bộ nhớ để chuyển nhiều PDF liên tiếp; ảnh trong trang được lưu vào `output_dir`.
 
-markdown_texts = pipeline.concatenate_markdown_pages(markdown_list)
+    `pipelined` (mặc định `PADDLE_PIPELINED=1`) dùng `ocr.paddle.pipelined`: layout trang
+    sau chạy chồng với nhận dạng trang trước, tối đa `depth` (`PADDLE_VL_DEPTH`) request
+    tới server VL cùng lúc; chế độ này không lưu ảnh trong trang."""
+    name = "paddle"
 
-mkd_file_path = output_path / f"{Path(input_file).stem}.md"
-mkd_file_path.parent.mkdir(parents=True, exist_ok=True)
+    def __init__(self, device="cuda", output_dir=OUTPUT_DIR, dpi=144, pipelined=None, depth=None):
+        # 144 dpi bằng tỉ lệ PaddleX dùng khi tự render PDF
+        if pipelined is None:
+            pipelined = os.getenv("PADDLE_PIPELINED", "0") == "1"
+        self.output_dir = output_dir
+        self.dpi = dpi
+        self.pipeline = None
+        self.vl_pipeline = None
+        if pipelined:
+            from ocr.paddle.pipelined import PaddlePipeline, load_layout_model
 
-with open(mkd_file_path, "w", encoding="utf-8") as f:
-    f.write(markdown_texts)
+            depth = depth or int(os.getenv("PADDLE_VL_DEPTH", "8"))
+            self.vl_pipeline = PaddlePipeline(VL_REC_SERVER_URL, load_layout_model(device), depth=depth)
+        else:
+            self.pipeline = build_pipeline(device)
 
-for item in markdown_images:
-    if item:
-        for path, image in item.items():
-            file_path = output_path / path
-            file_path.parent.mkdir(parents=True, exist_ok=True)
-            image.save(file_path)
\ No newline at end of file
+    def cache_options(self):
+        mode = "pipelined" if self.vl_pipeline is not None else "paddleocr-vl"
+        return {"server": VL_REC_SERVER_URL, "use_doc_orientation_classify": True, "dpi": self.dpi, "mode": mode}
+
+    def iter_page_markdown(self, pdf_path, page_numbers):
+        if self.vl_pipeline is not None:
+            with PageStream(pdf_path, dpi=self.dpi, page_numbers=page_numbers) as pages:
+                yield from self.vl_pipeline.iter_pages(pages)
+            return
+        # Tự render từng trang thay vì đưa cả PDF để chỉ OCR các trang được yêu cầu
+        output_path = Path(self.output_dir)
+        with PageStream(pdf_path, dpi=self.dpi, page_numbers=page_numbers) as pages:
+            for page_number, image in pages:
+                # Pipeline nhận mảng ảnh theo thứ tự kênh BGR
+                for res in self.pipeline.predict(input=np.ascontiguousarray(np.asarray(image.convert("RGB"))[:, :, ::-1])):
+                    md_info = res.markdown
+                    for path, markdown_image in (md_info.get("markdown_images") or {}).items():
+                        file_path = output_path / path
+                        file_path.parent.mkdir(parents=True, exist_ok=True)
+                        markdown_image.save(file_path)
+                    yield page_number, md_info["markdown_texts"]
+
+    def join_pages(self, pages):
+        return "\n\n".join(page for page in pages if page)
+
+    def convert(self, pdf_path):
+        return convert_cached(self, pdf_path)
+
+if __name__ == "__main__":
+    input_file = "ocr/FPT_Baocaotaichinh_Q3_2025_Congtyme.pdf"
+    output_path = Path(OUTPUT_DIR)
+
+    engine = PaddleEngine(device=os.getenv("OCR_DEVICE", "cuda"))
+
+    mkd_file_path = output_path / f"{Path(input_file).stem}.md"
+    mkd_file_path.parent.mkdir(parents=True, exist_ok=True)
+
+    # Ghi nối từng trang ngay khi xong thay vì giữ cả tài liệu trong bộ nhớ
+    with open(mkd_file_path, "w", encoding="utf-8") as f:
+        written = False
+        for page_number, markdown in engine.iter_page_markdown(input_file, list(range(1, page_count(input_file) + 1))):
+            if markdown:
+                f.write(("\n\n" if written else "") + markdown)
+                f.flush()
+                written = True
\ No newline at end of file
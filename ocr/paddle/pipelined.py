@@ -0,0 +1,178 @@
+"""PaddleOCR-VL dạng pipeline: phân tích layout và nhận dạng VL chạy chồng lên nhau.
+
+`PaddleOCRVL.predict` làm layout rồi nhận dạng từng trang một, nên server VL (vLLM)
+ngồi chờ trong lúc client chạy model layout. Ở đây:
+    layout    một thread chạy PP-DocLayoutV2 cho trang kế tiếp (tối đa `lookahead` trang trước)
+    nhận dạng mỗi khối (đoạn văn, bảng, công thức, biểu đồ) là một request tới endpoint
+              OpenAI-compatible `/chat/completions`, tối đa `depth` request cùng lúc,
+              request của trang sau được gửi ngay khi còn chỗ, không chờ trang trước xong
+Markdown của mỗi trang được trả về (theo thứ tự trang) ngay khi mọi khối của trang xong.
+Server giả lập để kiểm thử: `benchmarks/fake_openai_vl.py`.
+"""
+import base64
+import io
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List, NamedTuple, Tuple
+
+import httpx
+import numpy as np
+
+VL_MODEL = os.getenv("PADDLE_VL_MODEL", "PaddleOCR-VL-0.9B")
+LAYOUT_MODEL = "PP-DocLayoutV2"
+# Prompt theo tác vụ của PaddleOCR-VL; nhãn layout khác dùng "OCR:"
+PROMPTS = {
+    "table": "Table Recognition:",
+    "formula": "Formula Recognition:",
+    "display_formula": "Formula Recognition:",
+    "chart": "Chart Recognition:",
+}
+DEFAULT_PROMPT = "OCR:"
+# Khối không đưa vào markdown (giống mặc định của PaddleOCRVL: bỏ header/footer, số trang, ảnh)
+SKIPPED_LABELS = {"image", "header_image", "footer_image", "seal", "header", "footer", "number", "aside_text"}
+TITLE_PREFIXES = {"doc_title": "# ", "paragraph_title": "## "}
+OTSL_CELL = re.compile(r"<(fcel|ecel|lcel|ucel|xcel)>([^<]*)")
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class Block(NamedTuple):
+    label: str
+    box: Tuple[int, int, int, int]
+
+
+def load_layout_model(device="cuda"):
+    from paddleocr import LayoutDetection
+
+    return LayoutDetection(model_name=LAYOUT_MODEL, device="cpu" if device == "cpu" else device.replace("cuda", "gpu"))
+
+
+def detect_blocks(layout_model, image) -> List[Block]:
+    """Các khối cần nhận dạng của một trang, theo thứ tự đọc mà model layout trả về."""
+    # Model nhận mảng ảnh theo thứ tự kênh BGR
+    result = next(iter(layout_model.predict(np.ascontiguousarray(np.asarray(image.convert("RGB"))[:, :, ::-1]))))
+    return [Block(box["label"], tuple(int(round(v)) for v in box["coordinate"]))
+            for box in result.json["res"]["boxes"] if box["label"] not in SKIPPED_LABELS]
+
+
+def otsl_to_markdown(text: str) -> str:
+    """Bảng dạng OTSL (<fcel>, <ecel>, ô gộp <lcel>/<ucel>/<xcel>, <nl> xuống dòng) -> bảng markdown."""
+    if "<nl>" not in text and "cel>" not in text:
+        return text.strip()
+    rows = []
+    for line in text.split("<nl>"):
+        cells = [content.strip() if kind == "fcel" else "" for kind, content in OTSL_CELL.findall(line)]
+        if cells:
+            rows.append(cells)
+    if not rows:
+        return text.strip()
+    width = max(len(row) for row in rows)
+    lines = ["| " + " | ".join(row + [""] * (width - len(row))) + " |" for row in rows]
+    lines.insert(1, "|" + "---|" * width)
+    return "\n".join(lines)
+
+
+def block_markdown(block: Block, content: str) -> str:
+    if block.label == "table":
+        return otsl_to_markdown(content)
+    if block.label in ("formula", "display_formula"):
+        return f"$$\n{content.strip()}\n$$"
+    return TITLE_PREFIXES.get(block.label, "") + content.strip()
+
+
+def _image_url(image) -> str:
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+class VLClient:
+    """Client đồng bộ cho endpoint OpenAI-compatible của server VL, pool kết nối đủ cho `depth` request."""
+
+    def __init__(self, server_url: str, depth: int = 8, model: str = VL_MODEL, timeout: float = 120.0,
+                 max_retries: int = 3, max_tokens: int = 4096):
+        self.url = server_url.rstrip("/") + "/chat/completions"
+        self.model = model
+        self.max_retries = max_retries
+        self.max_tokens = max_tokens
+        self.client = httpx.Client(timeout=timeout, limits=httpx.Limits(max_connections=depth,
+                                                                        max_keepalive_connections=depth))
+
+    def recognize(self, image, prompt: str) -> str:
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": [
+                {"type": "image_url", "image_url": {"url": _image_url(image)}},
+                {"type": "text", "text": prompt},
+            ]}],
+            "temperature": 0.0,
+            "max_tokens": self.max_tokens,
+        }
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.client.post(self.url, json=payload)
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    return response.json()["choices"][0]["message"]["content"] or ""
+                error = f"HTTP {response.status_code}"
+            except httpx.TransportError as e:
+                error = f"{type(e).__name__}: {e}"
+            if attempt < self.max_retries:
+                time.sleep(0.5 * 2 ** attempt)
+        raise RuntimeError(f"Server VL lỗi sau {self.max_retries + 1} lần: {error}")
+
+    def close(self):
+        self.client.close()
+
+
+class PaddlePipeline:
+    def __init__(self, server_url: str, layout_model, depth: int = 8, lookahead: int = 2, model: str = VL_MODEL):
+        self.layout_model = layout_model
+        self.depth = depth
+        self.lookahead = max(1, lookahead)
+        self.client = VLClient(server_url, depth=depth, model=model)
+
+    def iter_pages(self, page_images: Iterable[Tuple[int, object]]) -> Iterator[Tuple[int, str]]:
+        """(số trang, ảnh PIL) -> (số trang, markdown) theo thứ tự trang, trả ngay khi mỗi trang xong."""
+        layout_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="paddle-layout")
+        request_pool = ThreadPoolExecutor(max_workers=self.depth, thread_name_prefix="paddle-vl")
+        page_images = iter(page_images)
+        layouts = deque()  # (số trang, ảnh, future các khối)
+        recognizing = deque()  # (số trang, [(khối, future nội dung)])
+
+        def submit_layout():
+            item = next(page_images, None)
+            if item is not None:
+                page_number, image = item
+                layouts.append((page_number, image, layout_pool.submit(detect_blocks, self.layout_model, image)))
+
+        def finish(requests):
+            return "\n\n".join(markdown for markdown in (block_markdown(block, future.result())
+                                                          for block, future in requests) if markdown)
+
+        try:
+            for _ in range(self.lookahead):
+                submit_layout()
+            while layouts or recognizing:
+                if layouts:
+                    page_number, image, future = layouts.popleft()
+                    blocks = future.result()
+                    # Layout trang kế tiếp chạy trong lúc các khối của trang này đang được nhận dạng
+                    submit_layout()
+                    recognizing.append((page_number, [
+                        (block, request_pool.submit(self.client.recognize, image.crop(block.box),
+                                                    PROMPTS.get(block.label, DEFAULT_PROMPT)))
+                        for block in blocks]))
+                # Trả các trang đầu hàng đã xong; chờ nếu đã có quá `lookahead` trang đang nhận dạng
+                while recognizing and (not layouts or len(recognizing) > self.lookahead
+                                       or all(future.done() for _, future in recognizing[0][1])):
+                    page_number, requests = recognizing.popleft()
+                    yield page_number, finish(requests)
+        finally:
+            layout_pool.shutdown(wait=True, cancel_futures=True)
+            request_pool.shutdown(wait=True, cancel_futures=True)
+
+    def close(self):
+        self.client.close()
@@ -0,0 +1,78 @@
+"""Render trang PDF thành ảnh theo kiểu streaming cho các engine OCR nhận ảnh.
+
+`convert_from_path` render mọi trang vào bộ nhớ trước khi OCR bắt đầu. `PageStream`
+render từng trang (pdf2image với `first_page = last_page`) trên một thread pool
+nhỏ, luôn render trước tối đa `prefetch` trang, nên việc render chạy song song với
+inference và bộ nhớ đỉnh không phụ thuộc số trang:
+
+    with PageStream(pdf_path, dpi=200, first_page=3, last_page=10) as pages:
+        for page_number, image in pages:
+            ...
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional, Sequence, Tuple
+
+from pdf2image import convert_from_path, pdfinfo_from_path
+
+
+class PageStream:
+    def __init__(self, pdf_path: str, dpi: int = 200, first_page: int = 1, last_page: Optional[int] = None,
+                 workers: int = 2, prefetch: int = 4, page_numbers: Optional[Sequence[int]] = None):
+        """`page_numbers` (đánh số từ 1) chọn các trang bất kỳ theo thứ tự cho trước, thay cho first_page/last_page."""
+        self.pdf_path = pdf_path
+        self.dpi = dpi
+        page_count = pdfinfo_from_path(pdf_path)["Pages"]
+        if page_numbers is None:
+            page_numbers = range(max(1, first_page), min(last_page or page_count, page_count) + 1)
+        self.page_numbers = [page_number for page_number in page_numbers if 1 <= page_number <= page_count]
+        self.workers = workers
+        self.prefetch = max(1, prefetch)
+        self._executor = None
+
+    def __len__(self) -> int:
+        return len(self.page_numbers)
+
+    def render(self, page_number: int):
+        return convert_from_path(self.pdf_path, dpi=self.dpi, first_page=page_number, last_page=page_number)[0]
+
+    def __iter__(self) -> Iterator[Tuple[int, object]]:
+        """Trả về (số trang, ảnh PIL) theo thứ tự trang."""
+        self._executor = self._executor or ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="page-render")
+        page_numbers = iter(self.page_numbers)
+        # Hàng đợi có giới hạn: chỉ giữ tối đa `prefetch` trang đang/đã render mà chưa được lấy
+        pending = deque()
+        for page_number in page_numbers:
+            pending.append((page_number, self._executor.submit(self.render, page_number)))
+            if len(pending) >= self.prefetch:
+                break
+        try:
+            while pending:
+                page_number, future = pending.popleft()
+                image = future.result()
+                next_page = next(page_numbers, None)
+                if next_page is not None:
+                    pending.append((next_page, self._executor.submit(self.render, next_page)))
+                yield page_number, image
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+
+def iter_pages(pdf_path: str, **options) -> Iterator:
+    """Ảnh PIL của từng trang theo thứ tự; `options` như của `PageStream`."""
+    with PageStream(pdf_path, **options) as pages:
+        for _, image in pages:
+            yield image
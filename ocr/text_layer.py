@@ -0,0 +1,271 @@
+"""Phân loại trang theo lớp text nhúng trong PDF để bỏ qua OCR cho trang sinh từ máy tính.
+
+Mỗi trang được đánh giá bằng lớp text (pypdfium2) theo ba tiêu chí:
+    số ký tự          trang scan thường không có hoặc chỉ có vài ký tự
+    dấu tiếng Việt    tỉ lệ từ có dấu đủ cao, gần như không có ký tự lạ (font mã
+                      TCVN3/VNI hay lỗi map glyph cho ra "µ", "Ò", "ö", U+FFFD...)
+    bảng số           số liệu không bị tách ("1 885 909") hay lẫn chữ ("1.2O5")
+Trang đạt được chuyển thẳng sang markdown (dòng có cột số thành bảng, căn cột theo
+toạ độ), các trang còn lại mới đưa vào engine OCR; kết quả ghép lại theo thứ tự trang.
+
+    engine = TriagedEngine(VinternEngine())   # load_engine(...) đã bọc sẵn, trừ khi OCR_TEXT_LAYER=0
+    markdown = engine.convert(pdf_path)
+"""
+import re
+import unicodedata
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
+
+from ocr.cache import convert_cached
+
+VIETNAMESE_LETTERS = set(
+    "àáảãạăằắẳẵặâầấẩẫậèéẻẽẹêềếểễệìíỉĩịòóỏõọôồốổỗộơờớởỡợùúủũụưừứửữựỳýỷỹỵđ"
+    "ÀÁẢÃẠĂẰẮẲẴẶÂẦẤẨẪẬÈÉẺẼẸÊỀẾỂỄỆÌÍỈĨỊÒÓỎÕỌÔỒỐỔỖỘƠỜỚỞỠỢÙÚỦŨỤƯỪỨỬỮỰỲÝỶỸỴĐ"
+)
+# Số kiểu Việt Nam: 1.885.909.938.569, (12.345), 3,5%, 123
+NUMBER = re.compile(r"^\(?[-+]?\d{1,3}(?:[.,]\d{3})*(?:[.,]\d+)?\)?%?$")
+# Ô trong cột số của bảng: số, "-" (không có số liệu) hoặc mã thuyết minh như "VI.3"
+CELL = re.compile(r"^(?:\(?[-+]?\d{1,3}(?:[.,]\d{3})*(?:[.,]\d+)?\)?%?|-|[IVX]+\.\d+(?:\.\d+)?)$")
+# Chữ cái trông giống chữ số: "1.2O5" thành số hợp lệ khi thay lại là dấu hiệu lớp text sinh từ OCR kém
+DIGIT_LOOKALIKES = str.maketrans("OoDlIiSB", "00011158")
+OUTPUT_DIR = "ocr/output/text_layer"
+COLUMN_TOLERANCE = 12.0  # pt: các ô số căn phải lệch nhau ít hơn mức này coi là cùng cột
+
+
+class Token(NamedTuple):
+    text: str
+    left: float
+    right: float
+
+
+class PageQuality(NamedTuple):
+    page: int
+    chars: int
+    diacritic_ratio: float
+    foreign_ratio: float
+    numbers: int
+    broken_number_ratio: float
+    passed: bool
+    reason: str
+
+
+class Thresholds(NamedTuple):
+    min_chars: int = 200
+    min_diacritic_ratio: float = 0.15
+    max_foreign_ratio: float = 0.02
+    max_broken_number_ratio: float = 0.02
+
+
+def page_lines(textpage) -> List[List[Token]]:
+    """Các dòng của trang, mỗi dòng là list token (chuỗi không có khoảng trắng) kèm toạ độ ngang."""
+    lines, tokens = [], []
+    text, left, right = [], None, None
+    for index in range(textpage.count_chars()):
+        char = chr(pdfium_c.FPDFText_GetUnicode(textpage, index))
+        if char.isspace():
+            if text:
+                tokens.append(Token("".join(text), left, right))
+                text = []
+            if char == "\n":
+                lines.append(tokens)
+                tokens = []
+            continue
+        box_left, _, box_right, _ = textpage.get_charbox(index)
+        if not text:
+            left = box_left
+        text.append(char)
+        right = box_right
+    if text:
+        tokens.append(Token("".join(text), left, right))
+    if tokens:
+        lines.append(tokens)
+    return [line for line in lines if line]
+
+
+def _is_foreign(char: str) -> bool:
+    if char == "�" or unicodedata.category(char) in ("Co", "Cc", "Cs"):
+        return True
+    return char.isalpha() and not (char.isascii() or char in VIETNAMESE_LETTERS)
+
+
+def _broken_numbers(tokens: Sequence[str]) -> int:
+    broken = 0
+    for previous, token in zip([""] + list(tokens), tokens):
+        if not NUMBER.match(token) and any(c.isdigit() for c in token) and NUMBER.match(token.translate(DIGIT_LOOKALIKES)):
+            broken += 1
+        # Báo cáo Việt Nam không dùng khoảng trắng phân cách hàng nghìn
+        elif re.fullmatch(r"\d{3}", token) and re.fullmatch(r"\(?\d{1,3}", previous):
+            broken += 1
+    return broken
+
+
+def assess(page: int, lines: List[List[Token]], thresholds: Thresholds = Thresholds()) -> PageQuality:
+    tokens = [token.text for line in lines for token in line]
+    chars = sum(len(token) for token in tokens)
+    letters = [char for token in tokens for char in token if char.isalpha() or _is_foreign(char)]
+    foreign_ratio = sum(map(_is_foreign, letters)) / len(letters) if letters else 0.0
+    words = [token for token in tokens if any(char.isalpha() for char in token)]
+    diacritic_ratio = (sum(any(char in VIETNAMESE_LETTERS for char in word) for word in words) / len(words)
+                       if words else 0.0)
+    numbers = sum(1 for token in tokens if any(char.isdigit() for char in token))
+    broken_ratio = _broken_numbers(tokens) / numbers if numbers else 0.0
+
+    if chars < thresholds.min_chars:
+        reason = "ít ký tự"
+    elif foreign_ratio > thresholds.max_foreign_ratio:
+        reason = "ký tự lạ"
+    elif diacritic_ratio < thresholds.min_diacritic_ratio:
+        reason = "thiếu dấu tiếng Việt"
+    elif broken_ratio > thresholds.max_broken_number_ratio:
+        reason = "số liệu bị vỡ"
+    else:
+        reason = ""
+    return PageQuality(page, chars, diacritic_ratio, foreign_ratio, numbers, broken_ratio, not reason, reason)
+
+
+def _split_row(line: List[Token]) -> Optional[Tuple[str, List[Token]]]:
+    """(nhãn, các ô số ở cuối dòng) nếu dòng là một hàng bảng (ít nhất hai ô số), ngược lại None."""
+    split = len(line)
+    while split > 0 and CELL.match(line[split - 1].text):
+        split -= 1
+    cells = line[split:]
+    if sum(1 for cell in cells if cell.text != "-") < 2:
+        return None
+    return " ".join(token.text for token in line[:split]), cells
+
+
+def _columns(rows) -> List[float]:
+    """Toạ độ mép phải của từng cột số, gom các ô căn phải gần nhau."""
+    columns = []
+    for right in sorted(cell.right for _, cells in rows for cell in cells):
+        if columns and right - columns[-1][-1] <= COLUMN_TOLERANCE:
+            columns[-1].append(right)
+        else:
+            columns.append([right])
+    return [sum(group) / len(group) for group in columns]
+
+
+def _table_markdown(rows) -> str:
+    columns = _columns(rows)
+    lines = []
+    for label, cells in rows:
+        values = [""] * len(columns)
+        for cell in cells:
+            nearest = min(range(len(columns)), key=lambda i: abs(columns[i] - cell.right))
+            values[nearest] = cell.text
+        lines.append("| " + " | ".join([label] + values) + " |")
+    lines.insert(1, "|" + "---|" * (len(columns) + 1))
+    return "\n".join(lines)
+
+
+def page_markdown(lines: List[List[Token]]) -> str:
+    """Markdown từ lớp text: từ hai hàng có cột số liền nhau trở lên thành bảng, còn lại mỗi dòng một đoạn."""
+    blocks, rows, row_lines = [], [], []
+
+    def flush():
+        if len(rows) > 1:
+            blocks.append(_table_markdown(rows))
+        else:
+            blocks.extend(" ".join(token.text for token in line) for line in row_lines)
+        rows.clear()
+        row_lines.clear()
+
+    for line in lines:
+        row = _split_row(line)
+        if row is not None:
+            rows.append(row)
+            row_lines.append(line)
+            continue
+        flush()
+        blocks.append(" ".join(token.text for token in line))
+    flush()
+    return "\n\n".join(blocks)
+
+
+def iter_page_lines(pdf_path: str, page_numbers: Sequence[int]) -> Iterator[Tuple[int, List[List[Token]]]]:
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        for page_number in page_numbers:
+            page = pdf[page_number - 1]
+            textpage = page.get_textpage()
+            try:
+                yield page_number, page_lines(textpage)
+            finally:
+                textpage.close()
+                page.close()
+    finally:
+        pdf.close()
+
+
+def triage(pdf_path: str, page_numbers: Sequence[int],
+           thresholds: Thresholds = Thresholds()) -> Iterator[Tuple[PageQuality, str]]:
+    """Đánh giá các trang (đánh số từ 1); markdown chỉ được tạo cho trang đạt."""
+    for page_number, lines in iter_page_lines(pdf_path, page_numbers):
+        quality = assess(page_number, lines, thresholds)
+        yield quality, page_markdown(lines) if quality.passed else ""
+
+
+class TextLayerEngine:
+    """"Engine" chỉ đọc lớp text, không OCR: mốc so sánh rẻ nhất và chạy được ở mọi nơi (không cần model, GPU)."""
+    name = "text_layer"
+
+    def __init__(self, device=None):
+        self.output_dir = OUTPUT_DIR
+
+    def cache_options(self):
+        return {}
+
+    def iter_page_markdown(self, pdf_path, page_numbers):
+        for page_number, lines in iter_page_lines(pdf_path, page_numbers):
+            yield page_number, page_markdown(lines)
+
+    def join_pages(self, pages):
+        return "\n\n".join(page for page in pages if page)
+
+    def convert(self, pdf_path):
+        return convert_cached(self, pdf_path)
+
+
+class TriagedEngine:
+    """Bọc một engine OCR: trang có lớp text tốt được trích thẳng, chỉ trang scan/lỗi mới OCR.
+
+    `last_triage` giữ kết quả đánh giá các trang đã xử lý trong lần chuyển gần nhất."""
+
+    def __init__(self, engine, thresholds: Thresholds = Thresholds()):
+        self.engine = engine
+        self.name = engine.name
+        self.output_dir = engine.output_dir
+        self.thresholds = thresholds
+        self.last_triage: List[PageQuality] = []
+
+    def cache_options(self):
+        return {**self.engine.cache_options(), "text_layer": self.thresholds._asdict()}
+
+    def iter_page_markdown(self, pdf_path, page_numbers):
+        direct: Dict[int, str] = {}
+        ocr_pages = []
+        # Đánh giá hết trước, đóng PDF rồi mới chạy engine (pdfium không an toàn khi dùng song song)
+        for quality, markdown in triage(pdf_path, page_numbers, self.thresholds):
+            self.last_triage.append(quality)
+            if quality.passed:
+                direct[quality.page] = markdown
+            else:
+                ocr_pages.append(quality.page)
+        pending = sorted(direct)
+        if ocr_pages:
+            for page, markdown in self.engine.iter_page_markdown(pdf_path, ocr_pages):
+                while pending and pending[0] < page:
+                    yield pending[0], direct[pending.pop(0)]
+                yield page, markdown
+        for page in pending:
+            yield page, direct[page]
+
+    def join_pages(self, pages):
+        return self.engine.join_pages(pages)
+
+    def convert(self, pdf_path):
+        # Trang lấy từ cache không được đánh giá lại nên không có trong last_triage
+        self.last_triage = []
+        return convert_cached(self, pdf_path)
@@ -0,0 +1,76 @@
+"""Tiền xử lý ảnh trang cho Vintern: chia tile theo tỉ lệ khung hình và chuẩn hoá.
+
+Cho kết quả giống hệt cách cắt tile bằng PIL + transform từng tile của model card Vintern
+(giữ lại làm mốc trong `benchmarks/bench_vintern_preprocess.py`) nhưng bảng tỉ lệ được tính một lần cho mỗi (min_num, max_num), và mọi tile được
+lấy từ một lần resize bằng reshape mảng rồi chuẩn hoá cả lô trong một lượt tra bảng
+thay vì cắt và transform từng tile bằng PIL.
+"""
+from functools import lru_cache
+
+import numpy as np
+import torch
+
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+
+@lru_cache(maxsize=None)
+def target_ratios(min_num: int, max_num: int) -> tuple:
+    """Các lưới (cột, hàng) hợp lệ kèm tỉ lệ khung hình, theo đúng thứ tự của cách cũ (`dynamic_preprocess`)."""
+    ratios = set(
+        (i, j) for n in range(min_num, max_num + 1) for i in range(1, n + 1) for j in range(1, n + 1) if
+        i * j <= max_num and i * j >= min_num)
+    return tuple((ratio, ratio[0] / ratio[1]) for ratio in sorted(ratios, key=lambda x: x[0] * x[1]))
+
+
+@lru_cache(maxsize=None)
+def normalization_table() -> np.ndarray:
+    """(3, 256) float32: giá trị sau ToTensor + Normalize của mỗi byte ở mỗi kênh.
+
+    Tính bằng đúng các phép float32 của torchvision (chia 255, trừ mean, chia std)
+    nên tra bảng cho kết quả giống hệt từng bit mà chỉ cần một lượt qua dữ liệu."""
+    values = torch.arange(256, dtype=torch.uint8).float().div(255).expand(3, 256).clone()
+    mean = torch.as_tensor(IMAGENET_MEAN).view(-1, 1)
+    std = torch.as_tensor(IMAGENET_STD).view(-1, 1)
+    return values.sub_(mean).div_(std).numpy()
+
+
+def closest_grid(width: int, height: int, min_num: int, max_num: int, image_size: int) -> tuple:
+    aspect_ratio = width / height
+    best_ratio_diff = float('inf')
+    best_ratio = (1, 1)
+    area = width * height
+    for ratio, target_aspect_ratio in target_ratios(min_num, max_num):
+        ratio_diff = abs(aspect_ratio - target_aspect_ratio)
+        if ratio_diff < best_ratio_diff:
+            best_ratio_diff = ratio_diff
+            best_ratio = ratio
+        elif ratio_diff == best_ratio_diff:
+            if area > 0.5 * image_size * image_size * ratio[0] * ratio[1]:
+                best_ratio = ratio
+    return best_ratio
+
+
+def _normalize_tiles(pixels: np.ndarray, rows: int, columns: int, tile_size: int, out: np.ndarray) -> None:
+    """Ảnh uint8 (hàng*s, cột*s, 3) -> `out` (hàng*cột, 3, s, s) đã chuẩn hoá, tile từ trái sang phải, trên xuống dưới."""
+    # Đổi trục trên uint8 (view, không chép) rồi tra bảng thẳng vào `out`
+    tiles = pixels.reshape(rows, tile_size, columns, tile_size, 3).transpose(0, 2, 4, 1, 3)
+    out = out.reshape(rows, columns, 3, tile_size, tile_size)
+    table = normalization_table()
+    for channel in range(3):
+        np.take(table[channel], tiles[:, :, channel], out=out[:, :, channel], mode="clip")
+
+
+def preprocess_image(image, input_size: int = 448, min_num: int = 1, max_num: int = 12, use_thumbnail: bool = True) -> torch.Tensor:
+    """Ảnh PIL -> tensor (số tile, 3, input_size, input_size) đã chuẩn hoá."""
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    columns, rows = closest_grid(*image.size, min_num, max_num, input_size)
+    blocks = rows * columns
+    with_thumbnail = use_thumbnail and blocks != 1
+    out = np.empty((blocks + with_thumbnail, 3, input_size, input_size), dtype=np.float32)
+    resized = np.asarray(image.resize((input_size * columns, input_size * rows)))
+    _normalize_tiles(resized, rows, columns, input_size, out[:blocks])
+    if with_thumbnail:
+        _normalize_tiles(np.asarray(image.resize((input_size, input_size))), 1, 1, input_size, out[blocks:])
+    return torch.from_numpy(out)
@@ -1,126 +1,141 @@
 import torch
-import torchvision.transforms as T
-from PIL import Image
-from torchvision.transforms.functional import InterpolationMode
 from transformers import AutoModel, AutoTokenizer
 from time import time
-from pdf2image import convert_from_path
 import os
 
-start = time()
-IMAGENET_MEAN = (0.485, 0.456, 0.406)
-IMAGENET_STD = (0.229, 0.224, 0.225)
-
-def build_transform(input_size):
-    MEAN, STD = IMAGENET_MEAN, IMAGENET_STD
-    transform = T.Compose([
-        T.Lambda(lambda img: img.convert('RGB') if img.mode != 'RGB' else img),
-        T.Resize((input_size, input_size), interpolation=InterpolationMode.BICUBIC),
-        T.ToTensor(),
-        T.Normalize(mean=MEAN, std=STD)
-    ])
-    return transform
-
-def find_closest_aspect_ratio(aspect_ratio, target_ratios, width, height, image_size):
-    best_ratio_diff = float('inf')
-    best_ratio = (1, 1)
-    area = width * height
-    for ratio in target_ratios:
-        target_aspect_ratio = ratio[0] / ratio[1]
-        ratio_diff = abs(aspect_ratio - target_aspect_ratio)
-        if ratio_diff < best_ratio_diff:
-            best_ratio_diff = ratio_diff
-            best_ratio = ratio
-        elif ratio_diff == best_ratio_diff:
-            if area > 0.5 * image_size * image_size * ratio[0] * ratio[1]:
-                best_ratio = ratio
-    return best_ratio
-
-def dynamic_preprocess(image, min_num=1, max_num=12, image_size=448, use_thumbnail=False):
-    orig_width, orig_height = image.size
-    aspect_ratio = orig_width / orig_height
-
-    # calculate the existing image aspect ratio
-    target_ratios = set(
-        (i, j) for n in range(min_num, max_num + 1) for i in range(1, n + 1) for j in range(1, n + 1) if
-        i * j <= max_num and i * j >= min_num)
-    target_ratios = sorted(target_ratios, key=lambda x: x[0] * x[1])
-
-    # find the closest aspect ratio to the target
-    target_aspect_ratio = find_closest_aspect_ratio(
-        aspect_ratio, target_ratios, orig_width, orig_height, image_size)
-
-    # calculate the target width and height
-    target_width = image_size * target_aspect_ratio[0]
-    target_height = image_size * target_aspect_ratio[1]
-    blocks = target_aspect_ratio[0] * target_aspect_ratio[1]
-
-    # resize the image
-    resized_img = image.resize((target_width, target_height))
-    processed_images = []
-    for i in range(blocks):
-        box = (
-            (i % (target_width // image_size)) * image_size,
-            (i // (target_width // image_size)) * image_size,
-            ((i % (target_width // image_size)) + 1) * image_size,
-            ((i // (target_width // image_size)) + 1) * image_size
-        )
-        # split the image
-        split_img = resized_img.crop(box)
-        processed_images.append(split_img)
-    assert len(processed_images) == blocks
-    if use_thumbnail and len(processed_images) != 1:
-        thumbnail_img = image.resize((image_size, image_size))
-        processed_images.append(thumbnail_img)
-    return processed_images
-
-def load_image(image_file, input_size=448, max_num=12):
-    image = Image.open(image_file).convert('RGB')
-    transform = build_transform(input_size=input_size)
-    images = dynamic_preprocess(image, image_size=input_size, use_thumbnail=True, max_num=max_num)
-    pixel_values = [transform(image) for image in images]
-    pixel_values = torch.stack(pixel_values)
-    return pixel_values
+from ocr.cache import convert_cached
+from ocr.page_source import PageStream
+from ocr.vintern.preprocess import preprocess_image
+
+MODEL_ID = "5CD-AI/Vintern-1B-v3_5"
+OUTPUT_DIR = "ocr/vintern/output"
+QUESTION = '<image>\nTrích xuất thông tin trong ảnh trả về bảng markdown.'
+GENERATION_CONFIG = dict(max_new_tokens= 1024, do_sample=False, num_beams = 3, repetition_penalty=2.5)
+# Cấu hình sinh theo chế độ giải mã: "beam" giữ chất lượng như trước, "greedy" nhanh hơn
+DECODING_CONFIGS = {
+    "beam": GENERATION_CONFIG,
+    "greedy": dict(max_new_tokens= 1024, do_sample=False, num_beams = 1, repetition_penalty=2.5),
+}
 
 def process_pil_image(image, input_size=448, max_num=12):
-    image = image.convert('RGB')
-
-    transform = build_transform(input_size=input_size)
-    images = dynamic_preprocess(image, image_size=input_size, use_thumbnail=True, max_num=max_num)
-    
-    pixel_values = [transform(img) for img in images]
-    pixel_values = torch.stack(pixel_values)
-    return pixel_values
-
-model = AutoModel.from_pretrained(
-    "5CD-AI/Vintern-1B-v3_5",
-    torch_dtype=torch.bfloat16,
-    low_cpu_mem_usage=True,
-    trust_remote_code=True,
-    use_flash_attn=False,
-).eval().cuda()
-
-tokenizer = AutoTokenizer.from_pretrained("5CD-AI/Vintern-1B-v3_5", trust_remote_code=True, use_fast=False)
-
-pdf_filename = 'ocr/FPT_Baocaotaichinh_Q3_2025_Congtyme.pdf'
-pages = convert_from_path(pdf_filename)
-
-generation_config = dict(max_new_tokens= 1024, do_sample=False, num_beams = 3, repetition_penalty=2.5)
-question = '<image>\nTrích xuất thông tin trong ảnh trả về bảng markdown.'
-all_responses = []
-for i, page_image in enumerate(pages):
-    pixel_values = process_pil_image(page_image, max_num=6).to(torch.bfloat16).cuda()
-    response, history = model.chat(tokenizer, pixel_values, question, generation_config, history=None, return_history=True)
-    all_responses.append(response)
-
-
-md_filename = os.path.splitext(os.path.basename(pdf_filename))[0] + ".md"
-output_filepath = os.path.join("ocr/vintern/output", md_filename)
-
-with open(output_filepath, 'w', encoding='utf-8') as f:
-    for i, response in enumerate(all_responses):
-        f.write(response)
-        f.write("\n\n")
-
-end = time()
-print(f"Elapsed time: {end - start} seconds")
\ No newline at end of file
+    return preprocess_image(image, input_size=input_size, max_num=max_num, use_thumbnail=True)
+
+def load_model(device="cuda"):
+    """Nạp model và tokenizer Vintern lên `device` ("cuda" hoặc "cpu"; CPU chạy float32)."""
+    dtype = torch.bfloat16 if device.startswith("cuda") else torch.float32
+    model = AutoModel.from_pretrained(
+        MODEL_ID,
+        torch_dtype=dtype,
+        low_cpu_mem_usage=True,
+        trust_remote_code=True,
+        use_flash_attn=False,
+    ).eval().to(device)
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_ID, trust_remote_code=True, use_fast=False)
+    return model, tokenizer
+
+def iter_tile_batches(page_tiles, tile_budget):
+    """Gom các trang liên tiếp thành lô sao cho tổng số tile không vượt `tile_budget`.
+
+    `page_tiles` là iterable các (số trang, pixel_values); mỗi lô là list các cặp đó.
+    Trang có nhiều tile hơn ngân sách vẫn được xử lý, một mình một lô."""
+    batch, batch_tiles = [], 0
+    for page_index, pixel_values in page_tiles:
+        tiles = pixel_values.shape[0]
+        if batch and batch_tiles + tiles > tile_budget:
+            yield batch
+            batch, batch_tiles = [], 0
+        batch.append((page_index, pixel_values))
+        batch_tiles += tiles
+    if batch:
+        yield batch
+
+class VinternEngine:
+    """Giữ model Vintern trong bộ nhớ để chuyển nhiều PDF liên tiếp.
+
+    `tile_budget` > 0 bật chế độ lô: tile của nhiều trang được ghép vào một lần
+    `batch_chat` (tối đa `tile_budget` tile); 0 chạy `chat` từng trang như trước.
+    Mặc định lấy từ `VINTERN_TILE_BUDGET` và `VINTERN_DECODING` ("beam" hoặc "greedy")."""
+    name = "vintern"
+
+    def __init__(self, device="cuda", max_num=6, tile_budget=None, decoding=None, dpi=200):
+        if tile_budget is None:
+            tile_budget = int(os.getenv("VINTERN_TILE_BUDGET", "0"))
+        decoding = decoding or os.getenv("VINTERN_DECODING", "beam")
+        if decoding not in DECODING_CONFIGS:
+            raise ValueError(f"decoding không hợp lệ: {decoding!r} (chọn một trong {', '.join(DECODING_CONFIGS)})")
+        self.device = device
+        self.max_num = max_num
+        self.dpi = dpi
+        self.tile_budget = tile_budget
+        self.decoding = decoding
+        self.generation_config = DECODING_CONFIGS[decoding]
+        self.model, self.tokenizer = load_model(device)
+        self.dtype = self.model.dtype
+        self.output_dir = OUTPUT_DIR
+
+    def _pixel_values(self, page_image):
+        return process_pil_image(page_image, max_num=self.max_num).to(self.dtype).to(self.device)
+
+    def convert_page(self, page_image):
+        pixel_values = self._pixel_values(page_image)
+        response, history = self.model.chat(self.tokenizer, pixel_values, QUESTION, self.generation_config, history=None, return_history=True)
+        return response
+
+    def convert_batch(self, batch):
+        """Chạy một lô [(số trang, pixel_values)] trong một lần sinh; kết quả theo thứ tự của lô."""
+        if len(batch) == 1:
+            response, history = self.model.chat(self.tokenizer, batch[0][1], QUESTION, self.generation_config, history=None, return_history=True)
+            return [response]
+        return self.model.batch_chat(
+            self.tokenizer,
+            torch.cat([pixel_values for _, pixel_values in batch]),
+            num_patches_list=[pixel_values.shape[0] for _, pixel_values in batch],
+            questions=[QUESTION] * len(batch),
+            generation_config=self.generation_config,
+        )
+
+    def iter_responses(self, page_images):
+        """OCR các trang, trả về (vị trí trang trong đầu vào, markdown) theo thứ tự, ngay khi mỗi trang/lô xong."""
+        if not self.tile_budget:
+            for page_index, page_image in enumerate(page_images):
+                yield page_index, self.convert_page(page_image)
+            return
+        page_tiles = ((i, self._pixel_values(page_image)) for i, page_image in enumerate(page_images))
+        for batch in iter_tile_batches(page_tiles, self.tile_budget):
+            for (page_index, _), response in zip(batch, self.convert_batch(batch)):
+                yield page_index, response
+
+    def convert_pages(self, page_images):
+        """OCR các trang, trả về list markdown theo đúng thứ tự trang đầu vào."""
+        return [response for _, response in self.iter_responses(page_images)]
+
+    def cache_options(self):
+        return {"model": MODEL_ID, "max_num": self.max_num, "dpi": self.dpi, "decoding": self.decoding}
+
+    def iter_page_markdown(self, pdf_path, page_numbers):
+        # Các trang được render dần trên thread riêng trong lúc model chạy
+        with PageStream(pdf_path, dpi=self.dpi, page_numbers=page_numbers) as pages:
+            for page_index, response in self.iter_responses(image for _, image in pages):
+                yield pages.page_numbers[page_index], response
+
+    def join_pages(self, responses):
+        return "".join(response + "\n\n" for response in responses)
+
+    def convert(self, pdf_path):
+        return convert_cached(self, pdf_path)
+
+if __name__ == "__main__":
+    start = time()
+    engine = VinternEngine(device=os.getenv("OCR_DEVICE", "cuda"))
+
+    pdf_filename = 'ocr/FPT_Baocaotaichinh_Q3_2025_Congtyme.pdf'
+    markdown = engine.convert(pdf_filename)
+
+    md_filename = os.path.splitext(os.path.basename(pdf_filename))[0] + ".md"
+    output_filepath = os.path.join(OUTPUT_DIR, md_filename)
+
+    with open(output_filepath, 'w', encoding='utf-8') as f:
+        f.write(markdown)
+
+    end = time()
+    print(f"Elapsed time: {end - start} seconds")
\ No newline at end of file
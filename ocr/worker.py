@@ -0,0 +1,256 @@
+"""Worker OCR chạy lâu dài: nạp engine một lần rồi lần lượt chuyển các PDF trong hàng đợi sang markdown.
+
+Hàng đợi là một thư mục hoặc một file SQLite (đuôi .sqlite3/.sqlite/.db), chọn bằng
+`--queue` hoặc `OCR_QUEUE` (mặc định thư mục `.cache/ocr_jobs`):
+    thư mục   PDF thả vào `inbox/`, worker chuyển sang `processing/`, xong thì sang
+              `done/` hoặc `failed/` kèm file `<tên>.json` ghi kết quả và thời gian
+    SQLite    bảng `ocr_jobs` (trạng thái queued/running/done/failed, thời gian từng job)
+Nhiều worker có thể dùng chung một hàng đợi. Markdown được ghi vào thư mục output
+của engine (hoặc `--output-dir`, hoặc output_dir của job); mỗi job in một dòng JSON
+gồm thời gian chạy.
+
+    python -m ocr.worker run --engine vintern --device cpu
+    python -m ocr.worker run --engine marker --queue .cache/ocr_jobs.sqlite3 --once
+    python -m ocr.worker enqueue ocr/FPT_Baocaotaichinh_Q3_2025_Congtyme.pdf --queue .cache/ocr_jobs.sqlite3
+    python -m ocr.worker stats --queue .cache/ocr_jobs.sqlite3
+    python -m ocr.worker requeue --queue .cache/ocr_jobs.sqlite3   # trả các job "running" của worker đã chết về hàng đợi
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Callable, NamedTuple, Optional
+
+from ocr.engines import ENGINES, default_device, load_engine, write_markdown
+
+SQLITE_SUFFIXES = (".sqlite3", ".sqlite", ".db")
+
+
+class Job(NamedTuple):
+    id: str
+    pdf_path: str
+    output_dir: Optional[str] = None
+
+
+class DirectoryQueue:
+    def __init__(self, root: str):
+        self.root = root
+        for name in ("inbox", "processing", "done", "failed"):
+            os.makedirs(os.path.join(root, name), exist_ok=True)
+
+    def _path(self, folder: str, name: str = "") -> str:
+        return os.path.join(self.root, folder, name)
+
+    def enqueue(self, pdf_path: str, output_dir: Optional[str] = None) -> str:
+        if output_dir:
+            raise ValueError("Hàng đợi thư mục không hỗ trợ output_dir riêng cho từng job, dùng --output-dir khi chạy worker")
+        name = os.path.basename(pdf_path)
+        # Chép sang tên tạm rồi đổi tên để worker không lấy phải file đang chép dở
+        temporary = self._path("inbox", f".{name}.part")
+        shutil.copyfile(pdf_path, temporary)
+        os.replace(temporary, self._path("inbox", name))
+        return name
+
+    def claim(self) -> Optional[Job]:
+        """Lấy PDF cũ nhất trong inbox; đổi tên sang processing/ để worker khác không lấy trùng."""
+        entries = [entry for entry in os.scandir(self._path("inbox"))
+                   if entry.is_file() and entry.name.lower().endswith(".pdf")]
+        for entry in sorted(entries, key=lambda entry: entry.stat().st_mtime):
+            target = self._path("processing", entry.name)
+            try:
+                os.rename(entry.path, target)
+            except FileNotFoundError:
+                continue  # Worker khác vừa lấy
+            return Job(entry.name, target)
+        return None
+
+    def finish(self, job: Job, result: dict) -> None:
+        folder = "done" if result["status"] == "done" else "failed"
+        os.replace(job.pdf_path, self._path(folder, job.id))
+        with open(self._path(folder, os.path.splitext(job.id)[0] + ".json"), "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    def requeue(self) -> int:
+        names = os.listdir(self._path("processing"))
+        for name in names:
+            os.replace(self._path("processing", name), self._path("inbox", name))
+        return len(names)
+
+    def stats(self) -> dict:
+        return {folder: sum(1 for name in os.listdir(self._path(folder)) if name.lower().endswith(".pdf"))
+                for folder in ("inbox", "processing", "done", "failed")}
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ocr_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    pdf_path TEXT NOT NULL,
+    output_dir TEXT,
+    status TEXT NOT NULL DEFAULT 'queued',
+    output_path TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    elapsed REAL
+);
+CREATE INDEX IF NOT EXISTS ocr_jobs_status ON ocr_jobs (status, id);
+"""
+
+
+class SqliteQueue:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Tự quản lý transaction để claim dùng BEGIN IMMEDIATE
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def enqueue(self, pdf_path: str, output_dir: Optional[str] = None) -> str:
+        with self._lock:
+            cursor = self._connect().execute(
+                "INSERT INTO ocr_jobs (pdf_path, output_dir, created_at) VALUES (?, ?, ?)",
+                (os.path.abspath(pdf_path), output_dir, time.time()),
+            )
+        return str(cursor.lastrowid)
+
+    def claim(self) -> Optional[Job]:
+        with self._lock:
+            conn = self._connect()
+            # Khoá ghi ngay từ đầu để hai worker không cùng lấy một job
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT id, pdf_path, output_dir FROM ocr_jobs WHERE status = 'queued' ORDER BY id LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    conn.execute("UPDATE ocr_jobs SET status = 'running', started_at = ? WHERE id = ?",
+                                 (time.time(), row[0]))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return Job(str(row[0]), row[1], row[2]) if row is not None else None
+
+    def finish(self, job: Job, result: dict) -> None:
+        with self._lock:
+            self._connect().execute(
+                "UPDATE ocr_jobs SET status = ?, output_path = ?, error = ?, finished_at = ?, elapsed = ? WHERE id = ?",
+                (result["status"], result.get("output"), result.get("error"), time.time(), result["elapsed"], int(job.id)),
+            )
+
+    def requeue(self) -> int:
+        with self._lock:
+            return self._connect().execute(
+                "UPDATE ocr_jobs SET status = 'queued', started_at = NULL WHERE status = 'running'"
+            ).rowcount
+
+    def stats(self) -> dict:
+        with self._lock:
+            conn = self._connect()
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM ocr_jobs GROUP BY status").fetchall())
+            mean_elapsed = conn.execute("SELECT AVG(elapsed) FROM ocr_jobs WHERE status = 'done'").fetchone()[0]
+        return {**{status: counts.get(status, 0) for status in ("queued", "running", "done", "failed")},
+                "mean_elapsed": mean_elapsed}
+
+
+def open_queue(spec: str):
+    return SqliteQueue(spec) if spec.endswith(SQLITE_SUFFIXES) else DirectoryQueue(spec)
+
+
+def process_job(engine, job: Job, output_dir: Optional[str] = None) -> dict:
+    """Chuyển một PDF và ghi markdown; lỗi được trả về trong kết quả thay vì làm dừng worker."""
+    result = {"job": job.id, "pdf": job.pdf_path, "engine": engine.name}
+    started = time.perf_counter()
+    try:
+        markdown = engine.convert(job.pdf_path)
+        target_dir = job.output_dir or output_dir or engine.output_dir
+        result.update(status="done", output=write_markdown(job.pdf_path, markdown, target_dir), chars=len(markdown))
+        triage = getattr(engine, "last_triage", None)
+        if triage:
+            result.update(text_layer_pages=sum(quality.passed for quality in triage),
+                          ocr_pages=sum(not quality.passed for quality in triage))
+    except Exception as e:
+        result.update(status="failed", error=f"{type(e).__name__}: {e}")
+    result["elapsed"] = time.perf_counter() - started
+    return result
+
+
+def _print_event(event: dict) -> None:
+    print(json.dumps(event, ensure_ascii=False), flush=True)
+
+
+def run_worker(engine, queue, output_dir: Optional[str] = None, poll_interval: float = 2.0, once: bool = False,
+               emit: Callable[[dict], None] = _print_event) -> int:
+    """Xử lý job cho tới khi bị dừng (hoặc tới khi hàng đợi rỗng nếu `once`). Trả về số job đã xử lý."""
+    processed = 0
+    while True:
+        job = queue.claim()
+        if job is None:
+            if once:
+                return processed
+            time.sleep(poll_interval)
+            continue
+        result = process_job(engine, job, output_dir)
+        queue.finish(job, result)
+        processed += 1
+        emit({"event": "job", **result})
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    queue_parser = argparse.ArgumentParser(add_help=False)
+    queue_parser.add_argument("--queue", default=os.getenv("OCR_QUEUE", os.path.join(".cache", "ocr_jobs")),
+                              help="Thư mục hàng đợi hoặc file SQLite (.sqlite3/.sqlite/.db)")
+    parser = argparse.ArgumentParser(description="Worker OCR: nạp engine một lần, chuyển PDF từ hàng đợi sang markdown")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", parents=[queue_parser], help="Chạy worker")
+    run_parser.add_argument("--engine", choices=list(ENGINES), required=True)
+    run_parser.add_argument("--device", default=default_device(), help="cuda, cuda:1 hoặc cpu (mặc định OCR_DEVICE)")
+    run_parser.add_argument("--output-dir", help="Ghi markdown vào đây thay vì thư mục output của engine")
+    run_parser.add_argument("--poll", type=float, default=2.0, help="Số giây chờ giữa hai lần kiểm tra hàng đợi rỗng")
+    run_parser.add_argument("--once", action="store_true", help="Thoát khi hàng đợi rỗng")
+    run_parser.add_argument("--force-ocr", action="store_true",
+                            help="OCR mọi trang, kể cả trang có lớp text tốt (như OCR_TEXT_LAYER=0)")
+
+    enqueue_parser = subparsers.add_parser("enqueue", parents=[queue_parser], help="Thêm PDF vào hàng đợi")
+    enqueue_parser.add_argument("pdf_paths", nargs="+")
+    enqueue_parser.add_argument("--output-dir", help="Thư mục output riêng cho các job này (chỉ hàng đợi SQLite)")
+
+    subparsers.add_parser("stats", parents=[queue_parser], help="Số job theo trạng thái")
+    subparsers.add_parser("requeue", parents=[queue_parser], help="Đưa các job đang chạy dở về hàng đợi")
+
+    args = parser.parse_args()
+    queue = open_queue(args.queue)
+    if args.command == "run":
+        started = time.perf_counter()
+        engine = load_engine(args.engine, args.device, text_layer=False if args.force_ocr else None)
+        _print_event({"event": "ready", "engine": args.engine, "device": args.device,
+                      "load_seconds": time.perf_counter() - started})
+        try:
+            processed = run_worker(engine, queue, args.output_dir, args.poll, args.once)
+        except KeyboardInterrupt:
+            processed = None
+        _print_event({"event": "stopped", "processed": processed, **queue.stats()})
+    elif args.command == "enqueue":
+        for pdf_path in args.pdf_paths:
+            _print_event({"event": "queued", "job": queue.enqueue(pdf_path, args.output_dir), "pdf": pdf_path})
+    elif args.command == "requeue":
+        _print_event({"event": "requeued", "jobs": queue.requeue()})
+    else:
+        _print_event({"event": "stats", **queue.stats()})
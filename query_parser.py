@@ -0,0 +1,155 @@
+"""Bộ phân tích query dựa trên luật cho các dạng câu hỏi phổ biến.
+
+Nhận các câu như "bctc FPT quý 3 2024" hay "so sánh VCB và TCB 2023 2024" và trả
+về `AnalysisIntent` mà không cần gọi LLM. Chỉ trả lời khi mọi từ trong câu đều
+được hiểu; các trường hợp còn lại trả về None để LLM xử lý. Một từ 3 chữ cái chỉ
+được coi là mã chứng khoán khi nó nằm trong `KNOWN_TICKERS` (bổ sung qua biến môi
+trường `QUERY_PARSER_TICKERS`, phân cách bằng dấu phẩy); viết hoa thôi chưa đủ vì
+các chỉ số như ROE, EPS, TTM cũng viết hoa.
+"""
+import os
+import unicodedata
+from typing import List, Optional
+
+import regex as re
+
+from pydantic_models import AnalysisIntent, ReportRequest
+
+# Các cụm từ so khớp trên văn bản đã bỏ dấu và viết thường
+CONSOLIDATED_PATTERN = re.compile(r"\bhop nhat\b")
+PARENT_PATTERN = re.compile(r"\b(?:cong ty me|rieng le|rieng)\b")
+LATEST_PATTERN = re.compile(r"\b(?:moi nhat|gan nhat)\b")
+HALF_YEAR_PATTERN = re.compile(r"\b(?:6 thang(?: dau nam)?|ban nien|soat xet)\b")
+ANNUAL_PATTERN = re.compile(r"\b(?:ca nam|kiem toan|thuong nien)\b")
+QUARTER_PATTERN = re.compile(r"\b(?:quy|q)\s*[1-4](?:\s*(?:,|va|voi|&)\s*(?:(?:quy|q)\s*)?[1-4]\b)*")
+YEAR_PATTERN = re.compile(r"\b20\d{2}\b")
+COMPARE_PATTERN = re.compile(r"\bso sanh\b")
+GROWTH_PATTERN = re.compile(r"\btang truong\b")
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Mốc thời gian tương đối hoặc khoảng thời gian cần LLM suy luận (so khớp trên văn bản còn dấu)
+RELATIVE_PATTERN = re.compile(
+    r"\b(?:năm nay|năm ngoái|năm trước|năm sau|quý này|quý trước|quý tới|quý sau|kỳ trước|cùng kỳ|gần đây|từ|đến)\b|(?<!quý\s*|q\s*)\b\d+\s*năm\b"
+)
+
+# Các từ không mang thông tin về báo cáo cần tìm (đã bỏ dấu)
+FILLER_WORDS = frozenset("""
+    bao cao tai chinh bctc bc cua cho toi minh em anh chi xem giup lay tim kiem phan tich so sanh
+    ket qua kinh doanh va voi trong nam hay di nhe nha nhi co phieu ma ck chung khoan giua the nao
+    tang truong nhu con cong ty doanh nghiep ngan hang ve link file pdf thong tin du lieu hoat dong
+    loi nhuan thu tinh hinh muon can vui long quy ky q nay la gi sao a oi dum ho no
+""".split())
+
+# Các mã được nhận (VN30 và một số mã phổ biến khác); mã khác để LLM xử lý
+KNOWN_TICKERS = frozenset("""
+    ACB BCM BID BVH CTG FPT GAS GVR HDB HPG LPB MBB MSN MWG PLX SAB SHB SSB SSI STB TCB TPB VCB VHM
+    VIB VIC VJC VNM VPB VRE CMG DBC DGC DIG DXG EIB ELC GMD HCM HSG IJC KBC KDC KDH MSB NKG NVL OCB PDR
+    PNJ POW PVD PVS REE SHS VCI VGC VND
+""".split()) | {code.strip().upper() for code in os.getenv("QUERY_PARSER_TICKERS", "").split(",") if code.strip()}
+
+
+def strip_diacritics(text: str) -> str:
+    text = text.replace("đ", "d").replace("Đ", "D")
+    return "".join(c for c in unicodedata.normalize("NFD", text) if unicodedata.category(c) != "Mn")
+
+
+def normalize_text(text: str) -> str:
+    """Viết thường, bỏ dấu và gộp khoảng trắng."""
+    return " ".join(strip_diacritics(text).lower().split())
+
+
+def _join(items: List[str]) -> str:
+    items = [str(item) for item in items]
+    return items[0] if len(items) == 1 else ", ".join(items[:-1]) + " và " + items[-1]
+
+
+def _unique(items):
+    return list(dict.fromkeys(items))
+
+
+def parse_query(query: str) -> Optional[AnalysisIntent]:
+    """Phân tích query theo luật; trả về None nếu không chắc chắn."""
+    if RELATIVE_PATTERN.search(query.lower()):
+        return None
+    text = normalize_text(query)
+
+    def take(pattern):
+        nonlocal text
+        found = pattern.findall(text)
+        text = pattern.sub(" ", text)
+        return found
+
+    consolidated, parent = take(CONSOLIDATED_PATTERN), take(PARENT_PATTERN)
+    if consolidated and parent:
+        return None
+    consolidation_status = "Hợp nhất" if consolidated else "Công ty mẹ" if parent else None
+
+    latest = bool(take(LATEST_PATTERN))
+    half_year = bool(take(HALF_YEAR_PATTERN))
+    annual = bool(take(ANNUAL_PATTERN))
+    quarters = _unique(int(q) for match in take(QUARTER_PATTERN) for q in re.findall(r"[1-4]", match))
+    years = _unique(int(y) for y in take(YEAR_PATTERN))
+    compare = bool(take(COMPARE_PATTERN))
+    growth = bool(take(GROWTH_PATTERN))
+
+    # Phần còn lại chỉ được gồm mã chứng khoán đã biết và từ đệm
+    stock_codes = []
+    for token in TOKEN_PATTERN.findall(text):
+        if token in FILLER_WORDS:
+            continue
+        if token.upper() in KNOWN_TICKERS:
+            stock_codes.append(token.upper())
+        else:
+            return None
+    stock_codes = _unique(stock_codes)
+    if not stock_codes:
+        return None
+
+    if latest:
+        if years or quarters or half_year or annual:
+            return None
+        period = "Mới nhất"
+    elif quarters:
+        if half_year or annual:
+            return None
+        period = "Quý"
+    elif half_year and annual:
+        return None
+    elif half_year:
+        period = "6 tháng"
+    else:
+        # Không nói rõ kỳ thì mặc định là cả năm
+        period = "Cả năm"
+    if period != "Mới nhất" and not years:
+        return None
+    # "Q4 2023 và Q1 2024": không biết quý nào đi với năm nào
+    if len(quarters) > 1 and len(years) > 1:
+        return None
+
+    requests = []
+    for stock_code in stock_codes:
+        for year in years or [None]:
+            for quarter in quarters or [None]:
+                requests.append(ReportRequest(
+                    stock_code=stock_code, year=year, period=period,
+                    quarter=quarter, consolidation_status=consolidation_status,
+                ))
+
+    report_name = "báo cáo tài chính" + (f" {consolidation_status.lower()}" if consolidation_status else "")
+    if period == "Mới nhất":
+        period_text = "mới nhất"
+    elif period == "Quý":
+        period_text = f"Quý {_join(quarters)} {_join(years)}"
+    else:
+        period_text = f"{period} {_join(years)}"
+    companies = _join(stock_codes)
+
+    if compare:
+        context = f"So sánh {report_name} {period_text} của {companies}."
+    elif growth:
+        context = f"Phân tích sự tăng trưởng của {companies} qua {report_name} {period_text}."
+    elif period == "Mới nhất":
+        context = f"Tìm {report_name} mới nhất của {companies}."
+    else:
+        context = f"Phân tích {report_name} {period_text} của {companies}."
+    return AnalysisIntent(requests=requests, comparison_context=context)
@@ -0,0 +1,242 @@
+"""Cache trên đĩa (SQLite) cho danh sách báo cáo đã scrape từ Vietstock.
+
+Khoá là (mã chứng khoán, năm). Danh sách của năm Y chỉ không bao giờ hết hạn khi
+được lấy sau khi mùa công bố của năm đó kết thúc (1/7 năm Y+1, lúc báo cáo quý 4 và
+báo cáo kiểm toán đã có); còn lại, kể cả danh sách "Mới nhất" (năm = None), chỉ sống
+trong `REPORT_CACHE_TTL` giây.
+
+CLI:
+    python report_cache.py warm FPT HPG --years 2023 2024 --latest
+    python report_cache.py invalidate FPT --years 2024
+    python report_cache.py stats
+"""
+import argparse
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+LATEST_KEY = 0  # Năm dùng làm khoá cho danh sách "Mới nhất"
+# Báo cáo năm Y có thể được đăng tới hết tháng 6 năm Y+1 (quý 4: tháng 1, kiểm toán: tháng 3-4)
+CLOSED_AFTER_MONTH = 7
+COUNTER_FLUSH_EVERY = 100  # Số lượt hit/miss gom lại trước khi ghi xuống đĩa
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS report_listings (
+    stock_code TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    reports TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (stock_code, year)
+);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+class ReportCache:
+    """Cache các list `scraped_reports` theo (stock_code, year)."""
+
+    def __init__(self, path: str, ttl: float = 3600, enabled: bool = True):
+        self.path = path
+        self.ttl = ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._pending_counts = Counter()
+        self._lock = threading.Lock()
+        self._conn = None
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            path=os.getenv("REPORT_CACHE_PATH", os.path.join(".cache", "vietstock_reports.sqlite3")),
+            ttl=float(os.getenv("REPORT_CACHE_TTL", "3600")),
+            enabled=os.getenv("REPORT_CACHE_DISABLED", "0") != "1",
+        )
+
+    def _connect(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    @staticmethod
+    def _key(stock_code: str, year: Optional[int]):
+        return stock_code.upper(), year or LATEST_KEY
+
+    @staticmethod
+    def is_closed(year: Optional[int], fetched_at: float) -> bool:
+        """Danh sách của `year` đã đủ: lấy sau khi mùa công bố báo cáo của năm đó kết thúc."""
+        return bool(year) and fetched_at >= datetime(year + 1, CLOSED_AFTER_MONTH, 1).timestamp()
+
+    def is_expired(self, year: Optional[int], fetched_at: float, now: Optional[float] = None) -> bool:
+        """Năm đã đóng (xem `is_closed`) thì không hết hạn; còn lại và "Mới nhất" hết hạn sau TTL."""
+        now = time.time() if now is None else now
+        if self.is_closed(year, fetched_at):
+            return False
+        return now - fetched_at > self.ttl
+
+    def _count(self, name: str):
+        # Gọi khi đang giữ self._lock; chỉ ghi xuống đĩa theo lô
+        self._pending_counts[name] += 1
+        if sum(self._pending_counts.values()) >= COUNTER_FLUSH_EVERY:
+            self._flush_counts(self._connect())
+
+    def _flush_counts(self, conn):
+        if not self._pending_counts:
+            return
+        conn.executemany(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value", list(self._pending_counts.items())
+        )
+        conn.commit()
+        self._pending_counts.clear()
+
+    def flush(self) -> None:
+        """Ghi các lượt hit/miss còn trong bộ nhớ (gọi khi tiến trình kết thúc)."""
+        with self._lock:
+            if self._pending_counts:
+                self._flush_counts(self._connect())
+
+    def get(self, stock_code: str, year: Optional[int]) -> Optional[List[dict]]:
+        """Trả về danh sách báo cáo đã cache, hoặc None nếu chưa có/đã hết hạn."""
+        entry = self.get_entry(stock_code, year)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, stock_code: str, year: Optional[int]) -> Optional[Tuple[List[dict], float]]:
+        """Như `get` nhưng kèm thời điểm danh sách được lấy (`fetched_at`)."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT reports, fetched_at FROM report_listings WHERE stock_code = ? AND year = ?",
+                self._key(stock_code, year),
+            ).fetchone()
+            if row is not None and not self.is_expired(year, row[1]):
+                self.hits += 1
+                self._count("hits")
+                return json.loads(row[0]), row[1]
+            self.misses += 1
+            self._count("misses")
+            return None
+
+    def put(self, stock_code: str, year: Optional[int], reports: List[dict]) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO report_listings (stock_code, year, reports, fetched_at) VALUES (?, ?, ?, ?)",
+                (*self._key(stock_code, year), json.dumps(reports, ensure_ascii=False), time.time()),
+            )
+            conn.commit()
+            self._flush_counts(conn)
+
+    def invalidate(self, stock_code: Optional[str] = None, year: Optional[int] = None, latest: bool = False) -> int:
+        """Xoá các mục theo mã và/hoặc năm (không truyền gì: xoá toàn bộ). Trả về số mục đã xoá."""
+        clauses, params = [], []
+        if stock_code:
+            clauses.append("stock_code = ?")
+            params.append(stock_code.upper())
+        if year or latest:
+            clauses.append("year = ?")
+            params.append(year or LATEST_KEY)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            conn = self._connect()
+            deleted = conn.execute(f"DELETE FROM report_listings{where}", params).rowcount
+            conn.commit()
+        return deleted
+
+    def stats(self) -> dict:
+        with self._lock:
+            conn = self._connect()
+            self._flush_counts(conn)
+            entries = conn.execute("SELECT COUNT(*) FROM report_listings").fetchone()[0]
+            counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "total_hits": counters.get("hits", 0),
+            "total_misses": counters.get("misses", 0),
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_report_cache() -> ReportCache:
+    """Trả về cache dùng chung của tiến trình, khởi tạo từ biến môi trường ở lần gọi đầu."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ReportCache.from_env()
+                atexit.register(_cache.flush)
+    return _cache
+
+
+def _warm(cache: ReportCache, stock_codes, years, latest: bool):
+    from nodes.extract_link import scrape_reports
+
+    targets = [(code, year) for code in stock_codes for year in years]
+    if latest:
+        targets += [(code, None) for code in stock_codes]
+    for code, year in targets:
+        label = year or "Mới nhất"
+        try:
+            reports = scrape_reports(code, year)
+        except Exception as e:
+            print(f"Lỗi khi làm nóng {code} {label}: {e}")
+            continue
+        if reports:
+            cache.put(code, year, reports)
+        print(f"{code} {label}: {len(reports)} báo cáo")
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Quản lý cache danh sách báo cáo Vietstock")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    warm_parser = subparsers.add_parser("warm", help="Scrape trước và lưu vào cache")
+    warm_parser.add_argument("stock_codes", nargs="+")
+    warm_parser.add_argument("--years", nargs="*", type=int, default=[])
+    warm_parser.add_argument("--latest", action="store_true", help="Làm nóng cả danh sách 'Mới nhất'")
+
+    invalidate_parser = subparsers.add_parser("invalidate", help="Xoá mục khỏi cache")
+    invalidate_parser.add_argument("stock_codes", nargs="*")
+    invalidate_parser.add_argument("--years", nargs="*", type=int, default=[])
+    invalidate_parser.add_argument("--latest", action="store_true", help="Chỉ xoá danh sách 'Mới nhất'")
+
+    subparsers.add_parser("stats", help="Thống kê cache")
+
+    args = parser.parse_args()
+    cache = get_report_cache()
+    if args.command == "warm":
+        _warm(cache, args.stock_codes, args.years, args.latest)
+    elif args.command == "invalidate":
+        targets = [(year, False) for year in args.years] + ([(None, True)] if args.latest else [])
+        deleted = 0
+        for code in args.stock_codes or [None]:
+            for year, latest in targets or [(None, False)]:
+                deleted += cache.invalidate(code, year, latest)
+        print(f"Đã xoá {deleted} mục")
+    print(json.dumps(cache.stats(), ensure_ascii=False))
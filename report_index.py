@@ -0,0 +1,147 @@
+"""Phân loại tiêu đề báo cáo và index tra cứu theo (kỳ, quý, loại báo cáo).
+
+Mỗi tiêu đề chỉ được phân tích một lần thành `ReportRecord`; `ReportIndex`
+trả lời các truy vấn khớp chính xác, quý fallback và "Mới nhất" trong O(1).
+"""
+import asyncio
+import threading
+import weakref
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import regex as re
+
+from tracing import span
+
+CONSOLIDATION_STATUSES = ("Hợp nhất", "Công ty mẹ")
+QUARTER_PATTERN = re.compile(r"quý ([1-4])")
+
+
+class ReportRecord(NamedTuple):
+    title: str
+    link: str
+    period: Optional[str]  # "Quý", "6 tháng", "Cả năm" hoặc None nếu không nhận ra
+    quarter: Optional[int]
+    consolidation_status: str
+    published: Optional[str]  # Thời gian đăng "dd/mm/yyyy hh:mm" nếu có
+
+    def as_report(self) -> dict:
+        return {"title": self.title, "link": self.link}
+
+
+def classify_title(title: str) -> Tuple[Optional[str], Optional[int], str]:
+    """Trả về (kỳ, quý, loại báo cáo) suy ra từ tiêu đề."""
+    title_lower = title.lower()
+    consol_status = "Hợp nhất" if "hợp nhất" in title_lower else "Công ty mẹ"
+    if "kiểm toán" in title_lower:  # Báo cáo năm
+        return "Cả năm", None, consol_status
+    if "soát xét" in title_lower:  # Báo cáo 6 tháng
+        return "6 tháng", None, consol_status
+    if "quý" in title_lower:  # Báo cáo quý
+        quarters = QUARTER_PATTERN.findall(title_lower)
+        if quarters:
+            return "Quý", int(min(quarters)), consol_status
+    return None, None, consol_status
+
+
+def build_record(report: dict) -> ReportRecord:
+    period, quarter, consol_status = classify_title(report["title"])
+    return ReportRecord(report["title"], report["link"], period, quarter, consol_status, report.get("published"))
+
+
+class ReportIndex:
+    """Index các báo cáo của một mã trong một năm (giữ thứ tự như trên Vietstock)."""
+
+    def __init__(self, reports: List[dict]):
+        self.records = [build_record(report) for report in reports]
+        # (kỳ, quý, loại) -> báo cáo đầu tiên khớp
+        self._first: Dict[tuple, ReportRecord] = {}
+        for record in self.records:
+            if record.period:
+                self._first.setdefault((record.period, record.quarter, record.consolidation_status), record)
+        # Báo cáo mới nhất có chứa tên loại báo cáo trong tiêu đề
+        self._latest_by_status: Dict[str, ReportRecord] = {}
+        for status in CONSOLIDATION_STATUSES:
+            status_lower = status.lower()
+            for record in self.records:
+                if status_lower in record.title.lower():
+                    self._latest_by_status[status] = record
+                    break
+        # Quý gần nhất trước quý q có báo cáo (tìm lùi)
+        available_quarters = {record.quarter for record in self.records if record.period == "Quý"}
+        self._fallback_quarter: Dict[int, Optional[int]] = {}
+        for q in range(1, 5):
+            self._fallback_quarter[q] = next((fq for fq in range(q - 1, 0, -1) if fq in available_quarters), None)
+
+    def __len__(self):
+        return len(self.records)
+
+    def get(self, period: str, quarter: Optional[int], consolidation_status: str) -> Optional[ReportRecord]:
+        """Báo cáo đầu tiên khớp chính xác (kỳ, quý, loại); quý chỉ dùng khi kỳ là "Quý"."""
+        return self._first.get((period, quarter if period == "Quý" else None, consolidation_status))
+
+    def fallback_quarter(self, quarter: int) -> Optional[int]:
+        return self._fallback_quarter.get(quarter)
+
+    def latest(self, consolidation_status: Optional[str] = None) -> Optional[ReportRecord]:
+        if consolidation_status:
+            return self._latest_by_status.get(consolidation_status)
+        return self.records[0] if self.records else None
+
+
+class ReportIndexRegistry:
+    """Dùng chung `ReportIndex` theo (mã, năm) giữa các yêu cầu trong tiến trình.
+
+    Các yêu cầu đồng thời cho cùng một khoá chờ nhau để chỉ lấy danh sách và
+    phân loại một lần. `load_reports` trả về (danh sách, fetched_at) và index hết hạn
+    theo thời điểm danh sách được lấy (`is_expired(year, fetched_at)`), không phải lúc
+    dựng index, nên index dựng từ một bản cache sắp hết hạn cũng hết hạn cùng lúc với nó.
+    """
+
+    def __init__(self, is_expired: Callable[[Optional[int], float], bool]):
+        self.is_expired = is_expired
+        self._entries: Dict[tuple, Tuple[ReportIndex, float]] = {}
+        self._key_locks: Dict[tuple, threading.Lock] = {}
+        # Lock asyncio gắn với event loop nên tách theo từng loop
+        self._async_key_locks = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, stock_code: str, year: Optional[int],
+                     load_reports: Callable[[], Tuple[List[dict], float]]) -> ReportIndex:
+        key = (stock_code.upper(), year)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            index = self._cached(key, year)
+            if index is not None:
+                return index
+            return self._store(key, *load_reports())
+
+    def _cached(self, key, year) -> Optional[ReportIndex]:
+        entry = self._entries.get(key)
+        if entry is not None and not self.is_expired(year, entry[1]):
+            return entry[0]
+        return None
+
+    def _store(self, key, reports: List[dict], fetched_at: float) -> ReportIndex:
+        with span("index.classify", reports=len(reports)):
+            index = ReportIndex(reports)
+        # Không giữ danh sách rỗng để lần sau thử lại
+        if index.records:
+            self._entries[key] = (index, fetched_at)
+        return index
+
+    async def aget_or_build(self, stock_code: str, year: Optional[int],
+                            load_reports: Callable[[], Awaitable[Tuple[List[dict], float]]]) -> ReportIndex:
+        """Bản bất đồng bộ của `get_or_build` cho các coroutine trên cùng event loop."""
+        key = (stock_code.upper(), year)
+        loop_locks = self._async_key_locks.setdefault(asyncio.get_running_loop(), {})
+        key_lock = loop_locks.setdefault(key, asyncio.Lock())
+        async with key_lock:
+            index = self._cached(key, year)
+            if index is not None:
+                return index
+            return self._store(key, *await load_reports())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
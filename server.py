@@ -0,0 +1,151 @@
+"""Chế độ server: giao thức JSON-lines qua stdin/stdout.
+
+Mỗi dòng đầu vào là một lệnh, mỗi dòng đầu ra là một sự kiện JSON:
+    {"op": "query", "query": "...", "thread_id": "tuỳ chọn"}
+    {"op": "choice", "thread_id": "...", "choice": 2}
+    {"op": "metrics"}
+
+Sự kiện trả về:
+    {"event": "clarification", "thread_id", "request_id", "clarification_prompt", "possible_choices", "collected_links"}
+    {"event": "result", "thread_id", "final_response", "collected_links"}
+    {"event": "metrics", "text"}   (histogram Prometheus khi TRACE_SINKS có "prometheus")
+    {"event": "error", "thread_id", "error"}
+
+Khi một yêu cầu cần người dùng chọn báo cáo, graph dừng bằng interrupt và state
+được lưu vào checkpointer SQLite (`CHECKPOINT_PATH`); các lệnh khác vẫn được xử lý
+trong lúc chờ. Lệnh "choice" (kể cả sau khi khởi động lại server) chạy tiếp graph.
+Log của các node được chuyển sang stderr để stdout chỉ chứa giao thức.
+
+    python server.py
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import uuid
+from typing import Callable, Dict
+
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from langgraph.types import Command
+
+from agent import EXTRACTION_CONCURRENCY, GRAPH_RECURSION_LIMIT, build_graph
+from browser_pool import get_async_browser_pool
+from tracing import PrometheusSink, get_tracer
+
+
+class AgentServer:
+    """Xử lý các lệnh "query"/"choice" đồng thời trên một event loop."""
+
+    def __init__(self, agent, emit: Callable[[dict], None], max_concurrency: int = EXTRACTION_CONCURRENCY):
+        self.agent = agent
+        self.emit = emit
+        self.max_concurrency = max_concurrency
+        # Không cho hai lệnh cùng chạy trên một thread_id
+        self._thread_locks: Dict[str, asyncio.Lock] = {}
+
+    def _config(self, thread_id: str) -> dict:
+        return {"configurable": {"thread_id": thread_id}, "max_concurrency": self.max_concurrency,
+                "recursion_limit": GRAPH_RECURSION_LIMIT}
+
+    async def handle(self, message: dict) -> None:
+        op = message.get("op")
+        thread_id = message.get("thread_id")
+        try:
+            if op == "query":
+                thread_id = thread_id or uuid.uuid4().hex
+                await self._run(thread_id, {"query": message["query"]}, new_thread=True)
+            elif op == "choice":
+                if not thread_id:
+                    raise ValueError("Thiếu thread_id")
+                await self._run(thread_id, Command(resume=message.get("choice")))
+            elif op == "metrics":
+                sink = get_tracer().find_sink(PrometheusSink)
+                self.emit({"event": "metrics", "text": sink.render() if sink else ""})
+            else:
+                raise ValueError(f"Lệnh không hợp lệ: {op!r}")
+        except Exception as e:
+            self.emit({"event": "error", "thread_id": thread_id, "error": str(e)})
+
+    async def _run(self, thread_id: str, graph_input, new_thread: bool = False) -> None:
+        lock = self._thread_locks.setdefault(thread_id, asyncio.Lock())
+        async with lock:
+            config = self._config(thread_id)
+            snapshot = await self.agent.aget_state(config)
+            if new_thread and snapshot.values:
+                raise ValueError(f"thread_id {thread_id} đã tồn tại")
+            if not new_thread and not snapshot.interrupts:
+                raise ValueError(f"Không có yêu cầu nào đang chờ lựa chọn cho thread {thread_id}")
+            await self.agent.ainvoke(graph_input, config=config)
+            snapshot = await self.agent.aget_state(config)
+        self._emit_snapshot(thread_id, snapshot)
+        if not snapshot.interrupts:
+            self._thread_locks.pop(thread_id, None)
+
+    def _emit_snapshot(self, thread_id: str, snapshot) -> None:
+        values = snapshot.values
+        if snapshot.interrupts:
+            self.emit({
+                "event": "clarification",
+                "thread_id": thread_id,
+                **snapshot.interrupts[0].value,
+                "collected_links": values.get("collected_links") or {},
+            })
+        else:
+            self.emit({
+                "event": "result",
+                "thread_id": thread_id,
+                "final_response": values.get("final_response"),
+                "collected_links": values.get("collected_links") or {},
+            })
+
+
+async def serve(extraction_mode: str, checkpoint_path: str) -> None:
+    # stdout chỉ dành cho giao thức, mọi print của các node đi ra stderr
+    protocol_out = sys.stdout
+    sys.stdout = sys.stderr
+
+    def emit(event: dict) -> None:
+        protocol_out.write(json.dumps(event, ensure_ascii=False) + "\n")
+        protocol_out.flush()
+
+    directory = os.path.dirname(checkpoint_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    loop = asyncio.get_running_loop()
+    tasks = set()
+    async with AsyncSqliteSaver.from_conn_string(checkpoint_path) as checkpointer:
+        agent = build_graph(extraction_mode, use_async=True, clarification="interrupt", checkpointer=checkpointer)
+        server = AgentServer(agent, emit)
+        try:
+            while True:
+                line = await loop.run_in_executor(None, sys.stdin.readline)
+                if not line:
+                    break
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    message = json.loads(line)
+                except json.JSONDecodeError as e:
+                    emit({"event": "error", "thread_id": None, "error": f"JSON không hợp lệ: {e}"})
+                    continue
+                task = asyncio.create_task(server.handle(message))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            # Hết đầu vào: chờ các lệnh đang chạy xong
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            await get_async_browser_pool().close()
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Agent báo cáo tài chính, giao thức JSON-lines qua stdin/stdout")
+    parser.add_argument("--mode", choices=["serial", "parallel"], default=os.getenv("EXTRACTION_MODE", "parallel"))
+    parser.add_argument("--checkpoint-path", default=os.getenv("CHECKPOINT_PATH", os.path.join(".cache", "checkpoints.sqlite3")))
+    args = parser.parse_args()
+    asyncio.run(serve(args.mode, args.checkpoint_path))
@@ -1,21 +1,43 @@
-from typing import TypedDict, List, Dict, Optional, Literal
+from typing import TypedDict, List, Dict, Optional, Annotated, Union
 from pydantic_models import ReportRequest
 
-# Agent State
-class StockReportState(TypedDict):
-    query: str
-    pending_requests: List[ReportRequest]
-    collected_links: Dict[str, str]
-    comparison_context: str
-    current_request_id: Optional[str]
-    stock_code: Optional[str]
-    year: Optional[int]
-    period: Optional[Literal["Quý", "6 tháng", "Cả năm", "Mới nhất"]]
-    quarter: Optional[int]
-    consolidation_status: Optional[Literal["Hợp nhất", "Công ty mẹ"]]
+def merge_dicts(left: Optional[dict], right: Optional[dict]) -> dict:
+    """Reducer gộp dict theo key, cho phép nhiều nhánh song song cùng ghi."""
+    return {**(left or {}), **(right or {})}
+
+def consume_queue(left: Optional[list], right: Union[list, int]) -> list:
+    """Reducer cho hàng đợi: một list thay thế cả hàng đợi, một số nguyên n bỏ n phần tử đầu.
+
+    Node lấy yêu cầu chỉ trả về số phần tử đã lấy thay vì chép lại cả danh sách."""
+    if isinstance(right, int):
+        return (left or [])[right:]
+    return list(right)
+
+# Kết quả xử lý một yêu cầu báo cáo (yêu cầu đang xử lý hoặc đang chờ hỏi lại)
+class RequestRecord(TypedDict, total=False):
+    request: ReportRequest
     report_link: Optional[str]
     error_message: Optional[str]
     clarification_prompt: Optional[str]
     possible_choices: Optional[List[dict]]
     notification: Optional[str]
-    final_response: Optional[str]
\ No newline at end of file
+
+# Agent State: mỗi node chỉ trả về các key nó thay đổi
+class StockReportState(TypedDict):
+    query: str
+    comparison_context: str
+    # Thông báo và lỗi ở mức cả query (ví dụ báo cáo tương lai bị bỏ qua)
+    notification: Optional[str]
+    error_message: Optional[str]
+    # Hàng đợi yêu cầu chưa xử lý (chế độ serial lấy dần từ đầu)
+    pending_requests: Annotated[List[ReportRequest], consume_queue]
+    current: Optional[RequestRecord]
+    # request_id -> link hoặc "LỖI: ..."
+    collected_links: Annotated[Dict[str, str], merge_dicts]
+    # request_id -> RequestRecord cần hỏi lại, dùng trong chế độ song song
+    pending_clarifications: Annotated[Dict[str, RequestRecord], merge_dicts]
+    final_response: Optional[str]
+
+# Đầu vào của một nhánh trích xuất song song (gửi qua Send)
+class ExtractionTask(TypedDict):
+    request: ReportRequest
\ No newline at end of file
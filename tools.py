@@ -1,7 +1,11 @@
 from datetime import datetime
 from langchain_core.tools import tool
 
+def current_date_text() -> str:
+    """Chuỗi mô tả ngày hiện tại, dùng để chèn vào prompt."""
+    return datetime.now().strftime("Hôm nay là ngày %d tháng %m năm %Y")
+
 @tool
 def get_current_time() -> str:
     """Trả về ngày và tháng hiện tại để giúp LLM suy luận về sự tồn tại của các báo cáo theo quý."""
-    return datetime.now().strftime("Hôm nay là ngày %d tháng %m năm %Y")
\ No newline at end of file
+    return current_date_text()
\ No newline at end of file
@@ -0,0 +1,328 @@
+"""Đo thời gian và truy vết các node của graph.
+
+Mỗi node đăng ký trong `agent.py` được bọc bởi `traced_node`, ghi một span gồm
+tên node, `request_id`, mã chứng khoán, thời gian chạy và kết quả (link, lỗi
+hoặc hỏi lại). Bên trong node, các bước tốn thời gian (khởi động trình duyệt,
+tải trang, chọn năm, gọi LLM, phân loại báo cáo) ghi span con bằng `span(...)`;
+span con kế thừa `request_id` và `stock_code` từ span cha.
+
+Span được gửi tới các sink chọn qua `TRACE_SINKS` (phân tách bằng dấu phẩy):
+    console     in một dòng ngắn ra stderr cho mỗi node
+    json        mỗi span một dòng JSON (`TRACE_JSON_PATH`, mặc định stderr)
+    histogram   gom thời gian theo tên span trong bộ nhớ (`summary()`)
+    prometheus  histogram dạng text của Prometheus (`render()`; ghi ra
+                `TRACE_PROMETHEUS_PATH` khi tiến trình kết thúc nếu có)
+Không có sink nào thì `span` trả về một context rỗng dùng chung, gần như không tốn gì.
+"""
+import atexit
+import contextvars
+import functools
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+# Span đang mở trong ngữ cảnh hiện tại (thread hoặc task asyncio)
+_current_span = contextvars.ContextVar("current_span", default=None)
+INHERITED_ATTRIBUTES = ("request_id", "stock_code")
+
+
+class Span:
+    __slots__ = ("name", "attributes", "parent", "start", "duration", "outcome")
+
+    def __init__(self, name: str, attributes: dict, parent: Optional["Span"]):
+        self.name = name
+        self.parent = parent
+        self.attributes = {key: parent.attributes[key] for key in INHERITED_ATTRIBUTES
+                           if parent is not None and key in parent.attributes}
+        self.attributes.update(attributes)
+        self.start = time.time()
+        self.duration = None
+        self.outcome = "ok"
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def as_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "parent": self.parent.name if self.parent is not None else None,
+            "start": self.start,
+            "duration_ms": self.duration * 1000,
+            "outcome": self.outcome,
+            **self.attributes,
+        }
+
+
+class _NullSpan:
+    """Span dùng khi tracing tắt: vừa là context manager vừa là span, mọi thao tác đều bỏ qua."""
+    outcome = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **attributes) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class ConsoleSink:
+    """In tiến trình các node ra stderr (thay cho các dòng "Bắt đầu Node" trước đây)."""
+
+    def __init__(self, stream=None, nodes_only=True):
+        self.stream = stream
+        self.nodes_only = nodes_only
+
+    def emit(self, span: Span) -> None:
+        if self.nodes_only and span.parent is not None:
+            return
+        request = span.attributes.get("request_id")
+        target = f" [{request}]" if request else ""
+        print(f"Node {span.name}{target}: {span.duration * 1000:.1f}ms ({span.outcome})", file=self.stream or sys.stderr)
+
+
+class JsonLogSink:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8") if path else None
+
+    def emit(self, span: Span) -> None:
+        line = json.dumps(span.as_dict(), ensure_ascii=False, default=str)
+        with self._lock:
+            stream = self._file or sys.stderr
+            stream.write(line + "\n")
+            stream.flush()
+
+
+class HistogramSink:
+    """Giữ thời gian (giây) của mọi span theo (tên, kết quả) trong bộ nhớ."""
+
+    def __init__(self):
+        self.samples: Dict[tuple, List[float]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def emit(self, span: Span) -> None:
+        with self._lock:
+            self.samples[(span.name, span.outcome)].append(span.duration)
+
+    def summary(self) -> dict:
+        """{tên span: {n, p50_ms, p95_ms, max_ms, outcomes}} gộp mọi kết quả."""
+        by_name = defaultdict(list)
+        outcomes = defaultdict(dict)
+        with self._lock:
+            for (name, outcome), samples in self.samples.items():
+                by_name[name].extend(samples)
+                outcomes[name][outcome] = len(samples)
+        result = {}
+        for name, samples in sorted(by_name.items()):
+            ordered = sorted(samples)
+            result[name] = {
+                "n": len(ordered),
+                "p50_ms": ordered[len(ordered) // 2] * 1000,
+                "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+                "max_ms": ordered[-1] * 1000,
+                "outcomes": outcomes[name],
+            }
+        return result
+
+    def clear(self) -> None:
+        with self._lock:
+            self.samples.clear()
+
+
+class PrometheusSink:
+    """Histogram `stock_agent_span_duration_seconds{span, outcome}` theo định dạng text của Prometheus."""
+
+    METRIC = "stock_agent_span_duration_seconds"
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        # (tên, kết quả) -> [số lần theo từng bucket..., tổng thời gian, tổng số lần]
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+        if path:
+            atexit.register(self.write)
+
+    def emit(self, span: Span) -> None:
+        bucket = bisect_left(self.BUCKETS, span.duration)
+        with self._lock:
+            series = self._series.setdefault((span.name, span.outcome), [0] * (len(self.BUCKETS) + 2))
+            if bucket < len(self.BUCKETS):
+                series[bucket] += 1
+            series[-2] += span.duration
+            series[-1] += 1
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.METRIC} Thời gian chạy của node và các bước bên trong.",
+                 f"# TYPE {self.METRIC} histogram"]
+        with self._lock:
+            series_items = sorted((key, list(values)) for key, values in self._series.items())
+        for (name, outcome), values in series_items:
+            labels = f'span="{name}",outcome="{outcome}"'
+            cumulative = 0
+            for bound, count in zip(self.BUCKETS, values):
+                cumulative += count
+                lines.append(f'{self.METRIC}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.METRIC}_bucket{{{labels},le="+Inf"}} {values[-1]}')
+            lines.append(f"{self.METRIC}_sum{{{labels}}} {values[-2]}")
+            lines.append(f"{self.METRIC}_count{{{labels}}} {values[-1]}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: Optional[str] = None) -> None:
+        path = path or self.path
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(self.render())
+
+
+class Tracer:
+    def __init__(self, sinks=None):
+        self.sinks = list(sinks or [])
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.sinks)
+
+    @classmethod
+    def from_env(cls):
+        sinks = []
+        for name in filter(None, (part.strip() for part in os.getenv("TRACE_SINKS", "").split(","))):
+            if name == "console":
+                sinks.append(ConsoleSink())
+            elif name == "json":
+                sinks.append(JsonLogSink(os.getenv("TRACE_JSON_PATH") or None))
+            elif name == "histogram":
+                sinks.append(HistogramSink())
+            elif name == "prometheus":
+                sinks.append(PrometheusSink(os.getenv("TRACE_PROMETHEUS_PATH") or None))
+            else:
+                raise ValueError(f"TRACE_SINKS không hợp lệ: {name!r}")
+        return cls(sinks)
+
+    def find_sink(self, sink_type):
+        return next((sink for sink in self.sinks if isinstance(sink, sink_type)), None)
+
+    def span(self, name: str, **attributes):
+        """Context manager ghi một span; span lồng nhau tự nhận span ngoài làm cha."""
+        if not self.sinks:
+            return _NULL_SPAN
+        return self._span(name, attributes)
+
+    @contextmanager
+    def _span(self, name, attributes):
+        span = Span(name, attributes, _current_span.get())
+        token = _current_span.set(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            if span.outcome == "ok":
+                span.outcome = _exception_outcome(e)
+            raise
+        finally:
+            span.duration = time.perf_counter() - started
+            _current_span.reset(token)
+            for sink in self.sinks:
+                try:
+                    sink.emit(span)
+                except Exception as e:
+                    print(f"Lỗi khi ghi span {name}: {e}", file=sys.stderr)
+
+
+def _exception_outcome(error: BaseException) -> str:
+    # interrupt() của LangGraph dừng node bằng exception để hỏi lại người dùng
+    if type(error).__name__ in ("GraphInterrupt", "NodeInterrupt"):
+        return "clarification"
+    return "exception"
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """Tracer dùng chung của tiến trình, khởi tạo từ biến môi trường ở lần gọi đầu."""
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                _tracer = Tracer.from_env()
+    return _tracer
+
+
+def set_tracer(tracer: Tracer) -> None:
+    global _tracer
+    with _tracer_lock:
+        _tracer = tracer
+
+
+def span(name: str, **attributes):
+    """Ghi một span con bằng tracer dùng chung."""
+    return get_tracer().span(name, **attributes)
+
+
+def _node_attributes(node_input) -> dict:
+    request = node_input.get("request") if isinstance(node_input, dict) else None
+    if request is not None:  # Nhánh song song nhận ExtractionTask qua Send
+        return {"request_id": request.request_id, "stock_code": request.stock_code}
+    current = node_input.get("current") if isinstance(node_input, dict) else None
+    if current:  # Yêu cầu đang xử lý trong chế độ serial hoặc đang chờ hỏi lại
+        request = current["request"]
+        return {"request_id": request.request_id, "stock_code": request.stock_code}
+    return {}
+
+
+def _node_outcome(result) -> str:
+    """Kết quả của node suy ra từ phần state node trả về."""
+    if not isinstance(result, dict):
+        return "ok"
+    current = result.get("current") or {}
+    if current.get("clarification_prompt") or result.get("pending_clarifications"):
+        return "clarification"
+    if current.get("error_message") or result.get("error_message"):
+        return "error"
+    if current.get("report_link"):
+        return "link"
+    collected = result.get("collected_links")
+    if collected and len(collected) == 1:
+        return "error" if next(iter(collected.values())).startswith("LỖI") else "link"
+    return "ok"
+
+
+def traced_node(name: str, func: Callable) -> Callable:
+    """Bọc một node (sync hoặc async) để ghi span cho mỗi lần chạy."""
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(node_input, *args, **kwargs):
+            tracer = get_tracer()
+            if not tracer.sinks:
+                return await func(node_input, *args, **kwargs)
+            with tracer.span(name, **_node_attributes(node_input)) as node_span:
+                result = await func(node_input, *args, **kwargs)
+                node_span.outcome = _node_outcome(result)
+                return result
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(node_input, *args, **kwargs):
+        tracer = get_tracer()
+        if not tracer.sinks:
+            return func(node_input, *args, **kwargs)
+        with tracer.span(name, **_node_attributes(node_input)) as node_span:
+            result = func(node_input, *args, **kwargs)
+            node_span.outcome = _node_outcome(result)
+            return result
+    return wrapper